@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(system_prompt, scenario_text, player_names, answers, model, temperature, engine="Combined",
+                   reuse_threshold=None):
+    """Build a content hash identifying one evaluation request
+
+    reuse_threshold is the similarity above which earlier grades were reused
+    (None when they were not), since it changes the analysis.
+    """
+    request = {
+        "engine": engine,
+        "system_prompt": system_prompt,
+        "scenario": scenario_text,
+        # Order matters: the same answers from different players is a different round
+        "answers": [[name, answer] for name, answer in zip(player_names, answers)],
+        "model": model,
+        "temperature": temperature,
+    }
+    if reuse_threshold is not None:
+        request["reuse_threshold"] = reuse_threshold
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier (in-memory LRU + on-disk) cache of AI analyses keyed by content hash"""
+
+    def __init__(self, cache_dir=".analysis_cache", max_entries=256, max_disk_entries=2048,
+                 ttl_seconds=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (created_at, analysis)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Files on disk, counted once here and kept up to date by this process; pruning recounts
+        self._disk_count = len(self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry["created_at"], entry["analysis"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _remember(self, key, created_at, analysis):
+        self._memory[key] = (created_at, analysis)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached analysis for key, or None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    del self._memory[key]
+                    entry = None
+                else:
+                    self._memory.move_to_end(key)
+
+            if entry is None:
+                entry = self._read_disk(key)
+                if entry is not None and self._expired(entry[0]):
+                    self._remove_disk(key)
+                    entry = None
+                if entry is not None:
+                    self._remember(key, *entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, analysis):
+        """Store an analysis in both tiers"""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, analysis)
+            tmp_path = self._path(key) + ".tmp"
+            try:
+                existed = os.path.exists(self._path(key))
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"created_at": created_at, "analysis": analysis}, f, ensure_ascii=False)
+                os.replace(tmp_path, self._path(key))
+                if not existed:
+                    self._disk_count += 1
+                self._prune_disk()
+            except OSError:
+                # The disk tier is best-effort; the memory tier still serves this process
+                pass
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._path(key))
+            self._disk_count -= 1
+        except OSError:
+            pass
+
+    def _disk_entries(self):
+        try:
+            return [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        except OSError:
+            return []
+
+    def _prune_disk(self):
+        if self._disk_count <= self.max_disk_entries:
+            return
+        paths = [os.path.join(self.cache_dir, name) for name in self._disk_entries()]
+        paths.sort(key=lambda p: os.path.getmtime(p))
+        removed = 0
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        # Resynced with the directory, which other processes may also write to
+        self._disk_count = len(paths) - removed
+
+    def clear(self):
+        """Drop every cached analysis and reset the counters"""
+        with self._lock:
+            self._memory.clear()
+            for name in self._disk_entries():
+                self._remove_disk(name[:-len(".json")])
+            self._disk_count = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count,
+            }
@@ -0,0 +1,166 @@
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+# Signature size and LSH banding: 32 bands of 4 rows make answers with a
+# Jaccard similarity above ~0.4 share a bucket with high probability
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 2
+# Similarity above which an earlier grade is reused
+DEFAULT_THRESHOLD = 0.8
+# Graded answers kept per scenario, oldest dropped first
+MAX_ANSWERS_PER_SCENARIO = 1000
+MAX_SCENARIOS = 512
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def normalize(text):
+    """Lowercase words without punctuation, so spacing and casing never matter"""
+    return _WORD.findall(text.lower())
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """Set of overlapping word n-grams; answers shorter than size are one shingle"""
+    words = normalize(text)
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures computed for all permutations at once with NumPy"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        # NumPy is imported with the first hasher, not when the app starts
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        import numpy as np
+
+        # crc32 is stable across processes, unlike hash()
+        values = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+        # (a * x + b) mod p for every permutation and shingle; x < 2**32 and a, b < 2**61 may
+        # wrap around 2**64, which only reshuffles the permutation and keeps it deterministic
+        hashed = (self.a[:, None] * values[None, :] + self.b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return hashed.min(axis=1)
+
+
+class _ScenarioIndex:
+    def __init__(self, bands):
+        self.entries = OrderedDict()  # id -> (signature, entry)
+        self.buckets = [dict() for _ in range(bands)]  # band -> {band hash: [ids]}
+        self.next_id = 0
+        self.lesson = None
+
+
+class AnswerIndex:
+    """Grades of earlier answers, per scenario, searchable for near-duplicates
+
+    Answers are compared by MinHash over word shingles; LSH buckets find the
+    candidates and the estimated Jaccard similarity decides. Shared by every
+    session, so answers graded in one game are reused in the next.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, max_answers=MAX_ANSWERS_PER_SCENARIO,
+                 max_scenarios=MAX_SCENARIOS):
+        self.num_perm = num_perm
+        self._hasher = None
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_answers = max_answers
+        self.max_scenarios = max_scenarios
+        self.lookups = 0
+        self.hits = 0
+        self._scenarios = OrderedDict()  # scenario key -> _ScenarioIndex, least recently used first
+        self._lock = threading.Lock()
+
+    @property
+    def hasher(self):
+        """Built on the first lookup, so showing the index stats does not load NumPy"""
+        if self._hasher is None:
+            self._hasher = MinHasher(self.num_perm)
+        return self._hasher
+
+    @staticmethod
+    def _scenario_key(scenario_text):
+        return hashlib.sha256(scenario_text.encode("utf-8")).hexdigest()
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _index(self, scenario_text, create=False):
+        key = self._scenario_key(scenario_text)
+        index = self._scenarios.get(key)
+        if index is None and create:
+            index = self._scenarios[key] = _ScenarioIndex(self.bands)
+            if len(self._scenarios) > self.max_scenarios:
+                self._scenarios.popitem(last=False)
+        if index is not None:
+            self._scenarios.move_to_end(key)
+        return index
+
+    def lookup(self, scenario_text, answer, threshold=DEFAULT_THRESHOLD):
+        """Return (similarity, entry) for the most similar earlier answer at or above threshold, or None"""
+        signature = self.hasher.signature(answer)
+        with self._lock:
+            self.lookups += 1
+            index = self._index(scenario_text)
+            if index is None:
+                return None
+            candidates = set()
+            for band, key in zip(index.buckets, self._band_keys(signature)):
+                candidates.update(band.get(key, ()))
+            best = None
+            for entry_id in candidates:
+                other, entry = index.entries[entry_id]
+                similarity = float((other == signature).sum()) / len(signature)
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry)
+            if best is not None:
+                self.hits += 1
+            return best
+
+    def add(self, scenario_text, answer, player_name, medal, feedback):
+        """Remember the grade an answer received"""
+        signature = self.hasher.signature(answer)
+        entry = {"answer": answer, "player": player_name, "medal": medal, "feedback": feedback}
+        with self._lock:
+            index = self._index(scenario_text, create=True)
+            entry_id = index.next_id
+            index.next_id += 1
+            index.entries[entry_id] = (signature, entry)
+            for band, key in zip(index.buckets, self._band_keys(signature)):
+                band.setdefault(key, []).append(entry_id)
+            if len(index.entries) > self.max_answers:
+                old_id, (old_signature, _) = index.entries.popitem(last=False)
+                for band, key in zip(index.buckets, self._band_keys(old_signature)):
+                    band[key].remove(old_id)
+                    if not band[key]:
+                        del band[key]
+
+    def set_lesson(self, scenario_text, lesson):
+        with self._lock:
+            self._index(scenario_text, create=True).lesson = lesson
+
+    def lesson(self, scenario_text):
+        with self._lock:
+            index = self._index(scenario_text)
+            return index.lesson if index else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "answers": sum(len(index.entries) for index in self._scenarios.values())
+            }
@@ -0,0 +1,240 @@
+"""Grade recorded rounds from a JSONL file, without the Streamlit app.
+
+Each input line is one round; "scenario" is the scenario text, or the id or
+title of a scenario in the catalog:
+
+    {"id": "paper-07", "scenario": "the-late-arrival", "answers": [{"name": "Ana", "answer": "..."}]}
+
+Rounds are graded by the same prompts and score parsing as the app and
+written to the output as they finish, one JSON object per line. The output
+doubles as the checkpoint: rerunning the same command skips every round
+already graded there (by "id", else line number) and retries failed ones,
+so the last line per id wins. Point OPENAI_BASE_URL (or --base-url) at a
+local fake server to run without the real API:
+
+    python batch_grade.py rounds.jsonl -o graded.jsonl [--workers 8] [--engine combined]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from answer_index import AnswerIndex
+from config import env
+from grading import get_analysis_reusing_grades, get_llm_analysis, get_parallel_llm_analysis
+from latency import percentile
+from llm_client import LATENCY_BUDGET, call_log, record_call
+from local_scorer import LOCAL_MODEL, grade_round_locally
+from scenario_catalog import load_catalog, scenario_sources
+from scheduler import PRIORITY_BATCH, request_context
+from scoring import extract_medals, extract_scores_from_analysis, strip_score_block
+from token_budget import summarize_usage
+
+ENGINES = ("combined", "per-player", "offline")
+DEFAULT_WORKERS = 8
+# Rounds read ahead of the workers, per worker
+READ_AHEAD = 2
+
+
+def read_rounds(path):
+    """Yield (line_number, round, error) for every non-empty input line"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"invalid JSON: {e}"
+                continue
+            yield line_number, row, None
+
+
+def round_key(line_number, row):
+    return str(row["id"]) if isinstance(row, dict) and "id" in row else f"line-{line_number}"
+
+
+def load_checkpoint(output_path):
+    """Keys of rounds already graded in output_path; drops a line cut short by a crash"""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("error") is None:
+            finished.add(record["id"])
+        else:
+            finished.discard(record["id"])
+    return finished
+
+
+def parse_round(row, catalog):
+    """Return (scenario, player_names, answers) for an input round, or raise ValueError"""
+    if not isinstance(row, dict) or not isinstance(row.get("scenario"), str):
+        raise ValueError("a round needs a scenario")
+    scenario = catalog.get(row["scenario"]) or catalog.by_title(row["scenario"]) or catalog.by_text(row["scenario"])
+    if scenario is None:
+        scenario = {"title": "Recorded scenario", "scenario": row["scenario"]}
+    answers = row.get("answers")
+    if isinstance(answers, dict):
+        answers = [{"name": name, "answer": answer} for name, answer in answers.items()]
+    if not answers or not all(isinstance(a, dict) and a.get("name") and isinstance(a.get("answer"), str)
+                              for a in answers):
+        raise ValueError("answers must be a list of {name, answer} pairs")
+    names = [str(a["name"]) for a in answers]
+    if len(set(names)) != len(names):
+        raise ValueError("player names must be unique")
+    return scenario, names, [a["answer"] for a in answers]
+
+
+def make_analyzer(engine, api_key, model, fallback_model, reuse_threshold=None):
+    """analyze(scenario, answers, player_names) -> (analysis, error) for the chosen engine
+
+    With reuse_threshold, answers at least that similar to one graded earlier
+    in the run keep its grade and only the others are analyzed.
+    """
+    def analyze_engine(scenario, answers, player_names):
+        if engine == "combined":
+            return get_llm_analysis(scenario["scenario"], answers, player_names, api_key, model, fallback_model,
+                                    LATENCY_BUDGET)
+        if engine == "per-player":
+            return get_parallel_llm_analysis(scenario["scenario"], answers, player_names, api_key, model)
+        start = time.perf_counter()
+        analysis = grade_round_locally(scenario, answers, player_names)
+        record_call(LOCAL_MODEL, time.perf_counter() - start)
+        return analysis, None
+
+    if reuse_threshold is None or engine == "offline":
+        return analyze_engine
+    index = AnswerIndex()
+
+    def analyze(scenario, answers, player_names):
+        return get_analysis_reusing_grades(partial(analyze_engine, scenario), index, reuse_threshold,
+                                           scenario["scenario"], answers, player_names)
+    return analyze
+
+
+def grade_round(analyze, key, line_number, row, parse_error, catalog):
+    """Grade one input round into its output record"""
+    record = {"id": key, "line": line_number}
+    start = time.perf_counter()
+    try:
+        if parse_error:
+            raise ValueError(parse_error)
+        scenario, names, answers = parse_round(row, catalog)
+    except ValueError as e:
+        return dict(record, error=str(e), seconds=0.0, calls=[])
+    # Batch rounds share one queue slot and yield to players waiting in the app
+    with request_context(game="batch", priority=PRIORITY_BATCH), call_log() as calls:
+        try:
+            analysis, error = analyze(scenario, answers, names)
+        except Exception as e:
+            analysis, error = None, str(e)
+    record.update(scenario=scenario["title"], player_names=names)
+    if analysis:
+        record.update(
+            medals=extract_medals(analysis, names),
+            scores=extract_scores_from_analysis(analysis, names),
+            analysis=strip_score_block(analysis),
+            model_used=", ".join(sorted({call["model"] for call in calls})),
+            token_usage=summarize_usage(calls),
+            error=None
+        )
+    else:
+        record["error"] = error or "empty analysis"
+    return dict(record, seconds=round(time.perf_counter() - start, 3), calls=calls)
+
+
+def format_stats(results, skipped, elapsed):
+    """Throughput summary of a run"""
+    graded = [r for r in results if r["error"] is None]
+    answers = sum(len(r["player_names"]) for r in graded)
+    lines = [
+        f"Graded {len(graded)} rounds ({answers} answers) in {elapsed:.1f}s: "
+        f"{len(graded) / elapsed if elapsed else 0:.2f} rounds/s, {answers / elapsed if elapsed else 0:.2f} answers/s",
+        f"  {len(results) - len(graded)} failed, {skipped} skipped as already graded"
+    ]
+    if len(graded) >= 2:
+        seconds = sorted(r["seconds"] for r in graded)
+        lines.append(f"  round latency p50 {statistics.median(seconds):.2f}s, "
+                     f"p95 {percentile(seconds, 0.95):.2f}s, max {seconds[-1]:.2f}s")
+    usage = summarize_usage([call for r in results for call in r["calls"]])
+    if usage["prompt_tokens"] is not None:
+        lines.append(f"  tokens: {usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} completion "
+                     f"in {usage['calls']} calls")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of rounds")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file for graded rounds; also the checkpoint")
+    parser.add_argument("--engine", choices=ENGINES, default="combined")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--fallback-model", default=None,
+                        help="Combined engine only: also ask this model when the chosen one is slow")
+    parser.add_argument("--reuse-threshold", type=float, default=None,
+                        help="Reuse the grade of an answer graded earlier in the run when this similar (0-1)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Rounds graded at the same time")
+    parser.add_argument("--api-key", default=None, help="Defaults to OPENAI_API_KEY")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, such as a local fake server")
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        # Read when the pooled client is first built, on the first request
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    api_key = args.api_key or env("OPENAI_API_KEY")
+    if args.engine != "offline" and not api_key:
+        parser.error("an API key is needed: set OPENAI_API_KEY, pass --api-key, or use --engine offline")
+
+    catalog = load_catalog(scenario_sources())
+    analyze = make_analyzer(args.engine, api_key, args.model, args.fallback_model, args.reuse_threshold)
+    finished = load_checkpoint(args.output)
+    results = []
+    skipped = 0
+    start = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="batch-grader") as pool:
+        pending = set()
+
+        def write(done):
+            for future in done:
+                result = future.result()
+                results.append(result)
+                record = {k: v for k, v in result.items() if k != "calls"}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        for line_number, row, error in read_rounds(args.input):
+            key = round_key(line_number, row)
+            if key in finished:
+                skipped += 1
+                continue
+            finished.add(key)  # Repeated ids in the input are graded once
+            if len(pending) >= max(1, args.workers) * READ_AHEAD:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(done)
+            pending.add(pool.submit(grade_round, analyze, key, line_number, row, error, catalog))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write(done)
+
+    print(format_stats(results, skipped, time.perf_counter() - start), file=sys.stderr)
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
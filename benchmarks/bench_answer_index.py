@@ -0,0 +1,97 @@
+"""Near-duplicate lookups in the answer index: speed by index size and hit rate by kind of edit.
+
+Answers are built from the scenarios' reference answers with random filler
+sentences, indexed, then looked up again after edits ranging from
+re-casing to a different answer. Run from the repository root:
+
+    python -m benchmarks.bench_answer_index [--sizes 100 1000] [--lookups 500]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from answer_index import AnswerIndex
+from scenario_catalog import QUESTIONS_PATH, load_catalog
+
+FILLER = [
+    "I would keep notes of everything that happened.",
+    "Afterwards I would check in with the team to see how they feel.",
+    "I think it is important to stay positive.",
+    "If needed I would involve HR, but only as a last resort.",
+    "I would also set a reminder to follow up next week.",
+    "Being honest early saves a lot of trouble later.",
+]
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def make_answer(rng, reference):
+    return " ".join([reference] + rng.sample(FILLER, 2))
+
+
+def edit(rng, answer, kind):
+    words = answer.split()
+    if kind == "identical":
+        return answer
+    if kind == "case/punctuation":
+        return answer.upper().replace(".", "!").replace(",", "")
+    if kind == "one word changed":
+        words[rng.randrange(len(words))] = "really"
+        return " ".join(words)
+    if kind == "sentence dropped":
+        sentences = answer.split(". ")
+        sentences.pop(rng.randrange(len(sentences)))
+        return ". ".join(sentences)
+    if kind == "sentences reordered":
+        sentences = answer.split(". ")
+        rng.shuffle(sentences)
+        return ". ".join(sentences)
+    return make_answer(rng, rng.choice(FILLER))
+
+
+EDITS = ["identical", "case/punctuation", "one word changed", "sentence dropped", "sentences reordered",
+         "different answer"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    scenarios = load_catalog([QUESTIONS_PATH]).scenarios
+    rng = random.Random(7)
+    print(f"{'indexed':>7} {'add p50':>9} {'lookup p50':>11} {'lookup max':>11}")
+    for size in args.sizes:
+        index = AnswerIndex(max_answers=size)
+        scenario = scenarios[0]["scenario"]
+        stored = [make_answer(rng, rng.choice(s["reference_answers"])) for s in scenarios for _ in range(size)][:size]
+        adds = []
+        for i, answer in enumerate(stored):
+            start = time.perf_counter()
+            index.add(scenario, answer, f"Player {i}", "🥈", "Feedback.")
+            adds.append(time.perf_counter() - start)
+        lookups = []
+        hits = {(kind, threshold): 0 for kind in EDITS for threshold in THRESHOLDS}
+        queries = dict.fromkeys(EDITS, 0)
+        for _ in range(args.lookups):
+            kind = rng.choice(EDITS)
+            queries[kind] += 1
+            query = edit(rng, rng.choice(stored), kind)
+            start = time.perf_counter()
+            match = index.lookup(scenario, query, threshold=min(THRESHOLDS))
+            lookups.append(time.perf_counter() - start)
+            for threshold in THRESHOLDS:
+                hits[(kind, threshold)] += match is not None and match[0] >= threshold
+        print(f"{size:>7} {statistics.median(adds) * 1000:>7.2f}ms {statistics.median(lookups) * 1000:>9.2f}ms "
+              f"{max(lookups) * 1000:>9.2f}ms")
+
+    print("hit rate by edit and threshold (largest index):")
+    print(f"  {'edit':<20}" + "".join(f"{threshold:>7.2f}" for threshold in THRESHOLDS))
+    for kind in EDITS:
+        rates = [hits[(kind, threshold)] / max(1, queries[kind]) for threshold in THRESHOLDS]
+        print(f"  {kind:<20}" + "".join(f"{rate:>7.0%}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
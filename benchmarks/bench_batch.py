@@ -0,0 +1,82 @@
+"""Batch grading throughput by number of workers, against the local fake server.
+
+Writes a JSONL file of recorded rounds, grades it with batch_grade at each
+worker count, then cuts the last output in half (mid-line, like a crash)
+and resumes to show that only the missing rounds are graded again. Run
+from the repository root:
+
+    python -m benchmarks.bench_batch [--rounds 200] [--players 4] [--latency-ms 300]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from scenario_catalog import QUESTIONS_PATH, load_catalog
+
+
+def responder(request):
+    answers = request["messages"][-1]["content"].split("Student Answers:", 1)[1].strip().split("\n\n")[:-1]
+    names = [answer.split(":", 1)[0] for answer in answers]
+    medals = random.choices(["🥇 GOLD MEDAL", "🥈 SILVER MEDAL", "🥉 BRONZE MEDAL"], k=len(names))
+    return "\n\n".join(f"### {name}\n{medal}\nFeedback." for name, medal in zip(names, medals))
+
+
+def write_rounds(path, rounds, players):
+    scenarios = load_catalog([QUESTIONS_PATH]).scenarios
+    rng = random.Random(3)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rounds):
+            scenario = rng.choice(scenarios)
+            answers = [{"name": f"Player {j + 1}", "answer": rng.choice(scenario["reference_answers"])}
+                       for j in range(players)]
+            f.write(json.dumps({"id": f"round-{i}", "scenario": scenario["id"], "answers": answers}) + "\n")
+
+
+def run(batch_grade, rounds_path, output, workers):
+    stderr = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stderr(stderr):
+        batch_grade.main([rounds_path, "-o", output, "--workers", str(workers), "--api-key", "sk-fake"])
+    return time.perf_counter() - start, stderr.getvalue().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(responder=responder, latency=args.latency_ms / 1000) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        # The fake server has no rate limit; keep the scheduler's default budget from being the bottleneck
+        os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+        os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+        import batch_grade
+
+        rounds_path = os.path.join(tmp, "rounds.jsonl")
+        write_rounds(rounds_path, args.rounds, args.players)
+        print(f"{'workers':>7} {'seconds':>8} {'rounds/s':>9}")
+        for workers in args.workers:
+            output = os.path.join(tmp, f"graded-{workers}.jsonl")
+            elapsed, _ = run(batch_grade, rounds_path, output, workers)
+            print(f"{workers:>7} {elapsed:>8.2f} {args.rounds / elapsed:>9.1f}")
+
+        with open(output, "rb+") as f:
+            f.truncate(os.path.getsize(output) // 2)
+        requests = server.request_count
+        _, stats = run(batch_grade, rounds_path, output, args.workers[-1])
+        print(f"resume after a crash: {server.request_count - requests} requests")
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Per-call latency of a fresh OpenAI() per call versus the pooled client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_client_pool [--calls 200]
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from llm_client import close_clients, get_client
+
+API_KEY = "sk-benchmark"
+
+
+def _call(client):
+    client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=16,
+    )
+
+
+def bench_fresh_client(base_url, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client = OpenAI(api_key=API_KEY, base_url=base_url)
+        _call(client)
+        client.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_pooled_client(base_url, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        _call(get_client(API_KEY, base_url))
+        timings.append(time.perf_counter() - start)
+    close_clients()
+    return timings
+
+
+def _report(label, timings, connections):
+    ms = [t * 1000 for t in timings]
+    print(f"{label:<14} mean {statistics.mean(ms):7.2f} ms   p50 {statistics.median(ms):7.2f} ms   "
+          f"connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer() as server:
+        _call(OpenAI(api_key=API_KEY, base_url=server.base_url))  # warm up imports and the server
+        server.connection_count = 0
+        fresh = bench_fresh_client(server.base_url, args.calls)
+        fresh_connections = server.connection_count
+
+        server.connection_count = 0
+        pooled = bench_pooled_client(server.base_url, args.calls)
+        pooled_connections = server.connection_count
+
+    _report("fresh client", fresh, fresh_connections)
+    _report("pooled client", pooled, pooled_connections)
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"saved per call: {saved * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Headless games per second with GameEngine and no Streamlit.
+
+Every game seats the players, then plays rounds (start, each player
+submits, grade, advance) until someone reaches the winning score. The
+stub grader hands out random medals in the per-player engine's format, so
+the numbers cover the game rules and score parsing only; --grader offline
+uses the offline scorer instead. Run from the repository root:
+
+    python -m benchmarks.bench_engine [--games 2000] [--players 4] [--grader stub|offline]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from game_engine import GameEngine
+from grading import merge_analysis
+from local_scorer import grade_round_locally
+from prompts import MEDAL_LABELS
+from scenario_catalog import QUESTIONS_PATH, load_catalog
+
+ANSWERS = [
+    "I would apologize, explain what happened and propose a plan to fix it today.",
+    "I would talk to my manager calmly and ask how we can prevent this next time.",
+    "Whatever, I would ignore it.",
+]
+
+
+def make_stub_grader(seed=0):
+    rng = random.Random(seed)
+    medals = list(MEDAL_LABELS)
+
+    def stub_grader(scenario_text, answers, player_names):
+        grades = [(rng.choice(medals), "Feedback.") for _ in player_names]
+        return merge_analysis(player_names, grades, "## 📚 Learning Lesson\nBe kind."), None
+    return stub_grader
+
+
+def make_offline_grader(catalog):
+    def offline_grader(scenario_text, answers, player_names):
+        return grade_round_locally(catalog.by_text(scenario_text), answers, player_names), None
+    return offline_grader
+
+
+def play(game, catalog, grader, rng):
+    """Play one game to the end; returns the number of rounds"""
+    rounds = 0
+    while not game.game_ended:
+        game.start_round(rng.choice(catalog.scenarios))
+        for _ in game.player_names:
+            game.submit(rng.choice(ANSWERS))
+        game.grade(grader)
+        rounds += 1
+        game.advance()
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--grader", choices=["stub", "offline"], default="stub")
+    args = parser.parse_args()
+
+    catalog = load_catalog([QUESTIONS_PATH])
+    grader = make_stub_grader() if args.grader == "stub" else make_offline_grader(catalog)
+    rng = random.Random(1)
+    names = [f"Player {i + 1}" for i in range(args.players)]
+
+    rounds = 0
+    start = time.perf_counter()
+    for _ in range(args.games):
+        rounds += play(GameEngine(names), catalog, grader, rng)
+    elapsed = time.perf_counter() - start
+
+    # Memory held by a finished game, history included
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    game = GameEngine(names)
+    play(game, catalog, grader, rng)
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    print(f"grader {args.grader}, {args.players} players, {args.games} games, {rounds} rounds")
+    print(f"  games/s   {args.games / elapsed:>10.0f}")
+    print(f"  rounds/s  {rounds / elapsed:>10.0f}")
+    print(f"  per round {elapsed / rounds * 1e6:>10.1f}us")
+    print(f"  finished game retains ~{retained / 1024:.1f} KiB ({len(game.history)} rounds of history)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Wall-clock time of combined versus per-player (fan-out) grading.
+
+The fake model takes a fixed time to first token plus a per-token
+generation cost, so the combined call slows down as players are added
+while fan-out calls each stay short. The speculative column is the wait
+after the last submission when every answer was already graded in the
+background while players were still typing. Run from the repository root:
+
+    python -m benchmarks.bench_grading [--per-token-ms 4]
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+API_KEY = "sk-benchmark"
+FEEDBACK = "Solid, professional handling of the situation with clear next steps. " * 12
+LESSON = "**Key principle: own the problem, then communicate early.** " * 8
+
+
+def responder(request):
+    prompt = request["messages"][-1]["content"]
+    if "Evaluate only this one response" in prompt:
+        return f"🥈 SILVER MEDAL\n{FEEDBACK}"
+    if "Write only the learning lesson" in prompt:
+        return LESSON
+    names = re.findall(r"^(Player \d+):", prompt, re.MULTILINE)
+    sections = [f"### {name} - 🥈 SILVER MEDAL\n{FEEDBACK}" for name in names]
+    return "\n\n".join(sections + [LESSON])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--per-token-ms", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    def latency(request, content):
+        return (args.first_token_ms + args.per_token_ms * len(content) / 4) / 1000
+
+    with FakeOpenAIServer(responder=responder, latency=latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        # Imported after OPENAI_BASE_URL is set so the pooled client targets the fake server
+        from grading import SpeculativeRound, get_llm_analysis, get_parallel_llm_analysis
+
+        pool = ThreadPoolExecutor(max_workers=8)
+
+        def speculative(scenario_text, answers, names, api_key):
+            speculation = SpeculativeRound(pool, scenario_text, api_key)
+            for name, answer in zip(names, answers):
+                speculation.add(name, answer)
+            # Players keep typing long enough for their answers to be graded
+            for future in list(speculation._futures.values()):
+                future.result()
+            speculation.start_lesson(answers, names)
+            start = time.perf_counter()
+            result = speculation.finish(answers, names)
+            return result, time.perf_counter() - start
+
+        print(f"{'players':>7} {'combined':>10} {'fan-out':>10} {'speedup':>8} {'speculative':>12}")
+        for num_players in range(2, 7):
+            names = [f"Player {i}" for i in range(1, num_players + 1)]
+            answers = [f"Answer from {name}" for name in names]
+            timings = {}
+            for label, analyze in (("combined", get_llm_analysis), ("fan-out", get_parallel_llm_analysis)):
+                best = None
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    analysis, error = analyze("A scenario", answers, names, API_KEY)
+                    elapsed = time.perf_counter() - start
+                    assert analysis, error
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[label] = best
+            (analysis, error), timings["speculative"] = speculative("A scenario", answers, names, API_KEY)
+            assert analysis, error
+            print(f"{num_players:>7} {timings['combined']:>9.2f}s {timings['fan-out']:>9.2f}s "
+                  f"{timings['combined'] / timings['fan-out']:>7.1f}x {timings['speculative']:>11.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Leaderboard updates and reads with tens of thousands of players.
+
+Records --rounds rounds of --players-per-round players drawn from
+--players, from several threads at once, then compares reading the top 10
+from the incrementally kept ranking with sorting every total on each read
+(what re-sorting a scores dict on every rerun costs at this size). Run from
+the repository root:
+
+    python -m benchmarks.bench_leaderboard [--players 50000] [--rounds 100000] [--threads 8] [--sqlite]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from leaderboard import Leaderboard
+
+SCENARIOS = [f"scenario-{i}" for i in range(40)]
+
+
+def record(leaderboard, rounds, players, per_round, seed, offset):
+    rng = random.Random(seed)
+    for i in range(rounds):
+        names = rng.sample(range(players), per_round)
+        scores = {f"Employee {n}": rng.randint(0, 5) for n in names}
+        leaderboard.record_round(f"game-{seed}:{offset + i}", scores, rng.choice(SCENARIOS))
+
+
+def time_reads(read, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=100_000)
+    parser.add_argument("--players-per-round", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sqlite", action="store_true", help="Log rounds to a SQLite file, as with several workers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        leaderboard = Leaderboard(os.path.join(tmp, "leaderboard.db") if args.sqlite else None)
+        per_thread = args.rounds // args.threads
+        threads = [threading.Thread(target=record, args=(leaderboard, per_thread, args.players,
+                                                         args.players_per_round, seed, 0))
+                   for seed in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stats = leaderboard.stats()
+        print(f"recorded {stats['rounds']:,} rounds for {stats['players']:,} players on {args.threads} threads "
+              f"in {elapsed:.2f}s ({stats['rounds'] / elapsed:,.0f} rounds/s)")
+
+        board = leaderboard._boards[None]
+        expected = sorted(board.totals.items(), key=lambda x: (-x[1], x[0]))[:10]
+        assert [(key, points) for key, points, _ in board.top(10)] == expected
+        name = leaderboard.top(1)[0]["name"]
+        print(f"{'top 10, all-time':<28} {time_reads(lambda: leaderboard.top(10)) * 1e6:>10.1f}us")
+        print(f"{'top 10, one scenario':<28} {time_reads(lambda: leaderboard.top(10, SCENARIOS[0])) * 1e6:>10.1f}us")
+        print(f"{'rank of one player':<28} {time_reads(lambda: leaderboard.rank(name)) * 1e6:>10.1f}us")
+        sort_all = time_reads(lambda: sorted(board.totals.items(), key=lambda x: x[1], reverse=True)[:10], 20)
+        print(f"{'sorting every total':<28} {sort_all * 1e6:>10.1f}us")
+
+        if args.sqlite:
+            start = time.perf_counter()
+            Leaderboard(os.path.join(tmp, "leaderboard.db"))
+            print(f"new worker replays the log in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
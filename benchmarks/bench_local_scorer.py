@@ -0,0 +1,53 @@
+"""Time to grade a round with the offline scorer, by number of players.
+
+Every scenario in questions.json is graded with its own reference answers
+as players' answers, plus a deliberately poor answer, so the run also shows
+that the medals spread out. Run from the repository root:
+
+    python -m benchmarks.bench_local_scorer [--rounds 200]
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from local_scorer import grade_round_locally
+from scenario_catalog import QUESTIONS_PATH, load_catalog
+from scoring import extract_scores_from_analysis
+
+POOR_ANSWER = "Whatever, I would just ignore it and hope it goes away."
+SHORT_ANSWER = "I would talk to my manager about it."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    scenarios = load_catalog([QUESTIONS_PATH]).scenarios
+    medals = Counter()
+    print(f"{'players':>7} {'p50':>9} {'max':>9}")
+    for players in range(2, 7):
+        timings = []
+        for i in range(args.rounds):
+            scenario = scenarios[i % len(scenarios)]
+            pool = scenario["reference_answers"] + [SHORT_ANSWER, POOR_ANSWER]
+            answers = [pool[j % len(pool)] for j in range(players)]
+            names = [f"Player {j + 1}" for j in range(players)]
+            start = time.perf_counter()
+            analysis = grade_round_locally(scenario, answers, names)
+            timings.append(time.perf_counter() - start)
+            for name, answer in zip(names, answers):
+                medals[(answer in scenario["reference_answers"], answer == SHORT_ANSWER,
+                        extract_scores_from_analysis(analysis, [name]).get(name))] += 1
+        print(f"{players:>7} {statistics.median(timings) * 1000:>7.2f}ms {max(timings) * 1000:>7.2f}ms")
+
+    print("points by answer kind (5 = gold ... 1 = 'We Need to Talk'):")
+    for kind, reference, short in (("reference", True, False), ("short", False, True), ("poor", False, False)):
+        spread = {points: n for (is_reference, is_short, points), n in sorted(medals.items())
+                  if (is_reference, is_short) == (reference, short)}
+        print(f"  {kind:<10} {spread}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Cost of the instrumentation: recording a sample, and exporting the registry.
+
+Times Counter.inc and Histogram.observe from one and from several threads
+(the app records from every session and scheduler worker at once), and
+to_prometheus / snapshot on a registry the size of a busy workshop. Run
+from the repository root:
+
+    python -m benchmarks.bench_metrics [--samples 200000] [--threads 8] [--models 4]
+"""
+import argparse
+import random
+import threading
+import time
+
+from metrics import MetricsRegistry
+
+
+def record(metric, samples, labels):
+    if hasattr(metric, "observe"):
+        for i in range(samples):
+            metric.observe(random.random(), **labels[i % len(labels)])
+    else:
+        for i in range(samples):
+            metric.inc(**labels[i % len(labels)])
+
+
+def timed(metric, samples, threads, labels):
+    per_thread = samples // threads
+    workers = [threading.Thread(target=record, args=(metric, per_thread, labels)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--models", type=int, default=4)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    labels = [{"model": f"model-{i}", "outcome": outcome} for i in range(args.models) for outcome in ("ok", "error")]
+    counter = registry.counter("requests_total", "Requests")
+    histogram = registry.histogram("request_seconds", "Latency")
+
+    print(f"{'':<22} {'1 thread':>10} {f'{args.threads} threads':>11}")
+    for name, metric in (("Counter.inc", counter), ("Histogram.observe", histogram)):
+        single = timed(metric, args.samples, 1, labels)
+        threaded = timed(metric, args.samples, args.threads, labels)
+        print(f"{name:<22} {single * 1e6:>8.2f}us {threaded * 1e6:>9.2f}us")
+
+    for i in range(20):
+        registry.histogram(f"extra_{i}_seconds", "Latency").observe(0.1, model="m")
+    for name, export in (("to_prometheus", registry.to_prometheus), ("snapshot", registry.snapshot)):
+        start = time.perf_counter()
+        for _ in range(100):
+            export()
+        print(f"{name:<22} {(time.perf_counter() - start) * 10:>8.2f}ms per export "
+              f"({len(registry.to_prometheus().splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Round pipeline benchmark: per-stage latency, concurrent-game throughput and peak memory.
+
+Simulated games play full rounds (draw a scenario from the deck, build the
+prompt, grade through the LLM client, parse the scores, apply them with the
+winner check, build the exports) against benchmarks/replay.py serving
+recorded fixtures with their recorded timing, so it runs fully offline. At
+each --concurrency level that many games play at once until someone wins.
+Seeds and the replayed replies are fixed, so results are comparable across
+commits: save a run with --json and compare a later one with --baseline.
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline [--concurrency 1 8 32] [--speed 1] [--json run.json] [--baseline run.json]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.record_fixtures import DEFAULT_OUT
+from benchmarks.replay import ReplayServer, load_fixtures
+from exports import build_round_json, build_round_report
+from game_engine import GameEngine
+from latency import percentile
+from prompts import build_analysis_messages
+from scenario_catalog import QUESTIONS_PATH, ScenarioDeck, load_catalog
+from scoring import extract_scores_from_analysis
+from token_budget import analysis_max_tokens
+
+STAGES = [
+    ("scenario", "draw the scenario"),
+    ("prompt", "build the prompt"),
+    ("llm", "grade (LLM call)"),
+    ("parse", "extract the scores"),
+    ("score", "apply scores, winner check"),
+    ("export", "build the exports"),
+]
+# Rounds after which a game without a winner stops
+MAX_ROUNDS = 20
+
+
+def play_game(index, catalog, analyze, players, seed):
+    """Play one game to the end; returns {stage: [seconds per round]}"""
+    rng = random.Random(seed * 1000 + index)
+    names = [f"Player {n + 1}" for n in range(players)]
+    game = GameEngine(names)
+    deck = ScenarioDeck(rng=rng)
+    timings = {stage: [] for stage, _ in STAGES}
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    while not game.game_ended and game.round_number <= MAX_ROUNDS:
+        scenario = timed("scenario", deck.draw, catalog)
+        game.start_round(scenario)
+        for _ in names:
+            game.submit(rng.choice(scenario["reference_answers"]))
+        timed("prompt", lambda: (build_analysis_messages(scenario["scenario"], game.round.answers, names),
+                                 analysis_max_tokens(len(names))))
+        analysis, error = timed("llm", analyze, scenario["scenario"], game.round.answers, names)
+        if not analysis:
+            raise RuntimeError(f"grading failed: {error}")
+        timed("parse", extract_scores_from_analysis, analysis, names)
+        timed("score", game.score_round, analysis, "replay")
+        timed("export", lambda: (build_round_report(game.history[-1]), build_round_json(game.history[-1])))
+        game.advance()
+    return timings
+
+
+def run_level(concurrency, catalog, analyze, players, seed, trace_heap):
+    if trace_heap:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        games = list(pool.map(lambda i: play_game(i, catalog, analyze, players, seed), range(concurrency)))
+    elapsed = time.perf_counter() - start
+    heap_peak = tracemalloc.get_traced_memory()[1] if trace_heap else None
+    if trace_heap:
+        tracemalloc.stop()
+    rounds = sum(len(game["llm"]) for game in games)
+    stages = {}
+    for stage, _ in STAGES:
+        samples = sorted(s for game in games for s in game[stage])
+        stages[stage] = {
+            "p50_ms": statistics.median(samples) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000
+        }
+    return {
+        "concurrency": concurrency,
+        "games": concurrency,
+        "rounds": rounds,
+        "seconds": elapsed,
+        "rounds_per_second": rounds / elapsed,
+        "games_per_second": concurrency / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heap_peak_mb": heap_peak / 2 ** 20 if heap_peak is not None else None,
+        "stages": stages
+    }
+
+
+def _change(now, before):
+    if not before:
+        return ""
+    return f" ({(now - before) / before:+.0%})"
+
+
+def report(levels, baseline=None):
+    previous = {level["concurrency"]: level for level in (baseline or {}).get("levels", [])}
+    print(f"{'games':>5} {'rounds':>6} {'seconds':>8} {'rounds/s':>16} {'peak RSS':>17} {'heap peak':>10}")
+    for level in levels:
+        before = previous.get(level["concurrency"], {})
+        heap = f"{level['heap_peak_mb']:.1f}MB" if level["heap_peak_mb"] is not None else "-"
+        print(f"{level['games']:>5} {level['rounds']:>6} {level['seconds']:>8.2f} "
+              f"{level['rounds_per_second']:>7.2f}{_change(level['rounds_per_second'], before.get('rounds_per_second')):<9} "
+              f"{level['peak_rss_mb']:>6.1f}MB{_change(level['peak_rss_mb'], before.get('peak_rss_mb')):<9} {heap:>10}")
+    for level in levels:
+        before = previous.get(level["concurrency"], {}).get("stages", {})
+        print(f"\nstages with {level['games']} concurrent games")
+        print(f"  {'':<28} {'p50':>10} {'p95':>10} {'mean':>10}")
+        for stage, label in STAGES:
+            row = level["stages"][stage]
+            change = _change(row["p50_ms"], before.get(stage, {}).get("p50_ms"))
+            print(f"  {label:<28} {row['p50_ms']:>8.3f}ms {row['p95_ms']:>8.3f}ms {row['mean_ms']:>8.3f}ms{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", nargs="+", default=[DEFAULT_OUT])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--engine", choices=["combined", "per-player"], default="combined")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than recorded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--heap", action="store_true", help="Also trace the Python heap peak (slows the CPU stages)")
+    parser.add_argument("--json", help="Save the results here")
+    parser.add_argument("--baseline", help="Results saved by an earlier run, to show the change")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with ReplayServer(load_fixtures(*args.fixtures), speed=args.speed) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        # The replay server has no rate limit; keep the scheduler's default budget from being the bottleneck
+        os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+        os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+        from grading import get_llm_analysis, get_parallel_llm_analysis
+
+        def analyze(scenario_text, answers, names):
+            if args.engine == "combined":
+                return get_llm_analysis(scenario_text, answers, names, "sk-replay", fallback_model=None)
+            return get_parallel_llm_analysis(scenario_text, answers, names, "sk-replay")
+
+        catalog = load_catalog([QUESTIONS_PATH])
+        levels = [run_level(n, catalog, analyze, args.players, args.seed, args.heap) for n in args.concurrency]
+        print(f"{args.engine} engine, {args.players} players, replay at {args.speed:g}x: "
+              f"{server.exact_hits} exact and {server.kind_hits} substituted replies\n")
+
+    report(levels, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"engine": args.engine, "players": args.players, "speed": args.speed, "seed": args.seed,
+                       "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
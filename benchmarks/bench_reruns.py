@@ -0,0 +1,105 @@
+"""Server-side execution time per interaction: full-script rerun versus fragment rerun.
+
+Before fragments every button press re-executed all of main(); now an
+answer submission or a download click re-executes only its fragment. Both
+are measured on the real main.py with Streamlit's AppTest harness from the
+same session state: the fragment case asks for a fragment-scoped rerun, as
+the browser does for a widget inside the fragment. AppTest recompiles the
+script on every run, which a server does once, so the runs share one
+compiled-script cache. The harness's remaining cost per run (an empty
+script) is reported too; it is part of both columns.
+Run from the repository root:
+
+    python -m benchmarks.bench_reruns [--runs 30]
+"""
+import argparse
+import inspect
+import os
+import statistics
+import time
+from functools import partial
+from unittest import mock
+
+import streamlit.testing.v1.app_test as app_test
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+
+from game_engine import GameEngine
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+PLAYERS = ["Alice", "Bob", "Chen", "Dana", "Eli", "Fatima"]
+
+
+def _seed(at, show_analysis):
+    scenario = {"id": "the-late-arrival", "title": "The Late Arrival",
+                "scenario": "You are late for work and your boss is angry. What would you do?", "tags": []}
+    game = GameEngine(PLAYERS)
+    game.scores = {name: i for i, name in enumerate(PLAYERS)}
+    game.start_round(scenario)
+    if show_analysis:
+        for name in PLAYERS:
+            game.submit(f"{name} apologizes and explains.")
+        game.score_round("\n\n".join(f"### {name}\n🥈 SILVER MEDAL\n" + "Feedback. " * 80 for name in PLAYERS),
+                         "gpt-3.5-turbo")
+    else:
+        for _ in range(3):
+            game.submit("An answer.")
+    at.session_state["num_players"] = len(PLAYERS)
+    at.session_state["game"] = game
+    return at
+
+
+def _median_ms(at, runs):
+    at.run()  # warm up imports and caches
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+    return statistics.median(timings) * 1000
+
+
+def _fragment_id(at, fragment):
+    """Id of the fragment the last run of at registered for the function named fragment"""
+    # AppTest has no public handle on fragments; the id is keyed to the wrapped function
+    for fragment_id, wrapped in at._fragment_storage._fragments.items():
+        if inspect.getclosurevars(wrapped).nonlocals.get("non_optional_func").__name__ == fragment:
+            return fragment_id
+    raise LookupError(f"{fragment} did not run")
+
+
+def _fragment_median_ms(at, fragment, runs):
+    """Like _median_ms, but every run after the first full one reruns only the fragment"""
+    at.run()
+    scoped = partial(RerunData, fragment_id_queue=[_fragment_id(at, fragment)], is_fragment_scoped_rerun=True)
+    with mock.patch.object(local_script_runner, "RerunData", scoped):
+        return _median_ms(at, runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    # One compiled-script cache for every run, as a server keeps
+    script_cache = ScriptCache()
+    with mock.patch.object(app_test, "ScriptCache", lambda: script_cache), \
+            mock.patch.object(local_script_runner, "ScriptCache", lambda: script_cache):
+        overhead = _median_ms(AppTest.from_string("", default_timeout=60), args.runs)
+        print(f"{'interaction':<24} {'full rerun':>12} {'fragment':>12}")
+        for label, fragment, show_analysis in (
+            ("submit answer", "render_answer_entry", False),
+            ("download / analysis", "render_analysis_results", True),
+        ):
+            full = _median_ms(_seed(AppTest.from_file(MAIN_SCRIPT, default_timeout=60), show_analysis), args.runs)
+            scoped = _fragment_median_ms(_seed(AppTest.from_file(MAIN_SCRIPT, default_timeout=60), show_analysis),
+                                         fragment, args.runs)
+            print(f"{label:<24} {full:>10.1f}ms {scoped:>10.1f}ms")
+        print(f"{'(harness, empty script)':<24} {overhead:>10.1f}ms {overhead:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
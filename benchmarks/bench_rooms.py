@@ -0,0 +1,99 @@
+"""Load test of the in-process room registry with many simultaneous rooms.
+
+Every simulated player joins its room, waits for the host to start a
+round, thinks for a random moment and submits on its own thread. A stub
+grader stands in for the LLM. Run from the repository root:
+
+    python -m benchmarks.bench_rooms [--rooms 500 --players 4]
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rooms import RoomRegistry
+
+SCENARIO = {"title": "The Late Arrival", "scenario": "You are late for work and your boss is angry."}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--think-ms", type=float, default=50)
+    parser.add_argument("--grade-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=512)
+    args = parser.parse_args()
+
+    def grader(scenario_text, answers, player_names):
+        time.sleep(args.grade_ms / 1000)
+        return "\n".join(f"### {name}\n🥈 SILVER MEDAL" for name in player_names), None
+
+    registry = RoomRegistry(max_grading_workers=64)
+    last_answer_at = {}
+    graded_at = {}
+    graded_count = {}
+    all_graded = threading.Event()
+    count_lock = threading.Lock()
+
+    def on_change(room):
+        # Called under room.lock by the registry
+        if room.status == "grading":
+            last_answer_at[room.code] = time.perf_counter()
+        elif room.status == "graded":
+            graded_at[room.code] = time.perf_counter()
+            with count_lock:
+                graded_count[room.code] = graded_count.get(room.code, 0) + 1
+                if len(graded_count) == args.rooms:
+                    all_graded.set()
+
+    rooms = []
+    host_tokens = {}
+    for i in range(args.rooms):
+        room, token = registry.create_room(f"host-{i}")
+        host_tokens[room.code] = token
+        registry.subscribe(room, on_change)
+        rooms.append(room)
+
+    def play(room, name):
+        if name == room.host_name:
+            token = host_tokens[room.code]
+        else:
+            token, error = registry.join(room, name)
+            assert error is None, error
+        version = room.version
+        while room.status != "answering":
+            version = registry.wait_for_change(room, version, timeout=5)
+        time.sleep(random.uniform(0, args.think_ms) / 1000)
+        assert registry.submit(room, token, f"{name} apologizes and explains")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for room in rooms:
+            names = [room.host_name] + [f"{room.code}-p{j}" for j in range(1, args.players)]
+            futures += [pool.submit(play, room, name) for name in names]
+        # Hosts start once everyone is in, as in the UI
+        for room in rooms:
+            while len(room.player_names) < args.players:
+                time.sleep(0.001)
+            registry.start_round(room, host_tokens[room.code], SCENARIO, grader)
+        for future in futures:
+            future.result()
+    all_graded.wait(timeout=120)
+    elapsed = time.perf_counter() - start
+
+    latencies = [(graded_at[code] - last_answer_at[code]) * 1000 for code in graded_at]
+    submissions = args.rooms * args.players
+    print(f"rooms: {args.rooms}  players/room: {args.players}  submissions: {submissions}")
+    print(f"wall time: {elapsed:.2f}s  ({submissions / elapsed:.0f} submissions/s)")
+    print(f"rooms graded: {len(graded_count)}/{args.rooms}  "
+          f"graded more than once: {sum(1 for n in graded_count.values() if n > 1)}")
+    print(f"last answer -> graded: p50 {statistics.median(latencies):.1f}ms  "
+          f"max {max(latencies):.1f}ms  (grader {args.grade_ms:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
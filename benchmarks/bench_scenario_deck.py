@@ -0,0 +1,118 @@
+"""Time to a new round's scenario, and how often scenarios repeat.
+
+Compares generating a scenario on demand (one LLM call per round, against
+the local fake server with --latency-ms) with taking one from a
+ScenarioProducer stock filled in the background, then counts repeats over
+a game of --rounds rounds when dealing with random.choice versus a
+ScenarioDeck, and what a deck costs per rerun and per session with a
+--catalog-size scenario catalog. Run from the repository root:
+
+    python -m benchmarks.bench_scenario_deck [--rounds 30] [--latency-ms 1500] [--catalog-size 100000]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from scenario_catalog import QUESTIONS_PATH, ScenarioCatalog, ScenarioDeck, load_catalog
+
+_counter = itertools.count()
+
+
+def responder(request):
+    n = next(_counter)
+    topic = request["messages"][-1]["content"]
+    return json.dumps({
+        "title": f"Generated case {n}",
+        "scenario": f"Case {n} ({topic}): " + " ".join(f"detail{n}-{i}" for i in range(25)) + " What would you do?",
+        "reference_answers": ["I would stay calm, talk to the people involved, explain the impact honestly "
+                              "and agree on a concrete plan with a follow-up date."],
+        "rubric": {"communication": ["talk", "explain"]}
+    })
+
+
+def repeats(draw, rounds):
+    """(round of the first repeat, rounds that repeat the one just played) over one game"""
+    seen, first_repeat, back_to_back, last = set(), None, 0, None
+    for round_number in range(1, rounds + 1):
+        scenario_id = draw()["id"]
+        if scenario_id in seen and first_repeat is None:
+            first_repeat = round_number
+        back_to_back += scenario_id == last
+        seen.add(scenario_id)
+        last = scenario_id
+    return first_repeat or rounds + 1, back_to_back
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=1500)
+    parser.add_argument("--games", type=int, default=200, help="Games averaged for the repeat counts")
+    parser.add_argument("--catalog-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(responder=responder, latency=args.latency_ms / 1000) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        from scenario_producer import SCENARIO_TOPICS, ScenarioProducer
+
+        producer = ScenarioProducer("sk-fake", pool_size=1)
+        on_demand = []
+        for topic in SCENARIO_TOPICS[:3]:
+            start = time.perf_counter()
+            producer.generate(topic, "medium")
+            on_demand.append(time.perf_counter() - start)
+
+        producer.start()
+        while sum(producer.stats()["ready"].values()) < len(SCENARIO_TOPICS):
+            time.sleep(0.05)
+        stocked = []
+        for topic in SCENARIO_TOPICS:
+            start = time.perf_counter()
+            assert producer.take(topic) is not None
+            stocked.append(time.perf_counter() - start)
+        producer.stop()
+
+    print(f"time to scenario, {args.latency_ms:.0f}ms model latency")
+    print(f"  generated on demand {statistics.median(on_demand) * 1000:>10.1f}ms")
+    print(f"  taken from stock    {statistics.median(stocked) * 1000:>10.3f}ms")
+
+    catalog = load_catalog([QUESTIONS_PATH])
+    rng = random.Random(0)
+    results = {"random.choice": [], "ScenarioDeck": []}
+    for _ in range(args.games):
+        results["random.choice"].append(repeats(lambda: rng.choice(catalog.scenarios), args.rounds))
+        deck = ScenarioDeck(rng=rng)
+        results["ScenarioDeck"].append(repeats(lambda: deck.draw(catalog), args.rounds))
+    print(f"{args.rounds}-round games, {len(catalog.scenarios)} scenarios in the catalog")
+    print(f"  {'':<14} {'first repeat':>12} {'same as last':>12}")
+    for name, games in results.items():
+        print(f"  {name:<14} {statistics.mean(g[0] for g in games):>12.1f} "
+              f"{statistics.mean(g[1] for g in games):>12.2f}")
+
+
+    large = ScenarioCatalog({"title": f"Case {i}", "scenario": f"Case {i} text", "tags": [SCENARIO_TOPICS[i % len(SCENARIO_TOPICS)]]}
+                            for i in range(args.catalog_size))
+    tracemalloc.start()
+    deck = ScenarioDeck(rng=rng)
+    timings = {"draw": [], "remaining": [], "remaining with a tag": []}
+    for _ in range(args.rounds):
+        for name, call in (("draw", lambda: deck.draw(large)), ("remaining", lambda: deck.remaining(large)),
+                           ("remaining with a tag", lambda: deck.remaining(large, "conflict"))):
+            start = time.perf_counter()
+            call()
+            timings[name].append(time.perf_counter() - start)
+    deck_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"deck over {args.catalog_size} scenarios, {args.rounds} rounds, {deck_bytes / 1024:.1f}KB per session")
+    for name, samples in timings.items():
+        print(f"  {name:<22} {statistics.median(samples) * 1000:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Many games grading at once against a rate-limited fake provider.
+
+One bulk game queues a large batch first, then every other game grades a
+round with the per-player engine (one call per player plus the lesson).
+Uncoordinated calls with the SDK's own retries are compared with the
+shared request scheduler. Run from the repository root:
+
+    python -m benchmarks.bench_scheduler [--games 30 --bulk 120]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import RateLimitedFakeServer
+from latency import percentile
+from llm_client import estimate_tokens, get_client, retry_delay
+from scheduler import RequestScheduler, request_context
+
+API_KEY = "sk-bench"
+
+
+def _request(game, i):
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [{"role": "user", "content": f"Evaluate answer {i} of game {game}. " * 8}],
+        "max_tokens": 700,
+    }
+
+
+def run(label, workload, send, server):
+    """Send every (game, request) at once; return the row of results"""
+    server.rate_limited = server.server_errors = 0
+    finished = {}
+    failed_games = set()
+    failures = 0
+    start = time.perf_counter()
+
+    def timed(game, request):
+        try:
+            return send(game, request)
+        except Exception:
+            failed_games.add(game)
+            raise
+        finally:
+            finished[game] = max(finished.get(game, 0), time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=256) as pool:
+        futures = [pool.submit(timed, game, request) for game, request in workload]
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                failures += 1
+    wall = time.perf_counter() - start
+    small = sorted(t for game, t in finished.items() if game != "bulk" and game not in failed_games)
+    games_ok = sum(1 for game in finished if game != "bulk" and game not in failed_games)
+    return (label, len(workload) - failures, failures, server.rate_limited, server.server_errors, wall,
+            games_ok, statistics.median(small) if small else None,
+            percentile(small, 0.95) if small else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=30)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--bulk", type=int, default=120, help="calls queued by the bulk game first")
+    parser.add_argument("--rpm", type=int, default=3000)
+    parser.add_argument("--tpm", type=int, default=1_200_000)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    workload = [("bulk", _request("bulk", i)) for i in range(args.bulk)]
+    workload += [(f"game-{g}", _request(g, i)) for g in range(args.games) for i in range(args.players + 1)]
+
+    with RateLimitedFakeServer(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, burst_seconds=1,
+                               error_rate=args.error_rate, latency=0.05) as server:
+        # Before: every session called the SDK directly and relied on its two retries
+        direct_client = OpenAI(api_key=API_KEY, base_url=server.base_url, max_retries=2)
+
+        def send_direct(game, request):
+            return direct_client.chat.completions.create(**request)
+
+        scheduler = RequestScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, burst_seconds=1,
+                                     retry_after=retry_delay)
+        client = get_client(API_KEY, server.base_url)
+
+        def send_scheduled(game, request):
+            with request_context(game=game):
+                return scheduler.call(API_KEY, lambda: client.chat.completions.create(**request),
+                                      estimate_tokens(request))
+
+        rows = [
+            run("direct", workload, send_direct, server),
+            run("scheduled", workload, send_scheduled, server),
+        ]
+
+    calls = len(workload)
+    print(f"{calls} calls: {args.bulk} bulk + {args.games} games x {args.players + 1}, "
+          f"limits {args.rpm} req/min, {args.tpm} tokens/min")
+    print("games ok: non-bulk games whose every call succeeded; p50/p95: time until such a game was fully graded")
+    print(f"{'mode':<10} {'ok':>5} {'failed':>6} {'429s':>5} {'5xx':>4} {'wall':>7} "
+          f"{'games ok':>9} {'game p50':>9} {'game p95':>9}")
+    for label, ok, failed, limited, errors, wall, games_ok, p50, p95 in rows:
+        p50, p95 = (f"{t:.2f}s" if t is not None else "-" for t in (p50, p95))
+        print(f"{label:<10} {ok:>5} {failed:>6} {limited:>5} {errors:>4} {wall:>6.2f}s "
+              f"{games_ok:>4}/{args.games:<4} {p50:>9} {p95:>9}")
+    print(f"scheduler: {scheduler.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Accuracy and speed of score extraction over the scoring corpus.
+
+Compares the original find()-window heuristic with the score-block parser
+and single-pass tokenizer in scoring.py. Exits non-zero if the current
+extractor misreads any case. Run from the repository root:
+
+    python -m benchmarks.bench_scoring
+"""
+import sys
+import time
+
+from benchmarks.scoring_corpus import build_corpus
+from scoring import SCORE_MAP, extract_scores_from_analysis
+
+
+def legacy_extract_scores(analysis_text, player_names):
+    """The substring-window heuristic extract_scores_from_analysis used to run"""
+    scores = {}
+    for name in player_names:
+        scores[name] = 0
+        for medal, points in SCORE_MAP.items():
+            medal_index = analysis_text.find(medal)
+            if medal_index != -1:
+                context = analysis_text[max(0, medal_index - 100):medal_index + 100]
+                if name.lower() in context.lower():
+                    scores[name] = points
+                    break
+    return scores
+
+
+def _time(extract, text, names, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = extract(text, names)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    failures = 0
+    totals = {"legacy": 0.0, "current": 0.0}
+    correct = {"legacy": 0, "current": 0}
+    cases = build_corpus()
+    print(f"{'case':<32} {'chars':>8} {'legacy':>10} {'current':>10}  ok")
+    for label, text, names, expected_medals in cases:
+        expected = {name: SCORE_MAP[medal] for name, medal in expected_medals.items()}
+        repeat = 3 if len(names) > 50 else 20
+        row = {}
+        ok = False
+        for key, extract in (("legacy", legacy_extract_scores), ("current", extract_scores_from_analysis)):
+            elapsed, result = _time(extract, text, names, repeat)
+            totals[key] += elapsed
+            row[key] = elapsed
+            correct[key] += result == expected
+            if key == "current":
+                ok = result == expected
+                failures += not ok
+        print(f"{label:<32} {len(text):>8} {row['legacy'] * 1000:>8.2f}ms {row['current'] * 1000:>8.2f}ms  "
+              f"{'yes' if ok else 'NO'}")
+
+    print(f"\ncorrect: legacy {correct['legacy']}/{len(cases)}, current {correct['current']}/{len(cases)}")
+    print(f"total time: legacy {totals['legacy'] * 1000:.1f}ms, current {totals['current'] * 1000:.1f}ms")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
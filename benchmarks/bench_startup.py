@@ -0,0 +1,60 @@
+"""Cold-start regression check: fails when importing the app exceeds a time budget.
+
+Measures, each in fresh interpreters and as the median of --runs:
+  * importing main after Streamlit (what a new worker pays on its first script run)
+  * a whole `python -c "import main"` process, interpreter start-up and Streamlit included
+and, in this process, re-executing main.py's module body the way Streamlit
+does on every rerun. Exits with status 1 when the first figure is above
+--budget-ms, printing the import breakdown to show what grew. Run from the
+repository root:
+
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 150]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from profile_startup import ROOT, format_report, import_seconds, process_seconds, profile_imports
+
+# Median import time of main after Streamlit, in milliseconds, above which the check fails
+DEFAULT_BUDGET_MS = 150
+
+
+def rerun_seconds(runs):
+    """Median time to execute main.py's module body again with every import cached"""
+    path = os.path.join(ROOT, "main.py")
+    with open(path, encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+    import main  # noqa: F401  -- first import, so the timed runs below are reruns
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        exec(code, {"__name__": "__rerun__", "__file__": path})
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    imports = statistics.median(import_seconds() for _ in range(args.runs))
+    process = statistics.median(process_seconds() for _ in range(args.runs))
+    rerun = rerun_seconds(args.runs * 4)
+
+    print(f"import main after streamlit {imports * 1000:>8.1f}ms  (budget {args.budget_ms:.0f}ms)")
+    print(f"fresh process, import main  {process * 1000:>8.1f}ms")
+    print(f"rerun of main.py's body     {rerun * 1000:>8.1f}ms")
+    if imports * 1000 > args.budget_ms:
+        print(f"\nFAIL: cold start is over budget by {imports * 1000 - args.budget_ms:.1f}ms\n")
+        print(format_report(profile_imports()))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Tokens sent and reserved per combined analysis, before and after token budgeting.
+
+Before: uncapped answers and max_tokens=4096 whatever the round. After:
+answers capped by token_budget.cap_answer and max_tokens scaled to the
+player count. The provider (and the request scheduler) reserve prompt +
+max_tokens against the per-minute token limit, so the reservation decides
+how many rounds fit in a minute. Run from the repository root:
+
+    python -m benchmarks.bench_tokens [--tpm 90000]
+"""
+import argparse
+
+from prompts import SCORE_BLOCK_INSTRUCTIONS, SYSTEM_PROMPT, build_analysis_messages
+from token_budget import analysis_max_tokens, count_message_tokens, tiktoken
+
+SCENARIO = "You are late for work and your boss is angry. What would you do?"
+SHORT_ANSWER = "I would apologize, explain the traffic jam, and offer to stay late to make up the time."
+ESSAY_ANSWER = " ".join([
+    "First I would take a breath and acknowledge that being late affects the whole team.",
+    "Then I would apologize directly without making excuses, explain briefly what happened,",
+    "and describe the concrete steps I am taking so it does not happen again, such as leaving earlier,",
+    "checking traffic the night before and letting my manager know as soon as I see a delay coming.",
+] * 12)
+
+
+def legacy_messages(answers, names):
+    formatted = "".join(f"{name}: {answer}\n\n" for name, answer in zip(names, answers))
+    user_prompt = f"""
+Scenario: {SCENARIO}
+
+Student Answers:
+{formatted}
+
+Please evaluate these responses using the ranking system and provide feedback with a learning lesson. Make sure to clearly identify which medal/trophy each player receives.
+
+{SCORE_BLOCK_INSTRUCTIONS}
+"""
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tpm", type=int, default=90000, help="provider tokens-per-minute limit")
+    args = parser.parse_args()
+
+    print(f"token counts: {'tiktoken' if tiktoken else 'local estimate (tiktoken not installed)'}")
+    print(f"{'answers':<8} {'players':>7} {'prompt before':>14} {'after':>6} "
+          f"{'reserved before':>16} {'after':>6} {'rounds/min before':>18} {'after':>6}")
+    for label, answer in (("short", SHORT_ANSWER), ("essay", ESSAY_ANSWER)):
+        for players in range(2, 7):
+            names = [f"Player {i}" for i in range(1, players + 1)]
+            answers = [answer] * players
+            before = count_message_tokens(legacy_messages(answers, names))
+            after = count_message_tokens(build_analysis_messages(SCENARIO, answers, names))
+            reserved_before = before + 4096
+            reserved_after = after + analysis_max_tokens(players)
+            print(f"{label:<8} {players:>7} {before:>14} {after:>6} {reserved_before:>16} {reserved_after:>6} "
+                  f"{args.tpm / reserved_before:>18.1f} {args.tpm / reserved_after:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Local stub server speaking the OpenAI chat completions API.
+
+Used by the benchmarks so they run fully offline and give comparable
+numbers across commits.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(request):
+    """Reply with a fixed one-medal analysis"""
+    return "🥇 GOLD MEDAL: Player 1\n\nGreat answer!"
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP/1.1 server answering POST /v1/chat/completions
+
+    responder(request_json) -> str produces the assistant message.
+    latency is seconds of simulated model time per request, or a callable
+    latency(request, content) -> seconds; for streamed requests it is spread
+    evenly over stream_chunks chunks.
+    """
+
+    def __init__(self, responder=default_responder, latency=0.0, stream_chunks=20, host="127.0.0.1", port=0):
+        self.responder = responder
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.request_count = 0
+        self.connection_count = 0
+        self._count_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._count_lock:
+                    server.connection_count += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._count_lock:
+                    server.request_count += 1
+                status, headers, body = server.handle(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if isinstance(body, (bytes, bytearray)):
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    # Iterable of chunks: stream with chunked transfer encoding
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in body:
+                        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def _latency(self, request, content):
+        return self.latency(request, content) if callable(self.latency) else self.latency
+
+    def handle(self, request):
+        """Return (status, headers, body) for one chat completions request"""
+        content = self.responder(request)
+        if request.get("stream"):
+            return 200, {"Content-Type": "text/event-stream"}, self._stream(request, content)
+        latency = self._latency(request, content)
+        if latency:
+            time.sleep(latency)
+        body = json.dumps(completion_payload(request, content)).encode("utf-8")
+        return 200, {"Content-Type": "application/json"}, body
+
+    def _stream(self, request, content):
+        size = max(1, -(-len(content) // self.stream_chunks))
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        latency = self._latency(request, content)
+        for piece in pieces:
+            if latency:
+                time.sleep(latency / len(pieces))
+            payload = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+        yield from usage_chunk(request, content)
+        yield b"data: [DONE]\n\n"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RateLimitedFakeServer(FakeOpenAIServer):
+    """Fake server that enforces per-minute request and token limits like the real API
+
+    Requests over either limit get a 429 with a retry-after header; a
+    further error_rate of requests fail with a 503. Tokens are counted as
+    prompt characters / 4 plus max_tokens, the way the provider reserves them.
+    Unused allowance accumulates for at most burst_seconds.
+    """
+
+    def __init__(self, requests_per_minute=600, tokens_per_minute=60000, burst_seconds=60, error_rate=0.0,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.error_rate = error_rate
+        self.rate_limited = 0
+        self.server_errors = 0
+        self._rates = {"requests": requests_per_minute / 60, "tokens": tokens_per_minute / 60}
+        self._capacity = {name: rate * burst_seconds for name, rate in self._rates.items()}
+        self._available = dict(self._capacity)
+        self._updated = time.monotonic()
+
+    def _admit(self, request):
+        cost = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4 + request.get("max_tokens", 0)
+        needed = {"requests": 1, "tokens": cost}
+        with self._count_lock:
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            for name, rate in self._rates.items():
+                self._available[name] = min(self._capacity[name], self._available[name] + elapsed * rate)
+            shortfall = max((needed[name] - self._available[name]) / rate for name, rate in self._rates.items())
+            if shortfall > 0:
+                self.rate_limited += 1
+                return 429, shortfall
+            if random.random() < self.error_rate:
+                self.server_errors += 1
+                return 503, 0
+            for name in needed:
+                self._available[name] -= needed[name]
+            return 200, 0
+
+    def handle(self, request):
+        status, retry_after = self._admit(request)
+        if status == 200:
+            return super().handle(request)
+        error = {"error": {"message": "Rate limit reached" if status == 429 else "Service unavailable",
+                           "type": "requests", "code": None}}
+        headers = {"Content-Type": "application/json"}
+        if retry_after:
+            headers["retry-after"] = f"{retry_after:.3f}"
+        return status, headers, json.dumps(error).encode("utf-8")
+
+
+def usage_payload(request, content, prompt_tokens=None, completion_tokens=None):
+    """Token usage of a response, estimated at four characters per token unless given"""
+    if prompt_tokens is None:
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+    if completion_tokens is None:
+        completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def usage_chunk(request, content, prompt_tokens=None, completion_tokens=None):
+    """The final usage-only stream event, when the request set stream_options.include_usage"""
+    if (request.get("stream_options") or {}).get("include_usage"):
+        payload = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [],
+            "usage": usage_payload(request, content, prompt_tokens, completion_tokens),
+        }
+        yield f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+def completion_payload(request, content, prompt_tokens=None, completion_tokens=None):
+    """Build a chat.completion response body"""
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage_payload(request, content, prompt_tokens, completion_tokens),
+    }
@@ -0,0 +1,130 @@
+"""Record round-pipeline LLM calls to a fixture file for benchmarks/replay.py.
+
+Plays --rounds rounds of catalog scenarios with 2-4 players through the
+app's own grading paths (combined, per-player and streamed, in turn) with
+LLM_RECORD_PATH pointing at --out, so every request, reply and timing is
+captured by the same recorder the app uses. With --live the calls go to the
+real API (OPENAI_API_KEY); without it they go to a local synthetic model
+whose replies follow the prompt formats and whose latency grows with the
+reply length, with log-normal noise. Run from the repository root:
+
+    python -m benchmarks.record_fixtures [--out benchmarks/fixtures/rounds.jsonl] [--rounds 24] [--live]
+"""
+import argparse
+import json
+import os
+import random
+import threading
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.replay import player_names
+from prompts import ANALYSIS_SYSTEM_PROMPT, MEDAL_LABELS
+from scenario_catalog import QUESTIONS_PATH, load_catalog
+
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rounds.jsonl")
+# Synthetic model: seconds before the first token, and characters written per second
+FIRST_TOKEN_SECONDS = 0.6
+CHARS_PER_SECOND = 350
+
+FEEDBACK = [
+    "You owned the problem and proposed a concrete next step, which is exactly what a manager wants to hear.",
+    "Good instinct to communicate early, but the plan stays vague; say who does what and by when.",
+    "Calm and professional. Adding how you would prevent this next time would make it outstanding.",
+    "This reads like an out-of-office reply: polite, but it avoids the actual issue.",
+    "Blaming the printer is a classic, but the printer never gets the performance review.",
+]
+LESSON = ("## 📚 Learning Lesson\n\n**Own it, fix it, prevent it.** Acknowledge the problem, propose a concrete fix "
+          "with a time frame and explain how it will not happen again.\n\n*Bonus tip:* bring the solution "
+          "together with the bad news.")
+
+
+class SyntheticModel:
+    """Replies in the formats the prompts ask for, with length-dependent latency"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def reply(self, request):
+        messages = request.get("messages", [])
+        names = player_names(messages)
+        with self.lock:
+            medals = [self.rng.choice(list(MEDAL_LABELS)) for _ in names]
+            feedback = [self.rng.choice(FEEDBACK) for _ in names]
+        system = messages[0]["content"] if messages else ""
+        if system == ANALYSIS_SYSTEM_PROMPT:
+            sections = [f"### {name}\n{medal} {MEDAL_LABELS[medal]}\n\n{text}"
+                        for name, medal, text in zip(names, medals, feedback)]
+            block = json.dumps({"scores": [{"player": name, "medal": medal} for name, medal in zip(names, medals)]},
+                               ensure_ascii=False)
+            return "\n\n---\n\n".join(sections + [LESSON]) + f"\n\n```json\n{block}\n```"
+        if "Student Answer:" in messages[-1]["content"]:
+            return f"{medals[0]} {MEDAL_LABELS[medals[0]]}\n\n{feedback[0]}"
+        return LESSON
+
+    def latency(self, request, content):
+        with self.lock:
+            noise = self.rng.lognormvariate(0, 0.35)
+        return (FIRST_TOKEN_SECONDS + len(content) / CHARS_PER_SECOND) * noise
+
+
+def play_round(llm, grading, engine, scenario, answers, names, api_key, model):
+    if engine == "combined":
+        return grading.get_llm_analysis(scenario["scenario"], answers, names, api_key, model, fallback_model=None)
+    if engine == "per-player":
+        return grading.get_parallel_llm_analysis(scenario["scenario"], answers, names, api_key, model)
+    # The request main.open_analysis_stream makes
+    from prompts import TEMPERATURE, build_analysis_messages
+    from token_budget import analysis_max_tokens
+    messages = build_analysis_messages(scenario["scenario"], answers, names)
+    stream = llm.hedged_chat_stream(api_key, None, model=model, messages=messages,
+                                    max_tokens=analysis_max_tokens(len(names)), temperature=TEMPERATURE)
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--rounds", type=int, default=24)
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--live", action="store_true", help="Record the real API instead of the synthetic model")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    if os.path.exists(args.out):
+        os.remove(args.out)
+    # Both are read when llm_client is imported
+    os.environ["LLM_RECORD_PATH"] = args.out
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+    server = None
+    if not args.live:
+        model = SyntheticModel(args.seed)
+        server = FakeOpenAIServer(responder=model.reply, latency=model.latency).start()
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+    api_key = os.environ.get("OPENAI_API_KEY") if args.live else "sk-synthetic"
+    if not api_key:
+        parser.error("--live needs OPENAI_API_KEY")
+
+    import grading
+    import llm_client
+
+    rng = random.Random(args.seed)
+    scenarios = load_catalog([QUESTIONS_PATH]).scenarios
+    engines = ["combined", "per-player", "stream"]
+    try:
+        for i in range(args.rounds):
+            scenario = rng.choice(scenarios)
+            names = [f"Player {n + 1}" for n in range(rng.randint(2, 4))]
+            answers = [rng.choice(scenario["reference_answers"]) for _ in names]
+            engine = engines[i % len(engines)]
+            analysis, error = play_round(llm_client, grading, engine, scenario, answers, names, api_key, args.model)
+            print(f"round {i + 1:>3} {engine:<10} {len(names)} players: {error or f'{len(analysis)} chars'}")
+    finally:
+        if server is not None:
+            server.stop()
+    print(f"{llm_client.recorder.recorded} calls recorded to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Fake OpenAI server that replays recorded calls with their recorded timing.
+
+Fixtures are the JSONL files written with LLM_RECORD_PATH set (see
+recorder.py and benchmarks/record_fixtures.py). A request recorded before
+gets its own reply back. Any other request gets a recorded reply to the same
+kind of request (same system prompt and number of players, the same model
+when there is one), with the recorded player names swapped for the ones
+asked about, so the scores still parse. The choice depends only on the
+request, which makes runs comparable across commits.
+"""
+import hashlib
+import json
+import re
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer, completion_payload, usage_chunk
+from recorder import request_key
+
+# Player lines of the analysis, per-player and lesson prompts: "Name: answer" after "Student Answer(s):"
+_ANSWERS = re.compile(r"Student Answers?:\n(.*)", re.DOTALL)
+_PLAYER_LINE = re.compile(r"^([^:\n]{1,60}): ", re.MULTILINE)
+
+
+def load_fixtures(*paths):
+    """Recorded calls from JSONL fixture files, skipping lines that do not parse"""
+    fixtures = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    fixture = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(fixture, dict) and "request" in fixture and "content" in fixture:
+                    fixtures.append(fixture)
+    return fixtures
+
+
+def player_names(messages):
+    """Player names in the order a prompt lists their answers"""
+    user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    match = _ANSWERS.search(user)
+    if not match:
+        return []
+    names = []
+    for paragraph in match.group(1).split("\n\n"):
+        line = _PLAYER_LINE.match(paragraph)
+        if line and line.group(1) not in names:
+            names.append(line.group(1))
+    return names
+
+
+def _kind(messages):
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    return hashlib.sha256(system.encode("utf-8")).hexdigest()[:16], len(player_names(messages))
+
+
+def rename_players(content, recorded, wanted):
+    """Swap each recorded player name for the wanted one in the same position"""
+    if not recorded or len(recorded) != len(wanted):
+        return content
+    # One pass over every name, so swapping "Player 1" and "Player 2" cannot chain
+    names = sorted(recorded, key=len, reverse=True)
+    pattern = re.compile("|".join(rf"(?<!\w){re.escape(name)}(?!\w)" for name in names))
+    mapping = dict(zip(recorded, wanted))
+    return pattern.sub(lambda m: mapping[m.group(0)], content)
+
+
+class ReplayServer(FakeOpenAIServer):
+    """FakeOpenAIServer answering from recorded fixtures with their recorded latency
+
+    speed > 1 replays faster than recorded (2 halves every delay). Counts of
+    exact and substituted replies are kept in exact_hits and kind_hits.
+    """
+
+    def __init__(self, fixtures, speed=1.0, **kwargs):
+        super().__init__(**kwargs)
+        if not fixtures:
+            raise ValueError("no fixtures to replay")
+        self.speed = speed
+        self.exact_hits = 0
+        self.kind_hits = 0
+        self._exact = {}
+        self._by_kind = {}
+        for fixture in fixtures:
+            self._exact.setdefault(fixture.get("key") or request_key(fixture["request"]), fixture)
+            kind = _kind(fixture["request"].get("messages", []))
+            self._by_kind.setdefault(kind, []).append(fixture)
+
+    def pick(self, request):
+        """(fixture, content) to answer request with"""
+        key = request_key(request)
+        fixture = self._exact.get(key)
+        if fixture is not None:
+            with self._count_lock:
+                self.exact_hits += 1
+            return fixture, fixture["content"]
+        kind = _kind(request.get("messages", []))
+        candidates = self._by_kind.get(kind) or self._by_kind.get((kind[0], 0)) or \
+            [fixture for fixtures in self._by_kind.values() for fixture in fixtures]
+        same_model = [f for f in candidates if f["request"].get("model") == request.get("model")]
+        candidates = same_model or candidates
+        fixture = candidates[int(key, 16) % len(candidates)]
+        with self._count_lock:
+            self.kind_hits += 1
+        content = rename_players(fixture["content"], player_names(fixture["request"].get("messages", [])),
+                                 player_names(request.get("messages", [])))
+        return fixture, content
+
+    def handle(self, request):
+        fixture, content = self.pick(request)
+        if request.get("stream"):
+            return 200, {"Content-Type": "text/event-stream"}, self._replay_stream(request, fixture, content)
+        time.sleep(fixture.get("seconds", 0) / self.speed)
+        usage = fixture.get("usage") or {}
+        body = completion_payload(request, content, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode("utf-8")
+
+    def _replay_stream(self, request, fixture, content):
+        """Recorded chunk timing when the fixture was streamed, else the total spread over even chunks"""
+        chunks = fixture.get("chunks") or []
+        offsets = [offset for offset, _ in chunks]
+        if not offsets:
+            count = max(1, self.stream_chunks)
+            offsets = [fixture.get("seconds", 0) * (i + 1) / count for i in range(count)]
+        if chunks and "".join(text for _, text in chunks) == content:
+            pieces = [text for _, text in chunks]
+        else:
+            size = max(1, -(-len(content) // len(offsets)))
+            pieces = [content[i * size:(i + 1) * size] for i in range(len(offsets))]
+        start = time.perf_counter()
+        for offset, piece in zip(offsets, pieces):
+            delay = offset / self.speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            if not piece:
+                continue
+            payload = {
+                "id": "chatcmpl-replay",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+        usage = fixture.get("usage") or {}
+        yield from usage_chunk(request, content, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        yield b"data: [DONE]\n\n"
@@ -0,0 +1,88 @@
+"""Corpus of analyses with known medals for exercising score extraction.
+
+Each case is (label, analysis_text, player_names, expected_medals). Cases are
+generated from a fixed seed so results compare across commits.
+"""
+import json
+import random
+
+MEDALS = ["🥇", "🥈", "🥉", "🤔", "🚨"]
+LABELS = {
+    "🥇": "GOLD MEDAL",
+    "🥈": "SILVER MEDAL",
+    "🥉": "BRONZE MEDAL",
+    "🤔": "PARTICIPATION TROPHY",
+    "🚨": "\"We Need to Talk\"",
+}
+FIRST_NAMES = ["Alice", "Bob", "Chen", "Dana", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jo",
+               "Kemal", "Lena", "Mo", "Nia", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq"]
+FEEDBACK = ("You owned the problem and kept your manager in the loop, which is exactly the kind of "
+            "workplace awareness that builds trust. Next time, lead with the fix before the apology. ")
+PREAMBLE = """## Ranking System Recap
+🥇 GOLD MEDAL: Best response
+🥈 SILVER MEDAL: Good with minor issues
+🥉 BRONZE MEDAL: Okay but needs improvement
+🤔 PARTICIPATION TROPHY: Poor but shows effort
+🚨 "We Need to Talk": Major issues
+"""
+LESSON = """## 📚 Learning Lesson
+**Own it, fix it, communicate it.** Admit the issue quickly, propose a concrete fix, and keep people informed.
+"""
+
+
+def _names(count):
+    names = []
+    for i in range(count):
+        base = FIRST_NAMES[i % len(FIRST_NAMES)]
+        names.append(base if i < len(FIRST_NAMES) else f"{base} {i // len(FIRST_NAMES) + 1}")
+    return names
+
+
+def _heading_style(names, medals, feedback):
+    return "\n\n".join(f"### {name}\n{medal} {LABELS[medal]} (⭐)\n{feedback}" for name, medal in zip(names, medals))
+
+
+def _inline_style(names, medals, feedback):
+    return "\n\n".join(f"**{name}** - {medal} {LABELS[medal]}\n{feedback}" for name, medal in zip(names, medals))
+
+
+def _medal_first_style(names, medals, feedback):
+    return "\n\n".join(f"{medal} {LABELS[medal]}: {name}\n{feedback}" for name, medal in zip(names, medals))
+
+
+def _score_block(names, medals):
+    scores = [{"player": name, "medal": medal} for name, medal in zip(names, medals)]
+    return f"```json\n{json.dumps({'scores': scores}, ensure_ascii=False)}\n```"
+
+
+def build_corpus(seed=7):
+    rng = random.Random(seed)
+    cases = []
+    styles = [("heading", _heading_style), ("inline", _inline_style), ("medal-first", _medal_first_style)]
+    for count in (2, 6, 50, 200):
+        names = _names(count)
+        for feedback_repeat in (1, 20):
+            feedback = FEEDBACK * feedback_repeat
+            medals = [rng.choice(MEDALS) for _ in names]
+            for style_label, style in styles:
+                body = f"{PREAMBLE}\n{style(names, medals, feedback)}\n\n{LESSON}"
+                label = f"{style_label}/{count}p/{'long' if feedback_repeat > 1 else 'short'}"
+                expected = dict(zip(names, medals))
+                cases.append((f"{label}/text", body, names, expected))
+                cases.append((f"{label}/block", f"{body}\n{_score_block(names, medals)}", names, expected))
+
+    # Every player shares one medal
+    names = _names(6)
+    medals = ["🥈"] * 6
+    cases.append(("shared-medal/6p", _heading_style(names, medals, FEEDBACK), names, dict(zip(names, medals))))
+
+    # Malformed score block falls back to the free text
+    names = _names(4)
+    medals = [rng.choice(MEDALS) for _ in names]
+    body = _inline_style(names, medals, FEEDBACK) + '\n```json\n{"scores": [{"player": "Alice", "medal": \n```'
+    cases.append(("bad-block/4p", body, names, dict(zip(names, medals))))
+
+    # Score block naming only some players, the rest come from the text
+    body = _heading_style(names, medals, FEEDBACK) + "\n" + _score_block(names[:2], medals[:2])
+    cases.append(("partial-block/4p", body, names, dict(zip(names, medals))))
+    return cases
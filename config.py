@@ -0,0 +1,19 @@
+import functools
+import os
+
+
+@functools.lru_cache(maxsize=None)
+def load_env():
+    """Read .env into the environment once per process; variables already set win"""
+    import dotenv  # Only needed once, so not paid by processes that never ask for a setting
+    return dotenv.load_dotenv()
+
+
+def env(name, default=None):
+    """os.getenv, after .env has been loaded
+
+    Modules read their settings through this at import time, so a setting
+    in .env applies whichever module happens to be imported first.
+    """
+    load_env()
+    return os.getenv(name, default)
@@ -0,0 +1,118 @@
+import io
+import json
+
+
+def make_round_record(round_number, scenario, player_names, answers, analysis, scores, model_used,
+                      token_usage=None):
+    """Describe a finished round for the exports
+
+    The record holds references to the round's existing objects, so keeping
+    every round does not copy their text. token_usage is the round's
+    token_budget.summarize_usage() result.
+    """
+    return {
+        "round": round_number,
+        "scenario": scenario,
+        "player_names": player_names,
+        "answers": answers,
+        "ai_analysis": analysis,
+        "scores": dict(scores),
+        "model_used": model_used,
+        "token_usage": token_usage
+    }
+
+
+def _export_dict(record):
+    return {
+        "round": record["round"],
+        "scenario": record["scenario"],
+        "responses": dict(zip(record["player_names"], record["answers"])),
+        "ai_analysis": record["ai_analysis"],
+        "scores": record["scores"],
+        "model_used": record["model_used"],
+        "token_usage": record.get("token_usage")
+    }
+
+
+def build_round_report(record):
+    """Markdown report for one round"""
+    scenario = record["scenario"]
+    parts = [
+        f"# Office Scenario Training Report - Round {record['round']}\n",
+        f"\n## Scenario: {scenario['title']}\n{scenario['scenario']}\n",
+        "\n## Player Responses:\n"
+    ]
+    parts.extend(f"\n**{name}:** {answer}\n" for name, answer in zip(record["player_names"], record["answers"]))
+    parts.append(f"\n## AI Analysis:\n{record['ai_analysis']}")
+    parts.append("\n## Current Scores:\n")
+    ranked = sorted(record["scores"].items(), key=lambda x: x[1], reverse=True)
+    parts.extend(f"- {name}: {score} points\n" for name, score in ranked)
+    return "".join(parts)
+
+
+def build_round_json(record):
+    """JSON export for one round"""
+    return json.dumps(_export_dict(record), indent=2, ensure_ascii=False)
+
+
+def iter_game_ndjson(records):
+    """Yield the whole game as NDJSON, one encoded line per round"""
+    for record in records:
+        yield json.dumps(_export_dict(record), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class NDJSONStream(io.RawIOBase):
+    """Read-once file object that encodes the game NDJSON a line at a time as it is read"""
+
+    def __init__(self, records):
+        self._lines = iter_game_ndjson(list(records))
+        self._pending = b""
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Download helpers rewind before reading; that is the only seek there is
+        if offset == 0 and whence == io.SEEK_SET and self._position == 0:
+            return 0
+        raise io.UnsupportedOperation("NDJSONStream can only be read once, from the start")
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._lines, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self._position += size
+        return size
+
+
+class ExportMemo:
+    """The last round export built, kept until another is built or the game is reset
+
+    Download buttons call these methods from a worker thread when clicked,
+    so nothing is built on a plain rerun and a second click on the same
+    button reuses the result. The whole-game export is not kept: each
+    download streams it from the history with NDJSONStream.
+    """
+
+    def __init__(self):
+        self._latest = None  # (key, export)
+
+    def _get(self, key, build):
+        latest = self._latest
+        if latest is not None and latest[0] == key:
+            return latest[1]
+        value = build()
+        self._latest = (key, value)
+        return value
+
+    def report(self, record):
+        return self._get(("report", record["round"]), lambda: build_round_report(record))
+
+    def round_json(self, record):
+        return self._get(("json", record["round"]), lambda: build_round_json(record))
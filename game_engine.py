@@ -0,0 +1,175 @@
+from exports import make_round_record
+from scoring import extract_scores_from_analysis, strip_score_block
+
+# First player to reach this many points wins
+WINNING_SCORE = 10
+
+
+class GameStateError(Exception):
+    """An action that the game's current state does not allow"""
+
+
+class Round:
+    """One scenario answered by every player in turn, then graded"""
+
+    __slots__ = ("number", "scenario", "player_names", "answers", "analysis", "scores")
+
+    def __init__(self, number, scenario, player_names, answers=(), analysis=None, scores=None):
+        self.number = number
+        self.scenario = scenario
+        self.player_names = list(player_names)
+        self.answers = list(answers)
+        self.analysis = analysis  # Without the score block, once graded
+        self.scores = scores or {}
+
+    @property
+    def current_player(self):
+        """Name of the player whose turn it is, or None once everyone has answered"""
+        return self.player_names[len(self.answers)] if not self.complete else None
+
+    @property
+    def complete(self):
+        return len(self.answers) >= len(self.player_names)
+
+    @property
+    def graded(self):
+        return self.analysis is not None
+
+
+class GameEngine:
+    """Shared-screen game rules without any UI
+
+    Players answer each round in turn (submit), the round is graded by any
+    grader(scenario_text, answers, player_names) -> (analysis, error), each
+    medal adds points, and the first player to winning_score wins. The state
+    round-trips through to_state()/from_state() as plain JSON data.
+    """
+
+    __slots__ = ("player_names", "scores", "round_number", "round", "winner", "history", "winning_score",
+                 "_standings")
+
+    def __init__(self, player_names=(), winning_score=WINNING_SCORE):
+        self.player_names = []
+        self.scores = {}
+        self.round_number = 1
+        self.round = None
+        self.winner = None
+        self.history = []
+        self.winning_score = winning_score
+        self._standings = None
+        self.set_players(player_names)
+
+    @property
+    def game_ended(self):
+        return self.winner is not None
+
+    def standings(self):
+        """[(name, points)] best first; sorted once per change of the scores, not on every rerun"""
+        if self._standings is None:
+            self._standings = sorted(self.scores.items(), key=lambda x: x[1], reverse=True)
+        return self._standings
+
+    def set_players(self, player_names):
+        """Seat the players; scores of players who stay are kept"""
+        if self.round is not None and not self.round.graded:
+            raise GameStateError("Players cannot change during a round")
+        self.player_names = list(player_names)
+        self.scores = {name: self.scores.get(name, 0) for name in self.player_names}
+        self._standings = None
+
+    def start_round(self, scenario):
+        """Play scenario next; replaces an ungraded round, or moves past a graded one"""
+        if self.game_ended:
+            raise GameStateError(f"The game is over, {self.winner} won")
+        if not self.player_names:
+            raise GameStateError("No players")
+        if self.round is not None and self.round.graded:
+            self.round_number += 1
+        self.round = Round(self.round_number, scenario, self.player_names)
+        return self.round
+
+    def submit(self, answer):
+        """Record the current player's answer; returns their name, or None for an empty answer"""
+        if self.round is None or self.round.complete:
+            raise GameStateError("No answer is expected")
+        answer = answer.strip()
+        if not answer:
+            return None
+        name = self.round.current_player
+        self.round.answers.append(answer)
+        return name
+
+    def grade(self, grader, model_used=None):
+        """Grade the complete round with grader and score it; returns (analysis, error)"""
+        if self.round is None or not self.round.complete or self.round.graded:
+            raise GameStateError("The round is not ready to grade")
+        try:
+            analysis, error = grader(self.round.scenario["scenario"], self.round.answers, self.round.player_names)
+        except Exception as e:
+            analysis, error = None, str(e)
+        if analysis:
+            self.score_round(analysis, model_used or getattr(grader, "__name__", "grader"))
+        return analysis, error
+
+    def score_round(self, analysis, model_used, token_usage=None):
+        """Apply a finished analysis: award medal points, record the round and check for a winner
+
+        Returns the round's points per player.
+        """
+        current = self.round
+        if current is None or not current.complete or current.graded:
+            raise GameStateError("The round is not ready to grade")
+        current.scores = extract_scores_from_analysis(analysis, current.player_names)
+        current.analysis = strip_score_block(analysis)
+        for name, points in current.scores.items():
+            self.scores[name] = self.scores.get(name, 0) + points
+        self._standings = None
+        self.history.append(make_round_record(current.number, current.scenario, current.player_names,
+                                              current.answers, current.analysis, self.scores, model_used,
+                                              token_usage))
+        if self.scores:
+            leader, top_score = self.standings()[0]
+            if top_score >= self.winning_score:
+                self.winner = leader
+        return current.scores
+
+    def advance(self):
+        """Leave the current round, graded or not, and move to the next round number"""
+        if self.round is not None:
+            self.round_number += 1
+        self.round = None
+
+    def to_state(self):
+        """Plain data for the state store, in the keys saved games have always used"""
+        current = self.round
+        return {
+            "current_scenario": current.scenario if current else None,
+            "current_player": len(current.answers) + 1 if current and not current.complete else 1,
+            "player_names": list(self.player_names),
+            "submitted_answers": list(current.answers) if current else [],
+            "all_submitted": bool(current and current.complete),
+            "llm_analysis": current.analysis if current else None,
+            "show_analysis": bool(current and current.graded),
+            "round_scores": dict(current.scores) if current else {},
+            "player_scores": dict(self.scores),
+            "round_number": self.round_number,
+            "game_ended": self.game_ended,
+            "winner": self.winner,
+            "round_history": self.history
+        }
+
+    @classmethod
+    def from_state(cls, state, winning_score=WINNING_SCORE):
+        """Rebuild a game saved with to_state()"""
+        game = cls(winning_score=winning_score)
+        game.player_names = list(state.get("player_names", []))
+        game.scores = dict(state.get("player_scores", {}))
+        game._standings = None
+        game.round_number = state.get("round_number", 1)
+        game.winner = state.get("winner")
+        game.history = list(state.get("round_history", []))
+        if state.get("current_scenario"):
+            game.round = Round(game.round_number, state["current_scenario"], game.player_names,
+                               state.get("submitted_answers", []), state.get("llm_analysis"),
+                               state.get("round_scores"))
+        return game
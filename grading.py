@@ -0,0 +1,252 @@
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import FALLBACK_MODEL, LATENCY_BUDGET, call_log, chat_completion, hedged_chat_completion, record_call
+from metrics import metrics
+from prompts import (MEDAL_LABELS, TEMPERATURE, build_analysis_messages, build_lesson_messages,
+                     build_player_messages)
+from scheduler import in_context
+from scoring import extract_medals, split_player_sections, strip_score_block
+from token_budget import analysis_max_tokens
+
+# Per-call output caps: one player's feedback, and the shared lesson
+PLAYER_MAX_TOKENS = 700
+LESSON_MAX_TOKENS = 600
+
+# Upper bound on concurrent requests for one round
+MAX_WORKERS = 8
+
+ANALYSIS_SECONDS = metrics.histogram("analysis_seconds", "Wall time of a round's analysis by engine and model")
+ANALYSES = metrics.counter("analyses_total", "Round analyses by engine, model and outcome")
+
+_MEDAL_PATTERN = re.compile("|".join(re.escape(medal) for medal in MEDAL_LABELS))
+
+
+def _complete(api_key, messages, model, max_tokens):
+    response = chat_completion(
+        api_key,
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=TEMPERATURE
+    )
+    return response.choices[0].message.content
+
+
+def grade_player(api_key, scenario_text, player_name, answer, model="gpt-3.5-turbo"):
+    """Grade one answer, returning (medal, feedback); medal is None if the model gave none"""
+    feedback = _complete(api_key, build_player_messages(scenario_text, player_name, answer), model,
+                         PLAYER_MAX_TOKENS).strip()
+    match = _MEDAL_PATTERN.search(feedback)
+    medal = match.group(0) if match else None
+    if match and "\n" not in feedback[:match.start()]:
+        # Drop the leading medal line, it becomes the section heading
+        feedback = feedback.split("\n", 1)[1].strip() if "\n" in feedback else ""
+    return medal, feedback
+
+
+def write_lesson(api_key, scenario_text, answers, player_names, model="gpt-3.5-turbo"):
+    """Write the shared learning lesson for a round"""
+    return _complete(api_key, build_lesson_messages(scenario_text, answers, player_names), model,
+                     LESSON_MAX_TOKENS).strip()
+
+
+def player_section(name, medal, feedback):
+    """One player's heading and feedback, as merge_analysis lays them out"""
+    heading = f"### {name} — {medal} {MEDAL_LABELS[medal]}" if medal else f"### {name}"
+    return f"{heading}\n\n{feedback}"
+
+
+def score_block(player_names, medals):
+    """The JSON score block for {name: medal}, in player order"""
+    scores = [{"player": name, "medal": medals[name]} for name in player_names if medals.get(name)]
+    return f"```json\n{json.dumps({'scores': scores}, ensure_ascii=False)}\n```"
+
+
+def merge_analysis(player_names, grades, lesson):
+    """Assemble per-player grades and the lesson into one analysis in player order"""
+    sections = [player_section(name, medal, feedback) for name, (medal, feedback) in zip(player_names, grades)]
+    sections.append(lesson)
+    medals = {name: medal for name, (medal, _) in zip(player_names, grades)}
+    return "\n\n---\n\n".join(sections) + "\n\n" + score_block(player_names, medals)
+
+
+def find_reused_grades(index, scenario_text, answers, player_names, threshold):
+    """{name: (medal, feedback)} for every answer close enough to one graded before in the AnswerIndex"""
+    reused = {}
+    for name, answer in zip(player_names, answers):
+        match = index.lookup(scenario_text, answer, threshold)
+        if match is not None:
+            similarity, entry = match
+            feedback = re.sub(rf"(?<!\w){re.escape(entry['player'])}(?!\w)", name, entry["feedback"])
+            reused[name] = (entry["medal"], f"{feedback}\n\n*♻️ Graded like an earlier answer ({similarity:.0%} similar)*")
+    return reused
+
+
+def remember_grades(index, scenario_text, answers, player_names, analysis):
+    """Add the grades of an analysis to the AnswerIndex, returning its (sections, lesson)"""
+    sections, lesson = split_player_sections(analysis, player_names)
+    medals = extract_medals(analysis, player_names)
+    for name, answer in zip(player_names, answers):
+        # Only answers with both a medal and their own feedback can be reused
+        if medals.get(name) and sections.get(name):
+            index.add(scenario_text, answer, name, medals[name], sections[name])
+    if lesson and len(sections) == len(player_names):
+        index.set_lesson(scenario_text, lesson)
+    return sections, lesson
+
+
+def get_analysis_reusing_grades(analyze, index, threshold, scenario_text, answers, player_names):
+    """Run analyze(answers, player_names) on the answers unlike any graded before and reuse the stored grades of the rest
+
+    Returns (analysis, error) like the engines. If the new analysis cannot be
+    split per player, the reused grades are appended after it.
+    """
+    reused = find_reused_grades(index, scenario_text, answers, player_names, threshold)
+    if len(reused) == len(player_names):
+        lesson = index.lesson(scenario_text) or ""
+        return merge_analysis(player_names, [reused[name] for name in player_names], lesson), None
+    new_answers = [answer for name, answer in zip(player_names, answers) if name not in reused]
+    new_names = [name for name in player_names if name not in reused]
+    analysis, error = analyze(new_answers, new_names)
+    if not analysis:
+        return None, error
+    sections, lesson = remember_grades(index, scenario_text, new_answers, new_names, analysis)
+    if not reused:
+        return analysis, None
+    medals = extract_medals(analysis, new_names)
+    if len(sections) == len(new_names):
+        grades = dict(reused, **{name: (medals.get(name), sections[name]) for name in new_names})
+        return merge_analysis(player_names, [grades[name] for name in player_names], lesson), None
+    medals.update({name: medal for name, (medal, _) in reused.items()})
+    parts = [strip_score_block(analysis)] + [player_section(name, *reused[name]) for name in player_names
+                                             if name in reused]
+    return "\n\n---\n\n".join(parts) + "\n\n" + score_block(player_names, medals), None
+
+
+def _record_analysis(engine, model, start, error):
+    ANALYSES.inc(engine=engine, model=model, outcome="error" if error else "ok")
+    if not error:
+        ANALYSIS_SECONDS.observe(time.perf_counter() - start, engine=engine, model=model)
+
+
+def get_llm_analysis(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo",
+                     fallback_model=FALLBACK_MODEL, latency_budget=LATENCY_BUDGET):
+    """Get analysis from OpenAI API, falling back to a faster model when the chosen one is slow"""
+    start = time.perf_counter()
+    try:
+        response = hedged_chat_completion(
+            api_key,
+            fallback_model=fallback_model,
+            latency_budget=latency_budget,
+            model=model,
+            messages=build_analysis_messages(scenario_text, answers, player_names),
+            max_tokens=analysis_max_tokens(len(player_names)),
+            temperature=TEMPERATURE
+        )
+        _record_analysis("combined", model, start, None)
+        return response.choices[0].message.content, None
+    except Exception as e:
+        _record_analysis("combined", model, start, e)
+        return None, str(e)
+
+
+def get_parallel_llm_analysis(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo",
+                              max_workers=MAX_WORKERS):
+    """Get analysis by grading every answer concurrently plus one lesson call
+
+    Returns (analysis, error) like get_llm_analysis. The merged text does not
+    depend on which call finishes first.
+    """
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(answers) + 1))) as pool:
+            lesson_future = pool.submit(in_context(write_lesson), api_key, scenario_text, answers, player_names, model)
+            grade_futures = [
+                pool.submit(in_context(grade_player), api_key, scenario_text, name, answer, model)
+                for name, answer in zip(player_names, answers)
+            ]
+            grades = [future.result() for future in grade_futures]
+            lesson = lesson_future.result()
+        _record_analysis("per-player", model, start, None)
+        return merge_analysis(player_names, grades, lesson), None
+    except Exception as e:
+        _record_analysis("per-player", model, start, e)
+        return None, str(e)
+
+
+class SpeculativeRound:
+    """Grades each answer in the background as soon as it is submitted
+
+    Once the last answer lands, start_lesson() begins the short synthesis
+    call. finish() reuses every grade and lesson whose inputs are unchanged
+    and only computes what is missing, so the wait after the last submission
+    is roughly one short call. Each background call keeps its call_log
+    records, and finish() adds those it reuses to the caller's call_log.
+    """
+
+    def __init__(self, executor, scenario_text, api_key, model="gpt-3.5-turbo"):
+        self.executor = executor
+        self.scenario_text = scenario_text
+        self.api_key = api_key
+        self.model = model
+        self._futures = {}  # (name, answer) -> Future of ((medal, feedback), call records)
+        self._lesson = None  # (answers, player_names, Future of (lesson text, call records))
+
+    @staticmethod
+    def _logged(fn, *args):
+        with call_log() as calls:
+            return fn(*args), calls
+
+    def _grade(self, name, answer):
+        return self._logged(grade_player, self.api_key, self.scenario_text, name, answer, self.model)
+
+    def add(self, name, answer):
+        """Start grading an answer that was just submitted"""
+        if (name, answer) not in self._futures:
+            self._futures[(name, answer)] = self.executor.submit(in_context(self._grade), name, answer)
+
+    def start_lesson(self, answers, player_names):
+        """Start the synthesis call once every answer is in"""
+        future = self.executor.submit(in_context(self._logged), write_lesson, self.api_key, self.scenario_text,
+                                      answers, player_names, self.model)
+        self._lesson = (list(answers), list(player_names), future)
+
+    def cancel(self):
+        """Drop all speculative work (round reset or abandoned)"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._lesson:
+            self._lesson[2].cancel()
+            self._lesson = None
+
+    def finish(self, answers, player_names):
+        """Return (analysis, error) like get_parallel_llm_analysis"""
+        try:
+            # Calls started here already reach the caller's call_log through the copied context
+            started_here = set()
+            lesson = self._lesson
+            if lesson is None or lesson[:2] != (list(answers), list(player_names)) or lesson[2].cancelled():
+                self.start_lesson(answers, player_names)
+                started_here.add(self._lesson[2])
+            lesson_future = self._lesson[2]
+            grade_futures = []
+            for name, answer in zip(player_names, answers):
+                future = self._futures.get((name, answer))
+                if future is None or future.cancelled():
+                    future = self.executor.submit(in_context(self._grade), name, answer)
+                    self._futures[(name, answer)] = future
+                    started_here.add(future)
+                grade_futures.append(future)
+            grades = [future.result()[0] for future in grade_futures]
+            lesson_text = lesson_future.result()[0]
+            for future in grade_futures + [lesson_future]:
+                if future not in started_here:
+                    for call in future.result()[1]:
+                        record_call(**call)
+            return merge_analysis(player_names, grades, lesson_text), None
+        except Exception as e:
+            return None, str(e)
@@ -0,0 +1,60 @@
+import math
+import threading
+from collections import deque
+
+# Recent calls kept per model
+LATENCY_WINDOW = 200
+# Samples needed before the observed p95 replaces the default hedge delay
+MIN_SAMPLES = 20
+# Never hedge sooner than this, whatever the history says
+MIN_HEDGE_DELAY = 1.0
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a non-empty sorted list: the smallest value with fraction of them at or below it"""
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per model, shared by every session"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentiles(self, model):
+        """{"count", "p50", "p95", "p99"} in seconds, or None before the first call"""
+        with self._lock:
+            ordered = sorted(self._samples.get(model, ()))
+        if not ordered:
+            return None
+        return {
+            "count": len(ordered),
+            "p50": percentile(ordered, 0.50),
+            "p95": percentile(ordered, 0.95),
+            "p99": percentile(ordered, 0.99)
+        }
+
+    def snapshot(self):
+        with self._lock:
+            models = list(self._samples)
+        return {model: self.percentiles(model) for model in models}
+
+    def hedge_delay(self, model, default):
+        """Seconds to wait before hedging a call to model
+
+        Once there is enough history this is the model's p95, so only the
+        slowest one call in twenty gets a second request.
+        """
+        stats = self.percentiles(model)
+        delay = stats["p95"] if stats and stats["count"] >= MIN_SAMPLES else default
+        return max(MIN_HEDGE_DELAY, delay)
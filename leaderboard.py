@@ -0,0 +1,255 @@
+import bisect
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from config import env
+
+# Leading players kept sorted per board; top(k) for k up to this is a slice
+TOP_CAPACITY = 100
+# Seconds between checks for rounds recorded by other worker processes
+SYNC_INTERVAL = 1.0
+ALL_TIME = None
+
+# Seat names the app fills in ("Player 1"); every game has them, so they name nobody
+_DEFAULT_NAME = re.compile(r"player\s*\d+")
+
+
+def player_key(name):
+    """Case- and spacing-insensitive identity of a player across games"""
+    return " ".join(name.split()).casefold()
+
+
+def is_ranked(name):
+    """Whether a player name identifies someone on the leaderboard (not blank, not a default seat name)"""
+    key = player_key(name)
+    return bool(key) and not _DEFAULT_NAME.fullmatch(key)
+
+
+class _Fenwick:
+    """Number of players per point total, with O(log n) counts of players above a total"""
+
+    def __init__(self, size=64):
+        self._tree = [0] * (size + 1)
+
+    def _grow(self, total):
+        size = len(self._tree) - 1
+        while total >= size:
+            size *= 2
+        counts = [self.count_at(i) for i in range(len(self._tree) - 1)]
+        self._tree = [0] * (size + 1)
+        for i, n in enumerate(counts):
+            if n:
+                self.add(i, n)
+
+    def add(self, total, n):
+        if total >= len(self._tree) - 1:
+            self._grow(total)
+        i = total + 1
+        while i < len(self._tree):
+            self._tree[i] += n
+            i += i & -i
+
+    def count_up_to(self, total):
+        """Players with at most total points"""
+        i = min(total + 1, len(self._tree) - 1)
+        n = 0
+        while i > 0:
+            n += self._tree[i]
+            i -= i & -i
+        return n
+
+    def count_at(self, total):
+        return self.count_up_to(total) - (self.count_up_to(total - 1) if total else 0)
+
+
+class Ranking:
+    """Point totals of every player on one board, with the leaders kept sorted as totals change
+
+    Totals only grow, so a player outside the kept top can only enter it,
+    never be needed from below: each add() is O(capacity) at worst, top(k)
+    is a slice and rank() is O(log max total).
+    """
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.totals = {}
+        self.rounds = {}
+        self._top = []  # (-points, key), best first
+        self._in_top = set()
+        self._counts = _Fenwick()
+
+    def __len__(self):
+        return len(self.totals)
+
+    def add(self, key, points):
+        """Add a round's points to key's total; returns the new total"""
+        if points < 0:
+            raise ValueError("points cannot be negative")
+        old = self.totals.get(key)
+        new = (old or 0) + points
+        self.totals[key] = new
+        self.rounds[key] = self.rounds.get(key, 0) + 1
+        if old is not None:
+            self._counts.add(old, -1)
+        self._counts.add(new, 1)
+
+        if key in self._in_top:
+            del self._top[bisect.bisect_left(self._top, (-old, key))]
+            bisect.insort(self._top, (-new, key))
+        elif len(self._top) < self.capacity or (-new, key) < self._top[-1]:
+            bisect.insort(self._top, (-new, key))
+            self._in_top.add(key)
+            if len(self._top) > self.capacity:
+                self._in_top.discard(self._top.pop()[1])
+        return new
+
+    def top(self, k):
+        """[(key, points, rank)] for the best k players; tied totals share a rank"""
+        if k > len(self._top) and len(self.totals) > len(self._top):
+            leaders = sorted((-points, key) for key, points in self.totals.items())[:k]
+        else:
+            leaders = self._top[:k]
+        result = []
+        for i, (negative, key) in enumerate(leaders):
+            rank = result[-1][2] if result and result[-1][1] == -negative else i + 1
+            result.append((key, -negative, rank))
+        return result
+
+    def rank(self, key):
+        """(rank, points) of key, or None if they have not scored on this board"""
+        points = self.totals.get(key)
+        if points is None:
+            return None
+        return len(self.totals) - self._counts.count_up_to(points) + 1, points
+
+
+class Leaderboard:
+    """Organization-wide rankings across every game, all-time and per scenario
+
+    A graded round is recorded once, atomically, under a key unique to it
+    (game id and round number), so retries and reruns never count it twice.
+    With a path, rounds go to a SQLite log shared by every worker process;
+    each process folds rounds logged by the others into its rankings at
+    most every SYNC_INTERVAL seconds, when read.
+    """
+
+    def __init__(self, path=None, capacity=TOP_CAPACITY, sync_interval=SYNC_INTERVAL):
+        self.path = path
+        self.capacity = capacity
+        self.sync_interval = sync_interval
+        self.names = {}  # player key -> name as last entered
+        self._boards = {ALL_TIME: Ranking(capacity)}
+        self._recorded = set()
+        self._last_seq = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leaderboard_rounds ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, round_key TEXT NOT NULL UNIQUE, "
+                "scenario_id TEXT, scores TEXT NOT NULL, recorded_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self.sync(force=True)
+
+    def _apply(self, round_key, scenario_id, scores):
+        """Fold one round into the boards; caller holds the lock"""
+        if round_key in self._recorded:
+            return False
+        self._recorded.add(round_key)
+        boards = [self._boards[ALL_TIME]]
+        if scenario_id is not None:
+            board = self._boards.get(scenario_id)
+            if board is None:
+                board = self._boards[scenario_id] = Ranking(self.capacity)
+            boards.append(board)
+        for name, points in scores.items():
+            if not is_ranked(name):
+                continue  # Logged before default seat names were left out
+            key = player_key(name)
+            self.names[key] = name
+            for board in boards:
+                board.add(key, points)
+        return True
+
+    def record_round(self, round_key, scores, scenario_id=None):
+        """Add a graded round's {player name: points}; returns False if round_key was recorded before
+
+        Blank and default seat names ("Player 1") are left out, so players
+        who never typed a name do not merge across games into one entry.
+        """
+        scores = {name: int(points) for name, points in scores.items() if is_ranked(name)}
+        if any(points < 0 for points in scores.values()):
+            raise ValueError("points cannot be negative")
+        with self._lock:
+            if self._conn is None:
+                return self._apply(round_key, scenario_id, scores)
+            with self._conn:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO leaderboard_rounds (round_key, scenario_id, scores, recorded_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (round_key, scenario_id, json.dumps(scores, ensure_ascii=False), time.time())
+                ).rowcount
+            # Picks up this round and any logged by other processes, in log order
+            self._sync()
+            return bool(inserted)
+
+    def _sync(self):
+        rows = self._conn.execute(
+            "SELECT seq, round_key, scenario_id, scores FROM leaderboard_rounds WHERE seq > ? ORDER BY seq",
+            (self._last_seq,)
+        ).fetchall()
+        for seq, round_key, scenario_id, scores in rows:
+            self._apply(round_key, scenario_id, json.loads(scores))
+            self._last_seq = seq
+        self._synced_at = time.monotonic()
+
+    def sync(self, force=False):
+        """Fold in rounds other processes logged since the last sync (no-op without a database)"""
+        if self._conn is None:
+            return
+        with self._lock:
+            if force or time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync()
+
+    def top(self, k=10, scenario_id=ALL_TIME):
+        """[{"name", "points", "rounds", "rank"}] for the best k players of a board"""
+        self.sync()
+        with self._lock:
+            board = self._boards.get(scenario_id)
+            if board is None:
+                return []
+            return [{"name": self.names[key], "points": points, "rounds": board.rounds[key], "rank": rank}
+                    for key, points, rank in board.top(k)]
+
+    def rank(self, name, scenario_id=ALL_TIME):
+        """{"rank", "points", "players"} for a player on a board, or None if they have not scored there"""
+        self.sync()
+        with self._lock:
+            board = self._boards.get(scenario_id)
+            found = board.rank(player_key(name)) if board else None
+            return None if found is None else {"rank": found[0], "points": found[1], "players": len(board)}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "players": len(self._boards[ALL_TIME]),
+                "rounds": len(self._recorded),
+                "scenarios": len(self._boards) - 1
+            }
+
+
+def create_leaderboard():
+    """Build the leaderboard selected by LEADERBOARD_BACKEND: sqlite (the default, kept across restarts) or memory"""
+    backend = env("LEADERBOARD_BACKEND", "sqlite").lower()
+    if backend == "sqlite":
+        return Leaderboard(env("LEADERBOARD_DB", "leaderboard.db"))
+    if backend != "memory":
+        raise ValueError(f"Unknown LEADERBOARD_BACKEND: {backend}")
+    return Leaderboard()
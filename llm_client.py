@@ -0,0 +1,447 @@
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from config import env
+from latency import LatencyTracker
+from metrics import metrics
+from recorder import CallRecorder
+from scheduler import RequestScheduler
+from token_budget import count_message_tokens
+
+# Connection pool settings, overridable from the environment
+REQUEST_TIMEOUT = float(env("OPENAI_TIMEOUT", "120"))
+CONNECT_TIMEOUT = float(env("OPENAI_CONNECT_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(env("OPENAI_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = int(env("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(env("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+# Request scheduler settings: per-key provider limits, worker threads and queue size
+REQUESTS_PER_MINUTE = int(env("LLM_REQUESTS_PER_MINUTE", "3500"))
+TOKENS_PER_MINUTE = int(env("LLM_TOKENS_PER_MINUTE", "90000"))
+# Seconds of unused allowance that may be spent at once
+BURST_SECONDS = float(env("LLM_BURST_SECONDS", "60"))
+MAX_CONCURRENT_REQUESTS = int(env("LLM_MAX_CONCURRENT_REQUESTS", "32"))
+MAX_QUEUED_REQUESTS = int(env("LLM_MAX_QUEUED_REQUESTS", "500"))
+MAX_RETRIES = int(env("LLM_MAX_RETRIES", "4"))
+# Seconds a request waits for room in a full queue before failing
+QUEUE_TIMEOUT = float(env("LLM_QUEUE_TIMEOUT", "30"))
+
+# Analysis latency budget (seconds) and the faster model asked when the chosen one is slow
+LATENCY_BUDGET = float(env("ANALYSIS_LATENCY_BUDGET", "60"))
+FALLBACK_MODEL = env("ANALYSIS_FALLBACK_MODEL", "gpt-3.5-turbo")
+
+# JSONL file every chat completion is appended to, as replayable benchmark fixtures
+RECORD_PATH = env("LLM_RECORD_PATH")
+
+_clients = {}
+_clients_lock = threading.Lock()
+_scheduler = None
+_call_log = contextvars.ContextVar("llm_call_log", default=None)
+
+# Latency of every completed call, per model
+latencies = LatencyTracker()
+# Time from sending a streamed call to its first text, per model; streams are hedged on this
+first_text_latencies = LatencyTracker()
+recorder = CallRecorder(RECORD_PATH) if RECORD_PATH else None
+
+LLM_REQUESTS = metrics.counter("llm_requests_total", "LLM API requests by model and outcome")
+LLM_SECONDS = metrics.histogram("llm_request_seconds",
+                                "Latency of successful LLM API requests; streams are timed to their last chunk")
+LLM_FIRST_TEXT_SECONDS = metrics.histogram("llm_stream_first_text_seconds",
+                                           "Time from sending a streamed LLM API request to its first text")
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens reported in response.usage by model and kind")
+
+
+def _build_client(api_key, base_url):
+    # openai is imported on the first request, not at startup: it is most of the app's import time
+    import openai
+
+    # The httpx Limits class the installed openai package was built against
+    limits_class = type(openai.DEFAULT_CONNECTION_LIMITS)
+    http_client = openai.DefaultHttpxClient(
+        limits=limits_class(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=openai.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
+    # Retries are left to the scheduler, which backs off across every session
+    return openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def get_client(api_key, base_url=None):
+    """Return the shared, connection-pooled OpenAI client for this API key
+
+    Clients are thread-safe, so one instance per key is reused by every
+    Streamlit session and keeps its keep-alive connections warm.
+    """
+    registry_key = (api_key, base_url)
+    client = _clients.get(registry_key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(registry_key)
+        if client is None:
+            client = _build_client(api_key, base_url)
+            _clients[registry_key] = client
+        return client
+
+
+def close_clients():
+    """Close every pooled client and empty the registry"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def retry_delay(exc):
+    """Seconds the provider asked us to wait if exc is a 429, 5xx or connection error, else None"""
+    import openai
+
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code != 429 and exc.status_code < 500:
+            return None
+        try:
+            return float(exc.response.headers.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+    if isinstance(exc, openai.APIConnectionError):
+        return 0.0
+    return None
+
+
+def get_scheduler():
+    """Return the process-wide scheduler every LLM request goes through"""
+    global _scheduler
+    if _scheduler is None:
+        with _clients_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler(
+                    concurrency=MAX_CONCURRENT_REQUESTS,
+                    max_queue=MAX_QUEUED_REQUESTS,
+                    requests_per_minute=REQUESTS_PER_MINUTE,
+                    tokens_per_minute=TOKENS_PER_MINUTE,
+                    max_retries=MAX_RETRIES,
+                    retry_after=retry_delay,
+                    burst_seconds=BURST_SECONDS,
+                )
+    return _scheduler
+
+
+def estimate_tokens(request):
+    """Prompt + completion size of a chat request, as the provider's limiter reserves it"""
+    return count_message_tokens(request.get("messages", [])) + request.get("max_tokens", 0)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage else None
+
+
+def _usage_record(usage):
+    """Actual token figures from a response's usage (all None without one)"""
+    if usage is None:
+        return {"prompt_tokens": None, "completion_tokens": None, "cached_tokens": None}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None)
+    }
+
+
+class call_log:
+    """Collect a record of every LLM call whose result is used inside the block
+
+        with call_log() as calls:
+            analysis, error = get_llm_analysis(...)
+        models = {call["model"] for call in calls}
+
+    Each record holds the model, seconds, the locally counted prompt tokens,
+    max_tokens and the usage the provider reported. Calls made by
+    worker threads are included when the work was handed over with
+    scheduler.in_context. Records made before the block exits are also added
+    to any enclosing call_log.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __enter__(self):
+        self._token = _call_log.set(self.calls)
+        return self.calls
+
+    def __exit__(self, *exc):
+        parent = self._token.old_value
+        _call_log.reset(self._token)
+        if isinstance(parent, list):
+            parent.extend(self.calls)
+
+
+def record_call(model, seconds, **usage):
+    """Add a call that did not go through the scheduler (such as local scoring) to the current call_log"""
+    log = _call_log.get()
+    if log is not None:
+        log.append(dict({"model": model, "seconds": seconds, "estimated_prompt_tokens": None, "max_tokens": None,
+                         "prompt_tokens": None, "completion_tokens": None, "cached_tokens": None}, **usage))
+
+
+def request_outcome(exc):
+    """Short error class of a failed request, for the error-rate counters"""
+    import openai
+
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(exc, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(exc, openai.APIConnectionError):
+        return "connection_error"
+    if isinstance(exc, openai.APIStatusError):
+        return "server_error" if exc.status_code >= 500 else "client_error"
+    return "error"
+
+
+def _record_metrics(model, seconds, usage):
+    LLM_REQUESTS.inc(model=model, outcome="ok")
+    if seconds is not None:
+        LLM_SECONDS.observe(seconds, model=model)
+    _record_token_metrics(model, usage)
+
+
+def _record_token_metrics(model, usage):
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+
+def _watch_stream(stream, on_first_text, on_usage, on_end):
+    """Pass a stream's chunks through, calling on_first_text() at its first text, on_usage(usage) for the
+    usage-only chunk that ends it and on_end() once it is read to the end"""
+    try:
+        waiting = True
+        for chunk in stream:
+            if waiting and _chunk_text(chunk):
+                waiting = False
+                on_first_text()
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                on_usage(usage)
+            yield chunk
+        on_end()
+    finally:
+        # Closing this generator early (an abandoned hedge) closes the HTTP response too
+        stream.close()
+
+
+def submit_chat_completion(api_key, **request):
+    """Queue client.chat.completions.create(**request) on the shared scheduler; returns a Future
+
+    For stream=True the slot is held only until the stream opens. The time
+    to a stream's first text goes to first_text_latencies. Streams ask for
+    usage in their last chunk; the call_log record, token metrics and the
+    scheduler's token bucket are updated when it arrives.
+    """
+    client = get_client(api_key)
+    log = _call_log.get()
+    prompt_tokens = count_message_tokens(request.get("messages", []))
+    reserved = prompt_tokens + request.get("max_tokens", 0)
+    stream = bool(request.get("stream"))
+    if stream:
+        request = dict(request, stream_options={"include_usage": True})
+
+    def create():
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**request)
+        except Exception as e:
+            # Counted per attempt, so retried rate limits show up in the error rate
+            LLM_REQUESTS.inc(model=request["model"], outcome=request_outcome(e))
+            raise
+        seconds = None if stream else time.perf_counter() - start
+        if seconds is not None:
+            latencies.record(request["model"], seconds)
+        usage = None if stream else getattr(response, "usage", None)
+        _record_metrics(request["model"], seconds, usage)
+        record = dict({
+            "model": request["model"],
+            "seconds": seconds,
+            "estimated_prompt_tokens": prompt_tokens,
+            "max_tokens": request.get("max_tokens")
+        }, **_usage_record(usage))
+        if stream:
+            def on_first_text():
+                seconds = time.perf_counter() - start
+                first_text_latencies.record(request["model"], seconds)
+                LLM_FIRST_TEXT_SECONDS.observe(seconds, model=request["model"])
+
+            def on_end():
+                record["seconds"] = time.perf_counter() - start
+                LLM_SECONDS.observe(record["seconds"], model=request["model"])
+
+            def on_usage(usage):
+                _record_token_metrics(request["model"], usage)
+                record.update(_usage_record(usage))
+                if usage.total_tokens is not None:
+                    get_scheduler().settle(api_key, reserved, usage.total_tokens)
+            response = _watch_stream(response, on_first_text, on_usage, on_end)
+        if recorder is not None:
+            if stream:
+                response = recorder.wrap_stream(request, response, start)
+            else:
+                recorder.record_response(request, response, seconds)
+        if log is not None:
+            log.append(record)
+        return response
+
+    return get_scheduler().submit(
+        api_key,
+        create,
+        reserved,
+        actual_tokens=None if stream else _usage_tokens,
+        timeout=QUEUE_TIMEOUT,
+    )
+
+
+def chat_completion(api_key, **request):
+    """client.chat.completions.create(**request), queued and rate limited by the shared scheduler"""
+    return submit_chat_completion(api_key, **request).result()
+
+
+def _has_content(response):
+    return bool(response.choices and response.choices[0].message.content)
+
+
+def hedged_chat_completion(api_key, fallback_model=FALLBACK_MODEL, latency_budget=LATENCY_BUDGET, **request):
+    """chat_completion that also asks fallback_model when request["model"] is slow or fails
+
+    The fallback request goes out once the primary has taken longer than its
+    usual p95 (see LatencyTracker.hedge_delay) or has failed, and the first
+    response with content wins. The other request is cancelled if it is
+    still queued; a request already on the wire is left to finish and
+    ignored. Raises TimeoutError when neither answers within latency_budget.
+    """
+    start = time.monotonic()
+    deadline = start + latency_budget
+    hedge_at = start + min(latency_budget, latencies.hedge_delay(request["model"], latency_budget / 2))
+    logs = {}
+
+    def send(model):
+        # Each request records into its own log; only the winner's reaches the caller's
+        with call_log() as calls:
+            future = submit_chat_completion(api_key, **dict(request, model=model))
+        logs[future] = (model, calls)
+        return future
+
+    pending = {send(request["model"])}
+    hedged = fallback_model is None
+    error = None
+    while True:
+        timeout = max(0.0, (deadline if hedged else hedge_at) - time.monotonic())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and _has_content(future.result()):
+                for other in pending:
+                    other.cancel()
+                log = _call_log.get()
+                if log is not None:
+                    log.extend(logs[future][1])
+                return future.result()
+            error = future.exception() or ValueError(f"{logs[future][0]} returned an empty response")
+        if not hedged and (time.monotonic() >= hedge_at or not pending):
+            pending.add(send(fallback_model))
+            hedged = True
+        elif not pending:
+            raise error
+        elif time.monotonic() >= deadline:
+            for other in pending:
+                other.cancel()
+            raise TimeoutError(f"No analysis within the {latency_budget:g}s latency budget")
+
+
+def _chunk_text(chunk):
+    return chunk.choices[0].delta.content if chunk.choices else None
+
+
+def _has_started(future):
+    """Whether a _read_until_text future ended on text, rather than an error or an empty stream"""
+    if future.exception() is not None:
+        return False
+    chunks, _ = future.result()
+    return bool(chunks) and bool(_chunk_text(chunks[-1]))
+
+
+def _read_until_text(queued):
+    """Wait for a queued stream to open and write its first text; returns (chunks read, stream)"""
+    stream = queued.result()
+    chunks = []
+    for chunk in stream:
+        chunks.append(chunk)
+        if _chunk_text(chunk):
+            break
+    return chunks, stream
+
+
+def hedged_chat_stream(api_key, fallback_model=FALLBACK_MODEL, latency_budget=LATENCY_BUDGET, **request):
+    """Streaming hedged_chat_completion: returns an iterator of chunks once a stream has started writing
+
+    The latency budget applies to the first text. fallback_model is asked
+    once the primary has been silent for longer than its usual p95 time to
+    first text (first_text_latencies) or has failed; the stream that starts
+    writing first is returned and the other is cancelled if still queued,
+    or closed once it opens. Raises TimeoutError when neither starts within
+    latency_budget.
+    """
+    start = time.monotonic()
+    deadline = start + latency_budget
+    hedge_at = start + min(latency_budget, first_text_latencies.hedge_delay(request["model"], latency_budget / 2))
+    logs = {}
+
+    def send(model):
+        with call_log() as calls:
+            queued = submit_chat_completion(api_key, **dict(request, model=model, stream=True))
+        started = Future()
+
+        def read():
+            try:
+                started.set_result(_read_until_text(queued))
+            except Exception as e:
+                started.set_exception(e)
+
+        threading.Thread(target=read, daemon=True, name="stream-reader").start()
+        logs[started] = (model, calls, queued)
+        return started
+
+    def abandon(started):
+        logs[started][2].cancel()
+        started.add_done_callback(lambda f: f.exception() is None and f.result()[1].close())
+
+    pending = {send(request["model"])}
+    hedged = fallback_model is None
+    error = None
+    while True:
+        timeout = max(0.0, (deadline if hedged else hedge_at) - time.monotonic())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if _has_started(future):
+                for other in pending:
+                    abandon(other)
+                log = _call_log.get()
+                if log is not None:
+                    log.extend(logs[future][1])
+                chunks, stream = future.result()
+                return itertools.chain(chunks, stream)
+            error = future.exception() or ValueError(f"{logs[future][0]} returned an empty response")
+        if not hedged and (time.monotonic() >= hedge_at or not pending):
+            pending.add(send(fallback_model))
+            hedged = True
+        elif not pending:
+            raise error
+        elif time.monotonic() >= deadline:
+            for other in pending:
+                abandon(other)
+            raise TimeoutError(f"No analysis started within the {latency_budget:g}s latency budget")
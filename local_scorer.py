@@ -0,0 +1,148 @@
+import re
+
+from grading import merge_analysis
+
+# Name recorded as model_used for rounds scored offline
+LOCAL_MODEL = "offline-tfidf"
+
+# Evaluation criteria from the system prompt and words that show an answer covers them.
+# A scenario's "rubric" adds its own words per criterion.
+DEFAULT_RUBRIC = {
+    "professionalism": ["professional", "calm", "polite", "respect", "respectful", "courteous", "composed"],
+    "problem_solving": ["solution", "solve", "plan", "prioritize", "steps", "options", "fix", "resolve"],
+    "accountability": ["apologize", "responsibility", "own", "mistake", "accountable", "sorry", "commit"],
+    "communication": ["explain", "listen", "discuss", "talk", "inform", "feedback", "clarify", "ask"],
+    "workplace_awareness": ["team", "manager", "colleague", "impact", "policy", "stakeholders", "culture"],
+    "practical_applicability": ["first", "then", "follow", "schedule", "specific", "today", "next"]
+}
+
+# One line of advice per criterion an answer missed
+CRITERION_TIPS = {
+    "professionalism": "keep the tone calm and respectful, even under pressure",
+    "problem_solving": "lay out concrete steps that actually fix the problem",
+    "accountability": "own your part instead of explaining it away",
+    "communication": "say who you would talk to and what you would tell them",
+    "workplace_awareness": "consider the impact on your team, manager and stakeholders",
+    "practical_applicability": "make the plan specific enough to act on today"
+}
+
+# Words that signal an unprofessional answer; each one found lowers the score
+RED_FLAGS = ["quit", "yell", "scream", "revenge", "lie", "ignore", "gossip", "insult", "fight", "whatever"]
+
+# Lowest combined score for each medal, best first
+MEDAL_THRESHOLDS = [("🥇", 0.6), ("🥈", 0.45), ("🥉", 0.3), ("🤔", 0.12), ("🚨", float("-inf"))]
+
+# Answers shorter than this many words lose part of their score
+FULL_LENGTH_WORDS = 30
+# Cosine similarity to a reference answer that counts as a full match
+FULL_SIMILARITY = 0.35
+RED_FLAG_PENALTY = 0.2
+
+_STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could did do does
+doing don for from had has have having he her here hers him his how i i'd i'll i'm if in into is it it's its
+just me more most my no nor not of off on once only or other our ours out over own same she should so some
+such than that the their theirs them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with would you your yours
+""".split()) - {"own", "then"}
+_WORD = re.compile(r"[a-z][a-z'-]*")
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ments", "ment", "ness", "edly", "ed", "ly", "es", "s")
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _terms(text):
+    return [_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _tfidf(documents, vocabulary):
+    """L2-normalised sublinear TF-IDF rows for tokenised documents"""
+    import numpy as np
+
+    counts = np.zeros((len(documents), len(vocabulary)))
+    for row, terms in enumerate(documents):
+        np.add.at(counts[row], [vocabulary[term] for term in terms], 1)
+    tf = np.zeros_like(counts)
+    np.log1p(counts, out=tf, where=counts > 0)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1
+    weights = tf * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
+
+
+def score_answers(scenario, answers):
+    """Score every answer against the scenario's references and rubric in one pass
+
+    Returns (scores, coverage, criteria): a combined score per answer, a
+    boolean answers x criteria matrix, and the criteria names in its order.
+    """
+    # Imported on the first offline grade rather than at startup
+    import numpy as np
+
+    rubric = {criterion: list(words) for criterion, words in DEFAULT_RUBRIC.items()}
+    for criterion, words in scenario.get("rubric", {}).items():
+        rubric.setdefault(criterion, []).extend(words)
+    references = scenario.get("reference_answers") or [scenario["scenario"]]
+
+    answer_terms = [_terms(answer) for answer in answers]
+    reference_terms = [_terms(reference) for reference in references]
+    keyword_terms = [[_stem(word.lower()) for word in words] for words in rubric.values()]
+    flag_terms = [_stem(word) for word in RED_FLAGS]
+    vocabulary = {}
+    for terms in answer_terms + reference_terms + keyword_terms + [flag_terms]:
+        for term in terms:
+            vocabulary.setdefault(term, len(vocabulary))
+
+    vectors = _tfidf(answer_terms + reference_terms, vocabulary)
+    similarity = (vectors[:len(answers)] @ vectors[len(answers):].T).max(axis=1)
+
+    present = np.zeros((len(answers), len(vocabulary)), dtype=bool)
+    for row, terms in enumerate(answer_terms):
+        present[row, [vocabulary[term] for term in terms]] = True
+    keywords = np.zeros((len(rubric), len(vocabulary)), dtype=bool)
+    for row, terms in enumerate(keyword_terms):
+        keywords[row, [vocabulary[term] for term in terms]] = True
+    coverage = (present.astype(np.int32) @ keywords.T.astype(np.int32)) > 0
+    flags = present[:, [vocabulary[term] for term in flag_terms]].sum(axis=1)
+    lengths = np.array([len(answer.split()) for answer in answers])
+
+    quality = 0.5 * np.clip(similarity / FULL_SIMILARITY, 0, 1) + 0.5 * coverage.mean(axis=1)
+    scores = quality * (0.5 + 0.5 * np.clip(lengths / FULL_LENGTH_WORDS, 0, 1)) - RED_FLAG_PENALTY * flags
+    return scores, coverage, list(rubric)
+
+
+def _medal(score):
+    return next(medal for medal, threshold in MEDAL_THRESHOLDS if score >= threshold)
+
+
+def _label(criterion):
+    return criterion.replace("_", " ")
+
+
+def grade_round_locally(scenario, answers, player_names):
+    """Grade a round without the network, as an analysis in the per-player engine's format"""
+    scores, coverage, criteria = score_answers(scenario, answers)
+    grades = []
+    for score, covered in zip(scores, coverage):
+        strengths = [_label(c) for c, hit in zip(criteria, covered) if hit]
+        missing = [c for c, hit in zip(criteria, covered) if not hit]
+        lines = [f"**Strengths:** {', '.join(strengths)}." if strengths else "**Strengths:** none of the criteria yet."]
+        if missing:
+            lines.append("**To improve:** " + "; ".join(CRITERION_TIPS.get(c, _label(c)) for c in missing[:2]) + ".")
+        lines.append(f"*Offline score: {score:.2f}*")
+        grades.append((_medal(score), "\n\n".join(lines)))
+    lesson_parts = ["## 📚 Learning Lesson"]
+    if scenario.get("reference_answers"):
+        lesson_parts.append(f"**What a strong answer looks like:** {scenario['reference_answers'][0]}")
+    # The criterion most players missed is the round's lesson
+    weakest = criteria[int(coverage.sum(axis=0).argmin())]
+    lesson_parts.append(f"**Bonus tip:** {CRITERION_TIPS.get(weakest, _label(weakest)).capitalize()}.")
+    lesson_parts.append("*Scored offline by keyword and similarity matching; AI feedback is more detailed.*")
+    return merge_analysis(player_names, grades, "\n\n".join(lesson_parts))
+
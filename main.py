@@ -1,220 +1,936 @@
 import streamlit as st
 import json
-import random
-import openai
-from openai import OpenAI
-import os
-import dotenv
-import re
-
-dotenv.load_dotenv()
-# Load OpenAI API key from environment variable
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-# Sample scenarios data
-scenarios = [
-    {
-        "title": "The New Team Member",
-        "scenario": "A shy new colleague sits alone at lunch every day. How do you help them feel welcome without being pushy?"
-    },
-    {
-        "title": "The Blame Game",
-        "scenario": "A project failed and team members are pointing fingers at each other. As a team member, how do you help move forward constructively?"
-    },
-    {
-        "title": "The Difficult Client",
-        "scenario": "A client is consistently rude and dismissive during meetings. How do you maintain professionalism while addressing the situation?"
-    },
-    {
-        "title": "The Overworked Colleague",
-        "scenario": "You notice a teammate is staying very late every day and seems stressed. How do you offer support without overstepping boundaries?"
-    },
-    {
-        "title": "The Communication Breakdown",
-        "scenario": "Two departments are not sharing important information, causing project delays. How do you facilitate better communication?"
-    },
-    {
-        "title": "The Late Arrival",
-        "scenario": "You are late for work and your boss is angry. What would you do?"
-    },
-    {
-        "title": "The Credit Stealer",
-        "scenario": "A coworker takes credit for your idea in a team meeting. How do you handle this professionally?"
-    },
-    {
-        "title": "The Tech Meltdown",
-        "scenario": "Your computer crashes the morning of a big presentation, taking your work with it. The presentation is in 2 hours. What do you do?"
-    }
-]
-
-# System prompt for GPT
-SYSTEM_PROMPT = """You are an engaging workplace skills instructor who uses interactive scenarios with constructive feedback and light humor to teach professional behavior.
-
-## Task Format
-
-### Ranking System
-🥇 GOLD MEDAL: Best response (⭐⭐⭐⭐⭐)  
-🥈 SILVER MEDAL: Good with minor issues (⭐⭐⭐⭐)  
-🥉 BRONZE MEDAL: Okay but needs improvement (⭐⭐⭐)  
-🤔 PARTICIPATION TROPHY: Poor but shows effort (⭐⭐)  
-🚨 "We Need to Talk": Major issues (⭐)
-
-### Feedback Requirements
-For each answer include:
-- Clear reasoning for ranking
-- Specific strengths/weaknesses
-- Light, appropriate humor (workplace metaphors, gentle sarcasm, pop culture references)
-- Constructive suggestions
-- Professional context (why this matters at work)
-
-### Learning Lesson Structure
-End with:
-- Key principle/framework (bolded)
-- Practical application
-- Why it matters professionally
-- Bonus tip: Memorable, actionable advice
-
-## Evaluation Criteria
-Rate based on: Professionalism • Problem-solving • Accountability • Communication • Workplace awareness • Practical applicability
-
-## Guidelines
-- Keep humor light and encouraging (never mocking)
-- Be constructive and end positively
-- Make lessons actionable and memorable
-- Use emojis sparingly but effectively
-
-Please evaluate the responses and provide rankings with feedback. IMPORTANT: For each player's response, clearly indicate which medal/trophy they receive (🥇 GOLD MEDAL, 🥈 SILVER MEDAL, etc.) so scores can be calculated."""
-
-def get_llm_analysis(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo"):
-    """Get analysis from OpenAI API"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+import time
+import hmac
+from analysis_cache import AnalysisCache, make_cache_key
+from answer_index import DEFAULT_THRESHOLD, AnswerIndex
+from config import env
+from exports import ExportMemo, NDJSONStream
+from game_engine import GameEngine, GameStateError
+from grading import (SpeculativeRound, find_reused_grades, get_analysis_reusing_grades, get_llm_analysis,
+                     get_parallel_llm_analysis, merge_analysis, remember_grades)
+from leaderboard import ALL_TIME, create_leaderboard, is_ranked
+from llm_client import (FALLBACK_MODEL, LATENCY_BUDGET, call_log, first_text_latencies, get_scheduler,
+                        hedged_chat_stream, latencies, record_call)
+from local_scorer import LOCAL_MODEL, grade_round_locally
+from metrics import METRICS_PORT, RERUN_BUCKETS, SNAPSHOT_PATH, ActiveSessions, SnapshotWriter, metrics, serve_prometheus
+from prompts import ANALYSIS_SYSTEM_PROMPT, TEMPERATURE, build_analysis_messages
+from scenario_catalog import ScenarioDeck, load_catalog, scenario_sources, sources_signature
+from scenario_producer import DIFFICULTIES, SCENARIO_TOPICS, ProducerPool
+from rooms import CODE_LENGTH, RoomRegistry
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, in_context, request_context
+from scoring import MedalScanner
+from state_store import create_state_store, snapshot_game_state
+from token_budget import analysis_max_tokens, summarize_usage
+
+# Load OpenAI API key from the environment (or .env, read once per process)
+OPENAI_API_KEY = env("OPENAI_API_KEY")
+# Opening the app with ?admin=<token> shows the performance panel; unset hides it for everyone
+ADMIN_TOKEN = env("ADMIN_TOKEN")
+
+# Play modes
+SHARED_SCREEN = "Shared screen"
+ROOM_MODE = "Room (multi-device)"
+
+# Background workers shared by all sessions for speculative grading
+SPECULATION_WORKERS = 16
+
+# Seconds between queue position updates while an analysis waits for the AI service
+QUEUE_POLL_SECONDS = 0.5
+
+# Seconds between live refreshes of a room view
+ROOM_REFRESH_SECONDS = 2
+
+# Scenarios shown per page in the sidebar picker and the preview
+SCENARIO_PAGE_SIZE = 50
+SCENARIO_PREVIEW_LIMIT = 20
+
+# Unplayed scenarios left in a game's deck below which a freshly generated one is added
+DECK_LOW_WATER = 3
+
+RERUN_SECONDS = metrics.histogram("script_run_seconds", "Wall time of one Streamlit script run", RERUN_BUCKETS)
+
+# Players listed on the leaderboard
+LEADERBOARD_ROWS = 10
+
+# Models offered in the sidebar
+MODELS = ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo-preview"]
+NO_FALLBACK = "None"
+
+def open_analysis_stream(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo", hedging=None):
+    """Start streaming the analysis from OpenAI API; returns the chunks once the text has started
+    
+    hedging=(fallback_model, latency_budget) bounds the wait for the first
+    text, asking fallback_model too when the chosen model is slow to start.
+    """
+    fallback_model, latency_budget = hedging or (None, LATENCY_BUDGET)
+    return hedged_chat_stream(
+        api_key,
+        fallback_model,
+        latency_budget,
+        model=model,
+        messages=build_analysis_messages(scenario_text, answers, player_names),
+        max_tokens=analysis_max_tokens(len(player_names)),
+        temperature=TEMPERATURE
+    )
+
+def stream_text(stream):
+    """Yield the analysis text of stream's chunks"""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def get_local_analysis(scenario_text, answers, player_names, api_key=None, model=None):
+    """Score the round on this machine against the scenario's reference answers and rubric"""
     try:
-        client = OpenAI(api_key=api_key)
-        
-        # Format the answers for the prompt
-        formatted_answers = ""
-        for i, (name, answer) in enumerate(zip(player_names, answers), 1):
-            formatted_answers += f"{name}: {answer}\n\n"
-        
-        user_prompt = f"""
-Scenario: {scenario_text}
-
-Student Answers:
-{formatted_answers}
-
-Please evaluate these responses using the ranking system and provide feedback with a learning lesson. Make sure to clearly identify which medal/trophy each player receives.
-"""
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=4096,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content, None
+        start = time.perf_counter()
+        scenario = get_scenario_catalog().by_text(scenario_text) or {"scenario": scenario_text}
+        analysis = grade_round_locally(scenario, answers, player_names)
+        record_call(LOCAL_MODEL, time.perf_counter() - start)
+        return analysis, None
     except Exception as e:
         return None, str(e)
 
-def extract_scores_from_analysis(analysis_text, player_names):
-    """Extract scores from AI analysis based on medals/trophies awarded"""
-    scores = {}
-    
-    # Score mapping
-    score_map = {
-        "🥇": 10,  # Gold Medal
-        "🥈": 10,  # Silver Medal  
-        "🥉": 10,  # Bronze Medal
-        "🤔": 10,  # Participation Trophy
-        "🚨": 10   # "We Need to Talk"
-    }
-    
-    # Try to find medals for each player
-    for name in player_names:
-        scores[name] = 0  # Default score
-        
-        # Look for medal mentions with player name nearby
-        for medal, points in score_map.items():
-            if medal in analysis_text:
-                # Simple heuristic: if medal appears, check if player name is nearby
-                medal_index = analysis_text.find(medal)
-                if medal_index != -1:
-                    # Look for player name within 200 characters of the medal
-                    context = analysis_text[max(0, medal_index-100):medal_index+100]
-                    if name.lower() in context.lower():
-                        scores[name] = points
-                        break
-    
-    return scores
+@st.cache_resource
+def get_analysis_cache():
+    """Process-wide analysis cache shared by all sessions"""
+    cache = AnalysisCache()
+    metrics.gauge("analysis_cache_lookups", "Analysis cache lookups since start by result",
+                  lambda: {(("result", "hit"),): cache.hits, (("result", "miss"),): cache.misses})
+    return cache
+
+# Grading engines selectable in the sidebar
+ANALYSIS_ENGINES = {
+    "Combined": get_llm_analysis,
+    "Per-player (parallel)": get_parallel_llm_analysis,
+    "Offline (instant)": get_local_analysis
+}
+
+@st.cache_resource
+def get_answer_index():
+    """Process-wide index of graded answers shared by all sessions"""
+    return AnswerIndex()
+
+def get_cached_llm_analysis(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo", use_cache=True,
+                            engine="Combined", speculation=None, hedging=None, reuse_threshold=None):
+    """Get analysis, serving identical rounds from the analysis cache
+    
+    A SpeculativeRound started with the same key and model finishes the
+    per-player engine from the grades it already has. hedging=(fallback_model,
+    latency_budget) configures the combined engine. Analyses served by a
+    fallback model are not cached, so the round is not stuck with them. With
+    reuse_threshold, answers at least that similar to one graded before keep
+    its grade and only the others are analyzed.
+    """
+    analyze = ANALYSIS_ENGINES[engine]
+    options = {}
+    if hedging is not None and analyze is get_llm_analysis:
+        options["fallback_model"], options["latency_budget"] = hedging
+    speculated = (speculation is not None and analyze is get_parallel_llm_analysis
+                  and (speculation.api_key, speculation.model) == (api_key, model))
+    analyze_answers = (speculation.finish if speculated
+                       else partial(analyze, scenario_text, api_key=api_key, model=model, **options))
+    reuse = reuse_threshold is not None and use_cache and not speculated and analyze is not get_local_analysis
+    
+    def run():
+        if reuse:
+            return get_analysis_reusing_grades(analyze_answers, get_answer_index(), reuse_threshold, scenario_text,
+                                               answers, player_names)
+        return analyze_answers(answers, player_names)
+    
+    if not use_cache:
+        return run()
+    
+    cache = get_analysis_cache()
+    key = make_cache_key(ANALYSIS_SYSTEM_PROMPT, scenario_text, player_names, answers, model, TEMPERATURE, engine,
+                         reuse_threshold if reuse else None)
+    analysis = cache.get(key)
+    if analysis is not None:
+        return analysis, None
+    
+    with call_log() as calls:
+        analysis, error = run()
+    if analysis and all(call["model"] == model for call in calls):
+        cache.set(key, analysis)
+    return analysis, error
+
+def served_by(calls, requested_model):
+    """The model(s) that actually produced an analysis; the requested one for cache hits"""
+    return ", ".join(sorted({call["model"] for call in calls})) or requested_model
+
+def format_token_usage(usage):
+    """One-line estimated versus actual token usage of a round"""
+    parts = [f"🔢 Tokens: ~{usage['estimated_prompt_tokens']:,} prompt estimated"]
+    if usage["prompt_tokens"] is not None:
+        parts.append(f"{usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} completion used")
+        if usage["cached_tokens"]:
+            parts.append(f"{usage['cached_tokens']:,} prompt tokens cached")
+    parts.append(f"{usage['max_tokens']:,} max completion")
+    return " · ".join(parts)
+
+def render_streaming_analysis(scenario_text, answers, player_names, api_key, model="gpt-3.5-turbo", use_cache=True,
+                              reuse_threshold=None, hedging=None):
+    """Render the analysis into the page as it streams in, returning (analysis, error)
+    
+    With reuse_threshold, a round whose every answer was graded before is
+    served from the answer index; otherwise the whole round is streamed.
+    The page shows the game's place in the AI service queue until the text
+    starts. hedging is passed to open_analysis_stream; a streamed fallback
+    analysis is not cached.
+    """
+    cache = get_analysis_cache()
+    reuse = reuse_threshold is not None and use_cache
+    key = make_cache_key(ANALYSIS_SYSTEM_PROMPT, scenario_text, player_names, answers, model, TEMPERATURE, "Combined",
+                         reuse_threshold if reuse else None)
+    if use_cache:
+        analysis = cache.get(key)
+        if analysis is not None:
+            return analysis, None
+    if reuse:
+        index = get_answer_index()
+        reused = find_reused_grades(index, scenario_text, answers, player_names, reuse_threshold)
+        if len(reused) == len(player_names):
+            lesson = index.lesson(scenario_text) or ""
+            return merge_analysis(player_names, [reused[name] for name in player_names], lesson), None
+    
+    st.subheader("🎯 AI Instructor Analysis")
+    medals_placeholder = st.empty()
+    live_medals = []
+    
+    def show_medal(name, medal):
+        live_medals.append(f"{medal} {name}")
+        medals_placeholder.caption(" · ".join(live_medals))
+    
+    try:
+        with call_log() as calls:
+            stream = run_with_queue_status(open_analysis_stream, scenario_text, answers, player_names, api_key, model,
+                                           hedging)
+            analysis = st.write_stream(stream_with_live_medals(stream_text(stream), player_names, show_medal))
+    except Exception as e:
+        return None, str(e)
+    
+    if analysis and use_cache and all(call["model"] == model for call in calls):
+        cache.set(key, analysis)
+    if analysis and reuse:
+        remember_grades(get_answer_index(), scenario_text, answers, player_names, analysis)
+    return analysis, None
+
+def stream_with_live_medals(chunks, player_names, on_medal):
+    """Pass analysis chunks through, reporting each player's medal as soon as its line completes
+    
+    on_medal(name, medal) is called once per player, matched line by line
+    exactly as scan_medals scores the finished analysis.
+    """
+    scanner = MedalScanner(player_names)
+    for chunk in chunks:
+        yield chunk
+        for name, medal in scanner.feed(chunk):
+            on_medal(name, medal)
+    for name, medal in scanner.close():
+        on_medal(name, medal)
+
+@st.cache_resource(max_entries=1)
+def load_scenario_catalog(signature):
+    """Load and index every scenario source (shared by all sessions)"""
+    return load_catalog([path for path, _, _ in signature])
+
+def get_scenario_catalog():
+    """Shared scenario catalog, reloaded only when a scenario file changes"""
+    return load_scenario_catalog(sources_signature(scenario_sources()))
+
+@st.cache_resource
+def get_scenario_producers():
+    """Background writers of fresh scenarios per API key, shared by all sessions"""
+    return ProducerPool()
+
+def update_scenario_producer(api_key, enabled):
+    """Use this API key's scenario producer while enabled, and let it stop once no session does"""
+    producers = get_scenario_producers()
+    if enabled:
+        st.session_state.scenario_producer = producers.get(api_key, st.session_state.session_id,
+                                                           get_scenario_catalog().scenarios)
+    else:
+        producers.release(st.session_state.session_id)
+        st.session_state.scenario_producer = None
+
+def deal_scenario(catalog):
+    """Next scenario this game has not played, in the chosen topic if there is one
+    
+    When the deck runs low, a ready generated scenario is added to the
+    catalog first, so the deck keeps growing instead of starting over.
+    """
+    deck = st.session_state.deck
+    topic = st.session_state.get("scenario_topic")
+    producer = st.session_state.get("scenario_producer")
+    if producer is not None and deck.remaining(catalog, topic) < DECK_LOW_WATER:
+        scenario = producer.take(topic)
+        if scenario is not None:
+            catalog.add(scenario)
+    return deck.draw(catalog, topic)
+
+@st.cache_resource
+def get_leaderboard():
+    """Organization-wide leaderboard shared by all sessions"""
+    return create_leaderboard()
+
+def record_leaderboard_round():
+    """Add the round just graded to the leaderboard; a rerun of the same round is not counted twice"""
+    current = st.session_state.game.round
+    get_leaderboard().record_round(f"{st.session_state.game_id}:{current.number}", current.scores,
+                                   current.scenario.get("id"))
+
+@st.cache_resource
+def get_state_store():
+    """Process-wide game state store shared by all sessions"""
+    return create_state_store()
+
+def persist_game():
+    """Save the game at a round boundary so it survives refreshes and restarts"""
+    state = dict(st.session_state.game.to_state(), num_players=st.session_state.num_players)
+    get_state_store().save(st.session_state.game_id, snapshot_game_state(state))
+
+def start_game_id(game_id=None):
+    """Give this session a game id and put it in the URL so a refresh restores the game"""
+    st.session_state.game_id = game_id or uuid.uuid4().hex[:12]
+    st.query_params["game"] = st.session_state.game_id
+
+@st.cache_resource
+def get_active_sessions():
+    """Process-wide session tracker; also registers the process gauges and starts the metric exporters
+
+    Gauges are read from the exporter threads, so they read the objects
+    directly; the cached resources register theirs when they are built.
+    """
+    sessions = ActiveSessions()
+    metrics.gauge("active_sessions", "Sessions that reran the app in the last few minutes", sessions.count)
+    metrics.gauge("llm_scheduler_requests", "LLM requests waiting in or running on the shared scheduler",
+                  lambda: {(("state", state),): get_scheduler().stats()[state] for state in ("queued", "running")})
+    if SNAPSHOT_PATH:
+        SnapshotWriter(metrics).start()
+    if METRICS_PORT:
+        serve_prometheus(metrics)
+    return sessions
+
+def is_admin():
+    """Whether this session opened the app with the admin token"""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(st.query_params.get("admin", ""), ADMIN_TOKEN)
+
+@st.cache_resource
+def get_speculation_pool():
+    """Process-wide worker pool for speculative grading"""
+    return ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculative-grader")
+
+@st.cache_resource
+def get_analysis_pool():
+    """Process-wide threads that run analyses while the page shows the queue position"""
+    return ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="analysis")
+
+def run_with_queue_status(fn, *args, **kwargs):
+    """Call fn in the background, showing this game's place in the AI service queue while it waits"""
+    future = get_analysis_pool().submit(in_context(fn), *args, **kwargs)
+    status = st.empty()
+    scheduler = get_scheduler()
+    # Polled with wait(), not result(timeout=): a TimeoutError raised by fn itself must not read as "still running"
+    while not wait([future], timeout=QUEUE_POLL_SECONDS).done:
+        position = scheduler.queue_position(st.session_state.game_id)
+        if position:
+            status.caption(f"⏳ The AI service is busy - you are number {position} in the queue")
+        else:
+            status.empty()
+    status.empty()
+    return future.result()
+
+def cancel_speculation():
+    """Drop any background grading started for the current round"""
+    speculation = st.session_state.get("speculation")
+    if speculation is not None:
+        speculation.cancel()
+    st.session_state.speculation = None
 
 def initialize_session_state():
     """Initialize all session state variables"""
-    if 'current_scenario' not in st.session_state:
-        st.session_state.current_scenario = None
-    if 'current_player' not in st.session_state:
-        st.session_state.current_player = 1
+    if 'game_id' not in st.session_state:
+        # Restore the game named in the URL, if the store still has it
+        game_id = st.query_params.get("game")
+        saved = get_state_store().load(game_id) if game_id else None
+        if saved:
+            st.session_state.game = GameEngine.from_state(saved)
+            st.session_state.num_players = saved.get("num_players", 3)
+        start_game_id(game_id if saved else None)
+    if 'game' not in st.session_state:
+        st.session_state.game = GameEngine()
     if 'num_players' not in st.session_state:
         st.session_state.num_players = 3
-    if 'player_names' not in st.session_state:
-        st.session_state.player_names = []
-    if 'submitted_answers' not in st.session_state:
-        st.session_state.submitted_answers = []
-    if 'all_submitted' not in st.session_state:
-        st.session_state.all_submitted = False
-    if 'llm_analysis' not in st.session_state:
-        st.session_state.llm_analysis = None
-    if 'show_analysis' not in st.session_state:
-        st.session_state.show_analysis = False
-    if 'player_scores' not in st.session_state:
-        st.session_state.player_scores = {}
-    if 'round_number' not in st.session_state:
-        st.session_state.round_number = 1
-    if 'game_ended' not in st.session_state:
-        st.session_state.game_ended = False
-    if 'winner' not in st.session_state:
-        st.session_state.winner = None
-
-def check_for_winner():
-    """Check if any player has reached 10 points and end the game"""
-    if st.session_state.player_scores:
-        max_score = max(st.session_state.player_scores.values())
-        if max_score >= 10:
-            # Find the winner (player with highest score)
-            winner = max(st.session_state.player_scores.items(), key=lambda x: x[1])
-            st.session_state.winner = winner[0]
-            st.session_state.game_ended = True
-            return True
-    return False
-
-def reset_round():
-    """Reset for a new round but keep scores"""
-    st.session_state.current_scenario = None
-    st.session_state.current_player = 1
-    st.session_state.submitted_answers = []
-    st.session_state.all_submitted = False
-    st.session_state.llm_analysis = None
-    st.session_state.show_analysis = False
-    
-    # Ensure current_player doesn't exceed number of players
-    if hasattr(st.session_state, 'player_names') and st.session_state.player_names:
-        if st.session_state.current_player > len(st.session_state.player_names):
-            st.session_state.current_player = 1
+    if 'deck' not in st.session_state:
+        # Kept across game resets, so the same group does not get repeats
+        game = st.session_state.game
+        played = [record["scenario"] for record in game.history] + ([game.round.scenario] if game.round else [])
+        st.session_state.deck = ScenarioDeck(seen=[scenario["id"] for scenario in played if "id" in scenario])
+    if 'exports' not in st.session_state:
+        st.session_state.exports = ExportMemo()
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    get_active_sessions().touch(st.session_state.session_id)
+
+def start_round(scenario):
+    """Play scenario as the current round, dropping any background grading of the one it replaces"""
+    if scenario is None:
+        st.toast("No scenarios available - check the scenario files", icon="⚠️")
+        return
+    cancel_speculation()
+    st.session_state.deck.mark_played(scenario)
+    st.session_state.game.start_round(scenario)
+    persist_game()
+
+def skip_round():
+    """Move on to the next round number without grading this one"""
+    cancel_speculation()
+    st.session_state.game.advance()
+    persist_game()
 
 def reset_game():
     """Reset entire game including scores"""
-    st.session_state.current_scenario = None
-    st.session_state.current_player = 1
-    st.session_state.submitted_answers = []
-    st.session_state.all_submitted = False
-    st.session_state.llm_analysis = None
-    st.session_state.show_analysis = False
-    st.session_state.player_scores = {}
-    st.session_state.round_number = 1
-    st.session_state.player_names = []
-    st.session_state.game_ended = False
-    st.session_state.winner = None
+    cancel_speculation()
+    st.session_state.game = GameEngine()
+    st.session_state.exports = ExportMemo()
+    start_game_id()
+
+@st.fragment
+def render_scoreboard():
+    """Sidebar scoreboard, rerun on its own without re-executing the whole app"""
+    game = st.session_state.game
+    if game.player_names and game.scores:
+        st.subheader("🏆 Current Scores")
+        sorted_scores = game.standings()
+        
+        # Check if anyone is close to winning
+        max_score = sorted_scores[0][1] if sorted_scores else 0
+        if max_score >= game.winning_score - 2 and not game.game_ended:
+            st.warning(f"⚡ {sorted_scores[0][0]} is close to winning! (Need {game.winning_score} points)")
+        
+        for i, (name, score) in enumerate(sorted_scores):
+            if i == 0:
+                if score >= game.winning_score:
+                    st.write(f"🏆 **{name}**: {score} points (WINNER!)")
+                else:
+                    st.write(f"👑 **{name}**: {score} points")
+            else:
+                st.write(f"🎯 **{name}**: {score} points")
+        
+        st.write(f"**Round:** {game.round_number}")
+        st.caption(f"🎯 First to {game.winning_score} points wins!")
+
+@st.fragment
+def render_leaderboard(player_names=(), scenario=None):
+    """Organization-wide rankings across every game; reads only the top rows, however many have played"""
+    leaderboard = get_leaderboard()
+    with st.expander("🏅 Leaderboard"):
+        board = ALL_TIME
+        if scenario and scenario.get("id"):
+            if st.radio("Board", ["All-time", "This scenario"], horizontal=True,
+                        label_visibility="collapsed") == "This scenario":
+                board = scenario["id"]
+        leaders = leaderboard.top(LEADERBOARD_ROWS, board)
+        if not leaders:
+            st.caption("No graded rounds yet")
+        for row in leaders:
+            icon = {1: "🥇", 2: "🥈", 3: "🥉"}.get(row["rank"], f"#{row['rank']}")
+            rounds = f"{row['rounds']} round{'s' if row['rounds'] != 1 else ''}"
+            st.write(f"{icon} **{row['name']}**: {row['points']} points ({rounds})")
+        ranks = [(name, leaderboard.rank(name, board)) for name in player_names]
+        ranks = [f"{name} #{found['rank']:,}" for name, found in ranks if found]
+        if ranks:
+            st.caption("This game: " + " · ".join(ranks))
+        if not all(is_ranked(name) for name in player_names):
+            st.caption("Players without a name of their own (like \"Player 1\") are left off the leaderboard")
+        stats = leaderboard.stats()
+        st.caption(f"{stats['players']:,} players · {stats['rounds']:,} rounds graded")
+
+def render_progress():
+    """Show how many players have submitted this round"""
+    current = st.session_state.game.round
+    total_players = len(current.player_names)
+    submitted_count = len(current.answers)
+    
+    # Ensure progress is between 0 and 1
+    progress = min(submitted_count / total_players, 1.0) if total_players > 0 else 0.0
+    st.progress(progress, text=f"Progress: {submitted_count}/{total_players} players submitted")
+
+def submit_answer(response_key, speculate=None):
+    """Record the current player's answer (submit button callback)
+    
+    With speculate=(api_key, model) the answer starts grading in the
+    background right away.
+    """
+    game = st.session_state.game
+    if game.round is None or game.round.complete:
+        return  # A second click landed after the round filled up
+    player_name = game.submit(st.session_state.get(response_key, ""))
+    if player_name is None:
+        st.session_state.submit_error = True
+        return
+    response = game.round.answers[-1]
+    
+    speculation = None
+    if speculate:
+        speculation = st.session_state.get("speculation")
+        if speculation is None:
+            speculation = SpeculativeRound(get_speculation_pool(), game.round.scenario["scenario"], *speculate)
+            st.session_state.speculation = speculation
+        # Nobody waits on these yet, so they yield to analyses players are watching
+        with request_context(game=st.session_state.game_id, priority=PRIORITY_BACKGROUND):
+            speculation.add(player_name, response)
+    
+    if game.round.complete:
+        if speculation is not None:
+            with request_context(game=st.session_state.game_id):
+                speculation.start_lesson(game.round.answers, game.round.player_names)
+        persist_game()
+
+@st.fragment
+def render_answer_entry(speculate=None):
+    """Current player's answer form; submissions rerun only this section until the last answer"""
+    current = st.session_state.game.round
+    if current.complete:
+        # The round moves on to the analysis view, which lives outside this fragment
+        st.rerun()
+    
+    render_progress()
+    total_players = len(current.player_names)
+    current_player_name = current.current_player
+    player_number = len(current.answers) + 1
+    
+    st.subheader(f"🎯 {current_player_name}'s Turn")
+    st.write(f"**Player {player_number} of {total_players}**")
+    
+    # Show who has already submitted
+    if current.answers:
+        st.write("**Already submitted:**")
+        for name in current.player_names[:len(current.answers)]:
+            st.write(f"✅ {name}")
+    
+    # Current player input
+    response_key = f"current_response_{current.number}_{player_number}"
+    st.text_area(
+        f"How would you handle this situation, {current_player_name}?",
+        height=150,
+        placeholder="Enter your response here...",
+        key=response_key
+    )
+    
+    # The callback updates state before this fragment reruns, so a submission
+    # only re-renders this section
+    st.button(
+        f"Submit Response for {current_player_name}",
+        type="primary",
+        on_click=submit_answer,
+        args=(response_key, speculate)
+    )
+    if st.session_state.pop("submit_error", False):
+        st.error("⚠️ Please enter a response before submitting!")
+
+def render_downloads(record=None):
+    """Download buttons; the files are built only when a button is clicked"""
+    exports = st.session_state.exports
+    history = st.session_state.game.history
+    
+    col1, col2, col3 = st.columns(3)
+    if record is not None:
+        with col1:
+            st.download_button(
+                label="📄 Download Round Report",
+                data=lambda: exports.report(record),
+                file_name=f"round_{record['round']}_report.md",
+                mime="text/markdown",
+                on_click="ignore"
+            )
+        
+        with col2:
+            st.download_button(
+                label="📊 Download JSON",
+                data=lambda: exports.round_json(record),
+                file_name=f"round_{record['round']}_data.json",
+                mime="application/json",
+                on_click="ignore"
+            )
+    
+    with col3:
+        st.download_button(
+            label="🗂️ Download Whole Game",
+            data=lambda: NDJSONStream(history),
+            file_name="game_rounds.ndjson",
+            mime="application/x-ndjson",
+            disabled=not history,
+            on_click="ignore"
+        )
+
+@st.fragment
+def render_analysis_results(catalog):
+    """Analysis, updated scores and downloads; download clicks rerun only this section"""
+    game = st.session_state.game
+    st.subheader("🎯 AI Instructor Analysis")
+    st.markdown(game.round.analysis)
+    usage = game.history[-1].get("token_usage") if game.history else None
+    if usage and usage["estimated_prompt_tokens"] is not None:
+        st.caption(format_token_usage(usage))
+    
+    # Show updated scores
+    st.subheader("🏆 Updated Scores")
+    sorted_scores = game.standings()
+    
+    cols = st.columns(len(sorted_scores))
+    for i, (name, total_score) in enumerate(sorted_scores):
+        with cols[i]:
+            if i == 0:
+                st.metric(f"👑 {name}", f"{total_score} pts", delta="Leader!")
+            else:
+                leader_score = sorted_scores[0][1]
+                diff = total_score - leader_score
+                st.metric(f"🎯 {name}", f"{total_score} pts", delta=f"{diff:+d}")
+    
+    # Next round button
+    if not game.game_ended:
+        if st.button("🎲 Start Next Round", type="primary"):
+            start_round(deal_scenario(catalog))
+            st.rerun()
+    else:
+        st.info(f"🏆 Game Over! {game.winner} has won with {game.scores[game.winner]} points!")
+        st.write("👈 Click 'Reset Game' in the sidebar to start a new game.")
+    
+    # Download options
+    st.subheader("💾 Download Options")
+    render_downloads(game.history[-1] if game.history else None)
+
+@st.cache_resource
+def get_room_registry():
+    """Process-wide room registry shared by all sessions"""
+    def on_scored(room, round_number, scenario, round_scores):
+        # Codes are reused once a room expires, so the creation time tells rooms apart
+        round_key = f"room-{room.code}-{room.created_at:.0f}:{round_number}"
+        get_leaderboard().record_round(round_key, round_scores, scenario.get("id"))
+    registry = RoomRegistry(on_scored=on_scored)
+    metrics.gauge("open_rooms", "Multi-device rooms in the registry", registry.__len__)
+    return registry
+
+def make_room_grader(api_key, model, engine, use_cache, hedging=None, offline_fallback=False, reuse_threshold=None):
+    """Grader a room runs on a worker thread, bound to the host's AI settings"""
+    def grade(scenario_text, answers, player_names):
+        if not api_key and not offline_fallback and ANALYSIS_ENGINES[engine] is not get_local_analysis:
+            return None, "The room host has no OpenAI API key configured"
+        if not api_key:
+            return get_local_analysis(scenario_text, answers, player_names)
+        analysis, error = get_cached_llm_analysis(scenario_text, answers, player_names, api_key, model,
+                                                  use_cache=use_cache, engine=engine, hedging=hedging,
+                                                  reuse_threshold=reuse_threshold)
+        if not analysis and offline_fallback:
+            return get_local_analysis(scenario_text, answers, player_names)
+        return analysis, error
+    return grade
+
+def enter_room(room, token):
+    """Remember the room and seat this session plays in, also in the URL for refreshes"""
+    st.session_state.room_code = room.code
+    st.session_state.room_token = token
+    st.query_params["room"] = room.code
+    st.query_params["seat"] = token
+
+def forget_room():
+    """Stop following a room in this session"""
+    st.session_state.room_code = None
+    st.session_state.room_token = None
+    for param in ("room", "seat"):
+        st.query_params.pop(param, None)
+
+def leave_room(room):
+    """Leave room button callback: give up the seat so the room does not wait for this player"""
+    get_room_registry().leave(room, st.session_state.room_token)
+    forget_room()
+
+def kick_room_player(room, name):
+    """Host's remove player button callback"""
+    get_room_registry().kick(room, st.session_state.room_token, name)
+
+def grade_room_now(room):
+    """Host's grade now button callback"""
+    get_room_registry().grade_now(room, st.session_state.room_token)
+
+def start_room_round(room, catalog, grader):
+    """Host's start round button callback"""
+    grader = in_context(grader, game=f"room-{room.code}", priority=PRIORITY_INTERACTIVE)
+    scenario = deal_scenario(catalog)
+    if scenario is not None:
+        get_room_registry().start_round(room, st.session_state.room_token, scenario, grader)
+
+def submit_room_answer(room, response_key):
+    """Submit button callback for this session's player"""
+    response = st.session_state.get(response_key, "").strip()
+    if response:
+        get_room_registry().submit(room, st.session_state.room_token, response)
+    else:
+        st.session_state.submit_error = True
+
+def render_room_mode(catalog, grader):
+    """Multi-device play: create or join a room, then follow it live"""
+    registry = get_room_registry()
+    if "room_code" not in st.session_state and st.query_params.get("room") and st.query_params.get("seat"):
+        st.session_state.room_code = st.query_params["room"]
+        st.session_state.room_token = st.query_params["seat"]
+    
+    room = registry.get(st.session_state.room_code) if st.session_state.get("room_code") else None
+    if room is not None and registry.player(room, st.session_state.room_token) is not None:
+        render_room(room, catalog, grader)
+        return
+    if st.session_state.get("room_code"):
+        st.warning(f"⚠️ You are no longer in room {st.session_state.room_code}")
+        forget_room()
+    
+    st.subheader("🚪 Create or Join a Room")
+    name = st.text_input("Your name:", key="room_name_input").strip()
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("➕ Create Room", type="primary", disabled=not name):
+            room, token = registry.create_room(name)
+            enter_room(room, token)
+            st.rerun()
+    with col2:
+        code = st.text_input("Room code:", max_chars=CODE_LENGTH)
+        if st.button("🔑 Join Room", disabled=not (name and code)):
+            room = registry.get(code)
+            token, error = (None, "No room with that code") if room is None else registry.join(room, name)
+            if error:
+                st.error(f"⚠️ {error}")
+            else:
+                enter_room(room, token)
+                st.rerun()
+
+@st.fragment(run_every=ROOM_REFRESH_SECONDS)
+def render_room(room, catalog, grader):
+    """Live view of a room, refreshed every few seconds so other players' moves show up"""
+    me = get_room_registry().player(room, st.session_state.get("room_token"))
+    if st.session_state.get("room_code") != room.code or me is None:
+        # Left or removed from the room; the join form lives outside this fragment
+        st.rerun()
+    
+    snapshot = room.snapshot()
+    status = snapshot["status"]
+    
+    st.subheader(f"🚪 Room {snapshot['code']}")
+    st.caption("Share this code so other players can join from their own device.")
+    st.write("**Players:** " + ", ".join(
+        f"✅ {name}" if name in snapshot["submitted"] else name for name in snapshot["player_names"]
+    ))
+    
+    if snapshot["winner"]:
+        st.header(f"🏆 GAME OVER! {snapshot['winner']} WINS!")
+    elif status in ("lobby", "graded"):
+        if me == snapshot["host_name"]:
+            st.button(
+                "🎲 Start Round",
+                type="primary",
+                disabled=len(snapshot["player_names"]) < 2,
+                on_click=start_room_round,
+                args=(room, catalog, grader)
+            )
+        else:
+            st.info("⏳ Waiting for the host to start the next round...")
+    
+    if status in ("answering", "grading"):
+        scenario = snapshot["scenario"]
+        st.subheader(f"📋 Round {snapshot['round_number']}: {scenario['title']}")
+        st.info(scenario['scenario'])
+        total_players = len(snapshot["player_names"])
+        st.progress(len(snapshot["submitted"]) / total_players,
+                    text=f"Progress: {len(snapshot['submitted'])}/{total_players} players submitted")
+    
+    if status == "answering" and me not in snapshot["submitted"]:
+        response_key = f"room_response_{snapshot['round_number']}"
+        st.text_area(f"How would you handle this situation, {me}?", height=150,
+                     placeholder="Enter your response here...", key=response_key)
+        st.button(f"Submit Response for {me}", type="primary", on_click=submit_room_answer,
+                  args=(room, response_key))
+        if st.session_state.pop("submit_error", False):
+            st.error("⚠️ Please enter a response before submitting!")
+    elif status == "answering":
+        waiting_for = [name for name in snapshot["player_names"] if name not in snapshot["submitted"]]
+        st.info(f"⏳ Waiting for {', '.join(waiting_for)}...")
+    if status == "answering" and me == snapshot["host_name"] and snapshot["submitted"]:
+        st.button("⏩ Grade the Answers In Now", on_click=grade_room_now, args=(room,),
+                  help="Grade the answers submitted so far without waiting for the other players")
+    elif status == "grading":
+        st.info("🧠 AI instructor is analyzing responses and calculating scores...")
+    elif status == "graded":
+        if snapshot["error"]:
+            st.error(f"❌ Analysis failed: {snapshot['error']}")
+        else:
+            st.subheader(f"🎯 AI Instructor Analysis - Round {snapshot['round_number']}")
+            st.markdown(snapshot["analysis"])
+    
+    st.subheader("🏆 Scores")
+    sorted_scores = sorted(snapshot["player_scores"].items(), key=lambda x: x[1], reverse=True)
+    for i, (name, score) in enumerate(sorted_scores):
+        round_score = snapshot["round_scores"].get(name)
+        gained = f" (+{round_score})" if round_score else ""
+        st.write(f"{'👑' if i == 0 else '🎯'} **{name}**: {score} points{gained}")
+    
+    others = [name for name in snapshot["player_names"] if name != me]
+    if me == snapshot["host_name"] and others:
+        with st.expander("👥 Manage players"):
+            for name in others:
+                st.button(f"Remove {name}", key=f"kick_{name}", on_click=kick_room_player, args=(room, name))
+    
+    st.button("🚪 Leave Room", on_click=leave_room, args=(room,),
+              help="The host role passes to the next player if you are the host")
+
+def render_player_setup():
+    """Sidebar player count and names for a shared-screen game"""
+    game = st.session_state.game
+    # Number of players (only allow change when no game in progress)
+    if game.round is None:
+        new_num_players = st.slider("Number of players:", 2, 6, st.session_state.num_players)
+        if new_num_players != st.session_state.num_players:
+            st.session_state.num_players = new_num_players
+            game.set_players([])
+    else:
+        st.write(f"**Players in game:** {st.session_state.num_players}")
+    
+    # Player name setup
+    if not game.player_names or len(game.player_names) != st.session_state.num_players:
+        st.write("**Enter player names:**")
+        names = []
+        for i in range(st.session_state.num_players):
+            name = st.text_input(f"Player {i+1} name:", key=f"name_{i}", value=f"Player {i+1}")
+            names.append(name)
+        
+        if st.button("✅ Confirm Players"):
+            try:
+                game.set_players(names)
+            except GameStateError as e:
+                st.error(f"⚠️ {e}")
+                return
+            persist_game()
+            st.rerun()
+
+def render_round_controls(catalog):
+    """Sidebar buttons for starting rounds, resetting and picking a scenario"""
+    game = st.session_state.game
+    # Game controls
+    if st.button("🎲 Start New Round", type="primary", disabled=game.game_ended or not game.player_names):
+        start_round(deal_scenario(catalog))
+        st.rerun()
+    
+    if st.button("🔄 Reset Game"):
+        reset_game()
+        st.rerun()
+    
+    topics = sorted(set(SCENARIO_TOPICS) | set(catalog.tags()) - set(DIFFICULTIES) - {"generated"})
+    topic = st.selectbox(
+        "Topic for new rounds:",
+        [None] + topics,
+        format_func=lambda topic: "Any topic" if topic is None else topic.capitalize(),
+        key="scenario_topic"
+    )
+    deck_caption = f"🃏 {st.session_state.deck.remaining(catalog, topic)} unplayed scenarios"
+    producer = st.session_state.get("scenario_producer")
+    if producer is not None:
+        stats = producer.stats()
+        deck_caption += f" · 🏭 {sum(stats['ready'].values())} fresh ones ready"
+        if stats["last_error"] and not any(stats["ready"].values()):
+            deck_caption += f" (last attempt: {stats['last_error']})"
+    st.caption(deck_caption)
+    
+    # Show game status
+    if game.game_ended:
+        st.error(f"🏆 GAME OVER! {game.winner} WINS!")
+        st.write("Click 'Reset Game' to start a new game")
+    
+    # Scenario selection dropdown
+    if game.round is None and not game.game_ended:
+        st.subheader("📋 Choose Scenario")
+        for error in catalog.errors:
+            st.warning(f"⚠️ Skipped scenario data - {error}")
+        
+        query = st.text_input("Search scenarios:", placeholder="e.g. client, deadline")
+        tag = None
+        if catalog.tags():
+            tag = st.selectbox("Tag:", ["All tags"] + catalog.tags())
+            tag = None if tag == "All tags" else tag
+        
+        _, total_matches = catalog.search(query, tag, limit=0)
+        page = 1
+        if total_matches > SCENARIO_PAGE_SIZE:
+            pages = -(-total_matches // SCENARIO_PAGE_SIZE)
+            page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1)
+        matches, _ = catalog.search(query, tag, offset=(page - 1) * SCENARIO_PAGE_SIZE, limit=SCENARIO_PAGE_SIZE)
+        
+        scenario_ids = [None] + [s["id"] for s in matches]
+        selected_id = st.selectbox(
+            f"Available scenarios ({total_matches}):",
+            scenario_ids,
+            format_func=lambda scenario_id: "Select a scenario..." if scenario_id is None else catalog.get(scenario_id)["title"]
+        )
+        
+        if selected_id is not None:
+            selected_scenario = catalog.get(selected_id)
+            if st.button(f"Use: {selected_scenario['title']}", disabled=not game.player_names):
+                start_round(selected_scenario)
+                st.rerun()
+
+def render_perf_panel():
+    """Admin-only view of the process metrics, with Prometheus and JSON downloads"""
+    snapshot = metrics.snapshot()
+    series = {name: metric["series"] for name, metric in snapshot["metrics"].items()}
+    
+    def value(name, **labels):
+        return sum(s["value"] for s in series.get(name, []) if labels.items() <= s["labels"].items())
+    
+    with st.expander("📈 Performance"):
+        col1, col2 = st.columns(2)
+        col1.metric("Active sessions", int(value("active_sessions")))
+        col2.metric("Open rooms", int(value("open_rooms")))
+        col1.metric("AI queue", int(value("llm_scheduler_requests", state="queued")))
+        col2.metric("AI running", int(value("llm_scheduler_requests", state="running")))
+        
+        reruns = RERUN_SECONDS.summary()
+        if reruns:
+            st.caption(f"🔁 Script runs: p50 {reruns['p50'] * 1000:.0f}ms · p95 {reruns['p95'] * 1000:.0f}ms "
+                       f"({reruns['count']} runs)")
+        parses = metrics.get("score_parse_seconds").summary()
+        if parses:
+            st.caption(f"🔍 Score parsing: p50 {parses['p50'] * 1e6:.0f}µs · p95 {parses['p95'] * 1e6:.0f}µs "
+                       f"({parses['count']} analyses)")
+        
+        rows = []
+        for model in sorted({s["labels"]["model"] for s in series.get("llm_requests_total", [])}):
+            requests = value("llm_requests_total", model=model)
+            latency = metrics.get("llm_request_seconds").summary(model=model) or {}
+            first_text = metrics.get("llm_stream_first_text_seconds").summary(model=model) or {}
+            rows.append({
+                "Model": model,
+                "Requests": int(requests),
+                "Error rate": f"{1 - value('llm_requests_total', model=model, outcome='ok') / requests:.1%}",
+                "p50 (s)": round(latency.get("p50", 0), 2),
+                "p95 (s)": round(latency.get("p95", 0), 2),
+                "First text p50 (s)": round(first_text.get("p50", 0), 2),
+                "First text p95 (s)": round(first_text.get("p95", 0), 2),
+                "Prompt tokens": int(value("llm_tokens_total", model=model, kind="prompt")),
+                "Completion tokens": int(value("llm_tokens_total", model=model, kind="completion"))
+            })
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        for analysis in series.get("analysis_seconds", []):
+            labels = analysis["labels"]
+            st.caption(f"🧠 {labels['engine']} analysis ({labels['model']}): p50 {analysis['p50']:.1f}s · "
+                       f"p95 {analysis['p95']:.1f}s ({analysis['count']} rounds)")
+        
+        col1, col2 = st.columns(2)
+        col1.download_button("Prometheus", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+        col2.download_button("JSON", json.dumps(snapshot, indent=2), file_name="metrics.json",
+                             mime="application/json")
+        if SNAPSHOT_PATH:
+            st.caption(f"Snapshots are appended to {SNAPSHOT_PATH}")
 
 def main():
     st.set_page_config(page_title="Office Scenario Training Game", page_icon="🏢", layout="wide")
@@ -224,6 +940,7 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    catalog = get_scenario_catalog()
     
     # Sidebar for controls
     with st.sidebar:
@@ -232,53 +949,23 @@ def main():
         # Game setup
         st.subheader("🎮 Game Setup")
         
-        # Number of players (only allow change when no game in progress)
-        if not st.session_state.current_scenario:
-            new_num_players = st.slider("Number of players:", 2, 6, st.session_state.num_players)
-            if new_num_players != st.session_state.num_players:
-                st.session_state.num_players = new_num_players
-                st.session_state.player_names = []
-                st.session_state.player_scores = {}
-        else:
-            st.write(f"**Players in game:** {st.session_state.num_players}")
-        
-        # Player name setup
-        if not st.session_state.player_names or len(st.session_state.player_names) != st.session_state.num_players:
-            st.write("**Enter player names:**")
-            names = []
-            for i in range(st.session_state.num_players):
-                name = st.text_input(f"Player {i+1} name:", key=f"name_{i}", value=f"Player {i+1}")
-                names.append(name)
-            
-            if st.button("✅ Confirm Players"):
-                st.session_state.player_names = names
-                # Initialize scores for new players
-                for name in names:
-                    if name not in st.session_state.player_scores:
-                        st.session_state.player_scores[name] = 0
-                st.rerun()
+        play_mode = st.radio(
+            "Play mode",
+            [SHARED_SCREEN, ROOM_MODE],
+            help="In room mode every player joins from their own device with a room code and answers at the same time"
+        )
         
-        # Show current scores
-        if st.session_state.player_names and st.session_state.player_scores:
-            st.subheader("🏆 Current Scores")
-            sorted_scores = sorted(st.session_state.player_scores.items(), key=lambda x: x[1], reverse=True)
-            
-            # Check if anyone is close to winning
-            max_score = sorted_scores[0][1] if sorted_scores else 0
-            if max_score >= 8 and not st.session_state.game_ended:
-                st.warning(f"⚡ {sorted_scores[0][0]} is close to winning! (Need 10 points)")
+        if play_mode == SHARED_SCREEN:
+            render_player_setup()
             
-            for i, (name, score) in enumerate(sorted_scores):
-                if i == 0:
-                    if score >= 10:
-                        st.write(f"🏆 **{name}**: {score} points (WINNER!)")
-                    else:
-                        st.write(f"👑 **{name}**: {score} points")
-                else:
-                    st.write(f"🎯 **{name}**: {score} points")
-            
-            st.write(f"**Round:** {st.session_state.round_number}")
-            st.caption("🎯 First to 10 points wins!")
+            # Show current scores
+            render_scoreboard()
+        
+        game = st.session_state.game
+        if play_mode == SHARED_SCREEN:
+            render_leaderboard(game.player_names, game.round.scenario if game.round else None)
+        else:
+            render_leaderboard()
         
         st.divider()
         
@@ -296,9 +983,24 @@ def main():
         
         model_choice = st.selectbox(
             "Model",
-            ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo-preview"],
+            MODELS,
             help="Select the OpenAI model for analysis"
         )
+        fallback_choices = MODELS + [NO_FALLBACK]
+        fallback_model = st.selectbox(
+            "Fallback model",
+            fallback_choices,
+            index=fallback_choices.index(FALLBACK_MODEL) if FALLBACK_MODEL in fallback_choices else 0,
+            help="Also asked when the chosen model is slower than usual or fails; the first answer wins"
+        )
+        latency_budget = st.slider(
+            "Latency budget (seconds)",
+            min_value=10,
+            max_value=180,
+            value=int(LATENCY_BUDGET),
+            help="Give up on an analysis that takes longer than this; a streamed one must start writing by then"
+        )
+        hedging = (None if fallback_model == NO_FALLBACK else fallback_model, latency_budget)
         
         # Show API status
         if api_key:
@@ -306,52 +1008,115 @@ def main():
         else:
             st.warning("⚠️ No API Key - AI analysis disabled")
         
-        st.divider()
-        
-        # Game controls
-        if st.button("🎲 Start New Round", type="primary", disabled=st.session_state.game_ended):
-            reset_round()
-            st.session_state.current_scenario = random.choice(scenarios)
+        bypass_cache = st.checkbox(
+            "Bypass analysis cache",
+            value=False,
+            help="Always request a fresh analysis, even for a round that was already evaluated"
+        )
+        analysis_engine = st.radio(
+            "Grading engine",
+            list(ANALYSIS_ENGINES),
+            help="Per-player grades every answer concurrently, so the wait does not grow with the number of players"
+        )
+        stream_analysis = st.checkbox(
+            "Stream analysis",
+            value=True,
+            disabled=analysis_engine != "Combined",
+            help="Show the AI instructor's feedback as it is written instead of waiting for the full analysis"
+        )
+        speculative_grading = st.checkbox(
+            "Speculative grading",
+            value=False,
+            disabled=ANALYSIS_ENGINES[analysis_engine] is not get_parallel_llm_analysis,
+            help="Per-player engine only: grade each answer in the background as soon as it is submitted"
+        ) and ANALYSIS_ENGINES[analysis_engine] is get_parallel_llm_analysis and bool(api_key)
+        offline_fallback = st.checkbox(
+            "Offline fallback",
+            value=True,
+            help="Score rounds instantly on this machine when there is no API key or the AI analysis fails"
+        )
+        score_offline = ANALYSIS_ENGINES[analysis_engine] is get_local_analysis or (offline_fallback and not api_key)
+        fresh_scenarios = st.checkbox(
+            "Generate fresh scenarios",
+            value=False,
+            disabled=not api_key,
+            help="Keep a few new AI-written scenarios ready in the background, so rounds never run out of "
+                 "scenarios the group has not seen. Uses your API key: about two calls per topic up front, "
+                 "then one per scenario played"
+        ) and bool(api_key)
+        update_scenario_producer(api_key, fresh_scenarios)
+        reuse_grades = st.checkbox(
+            "Reuse grades of near-duplicate answers",
+            value=True,
+            disabled=bypass_cache,
+            help="An answer nearly identical to one graded before for the same scenario keeps that grade, "
+                 "so only new answers are sent to the AI"
+        )
+        reuse_similarity = st.slider(
+            "Near-duplicate threshold",
+            min_value=0.5,
+            max_value=1.0,
+            value=DEFAULT_THRESHOLD,
+            step=0.05,
+            disabled=not reuse_grades or bypass_cache,
+            help="Estimated word-overlap similarity (Jaccard) above which an earlier grade is reused"
+        )
+        reuse_threshold = reuse_similarity if reuse_grades else None
+        cache_stats = get_analysis_cache().stats()
+        st.caption(
+            f"💾 Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['disk_entries']} stored)"
+        )
+        if is_admin() and st.button("🗑️ Clear analysis cache",
+                                    help="Drop every stored analysis for all sessions, e.g. after changing the prompts"):
+            get_analysis_cache().clear()
             st.rerun()
+        index_stats = get_answer_index().stats()
+        st.caption(
+            f"♻️ Reused grades: {index_stats['hits']} of {index_stats['lookups']} answers "
+            f"({index_stats['hit_rate']:.0%} hit rate, {index_stats['answers']} indexed)"
+        )
+        for model, stats in latencies.snapshot().items():
+            st.caption(
+                f"⏱️ {model}: p50 {stats['p50']:.1f}s · p95 {stats['p95']:.1f}s · "
+                f"p99 {stats['p99']:.1f}s ({stats['count']} calls)"
+            )
+        for model, stats in first_text_latencies.snapshot().items():
+            st.caption(
+                f"✍️ {model} first text: p50 {stats['p50']:.1f}s · p95 {stats['p95']:.1f}s · "
+                f"p99 {stats['p99']:.1f}s ({stats['count']} streams)"
+            )
         
-        if st.button("🔄 Reset Game"):
-            reset_game()
-            st.rerun()
+        if is_admin():
+            render_perf_panel()
         
-        # Show game status
-        if st.session_state.game_ended:
-            st.error(f"🏆 GAME OVER! {st.session_state.winner} WINS!")
-            st.write("Click 'Reset Game' to start a new game")
+        st.divider()
         
-        # Scenario selection dropdown
-        if not st.session_state.current_scenario and not st.session_state.game_ended:
-            st.subheader("📋 Choose Scenario")
-            scenario_titles = ["Select a scenario..."] + [s["title"] for s in scenarios]
-            selected_title = st.selectbox("Available scenarios:", scenario_titles)
-            
-            if selected_title != "Select a scenario...":
-                selected_scenario = next(s for s in scenarios if s["title"] == selected_title)
-                if st.button(f"Use: {selected_title}"):
-                    reset_round()
-                    st.session_state.current_scenario = selected_scenario
-                    st.rerun()
+        if play_mode == SHARED_SCREEN:
+            render_round_controls(catalog)
+    
+    if play_mode == ROOM_MODE:
+        render_room_mode(catalog, make_room_grader(api_key, model_choice, analysis_engine, not bypass_cache,
+                                                          hedging, offline_fallback, reuse_threshold))
+        return
     
     # Main content area
-    if not st.session_state.player_names:
+    game = st.session_state.game
+    if not game.player_names:
         st.info("👈 Please set up player names in the sidebar to start!")
         return
     
     # Check if game has ended - show victory screen
-    if st.session_state.game_ended:
+    if game.game_ended:
         st.balloons()  # Celebration animation
         
         st.header("🏆 GAME OVER! 🏆")
-        st.subheader(f"🎉 Congratulations {st.session_state.winner}! 🎉")
-        st.write(f"**{st.session_state.winner}** has reached 10 points and won the game!")
+        st.subheader(f"🎉 Congratulations {game.winner}! 🎉")
+        st.write(f"**{game.winner}** has reached {game.winning_score} points and won the game!")
         
         # Show final standings
         st.subheader("🏅 Final Standings")
-        sorted_scores = sorted(st.session_state.player_scores.items(), key=lambda x: x[1], reverse=True)
+        sorted_scores = game.standings()
         
         cols = st.columns(len(sorted_scores))
         for i, (name, total_score) in enumerate(sorted_scores):
@@ -369,221 +1134,134 @@ def main():
         st.subheader("📊 Game Statistics")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Rounds", st.session_state.round_number - 1)
+            st.metric("Total Rounds", game.round_number)
         with col2:
-            st.metric("Winning Score", st.session_state.player_scores[st.session_state.winner])
+            st.metric("Winning Score", game.scores[game.winner])
         with col3:
-            avg_score = sum(st.session_state.player_scores.values()) / len(st.session_state.player_scores)
+            avg_score = sum(game.scores.values()) / len(game.scores)
             st.metric("Average Score", f"{avg_score:.1f}")
         
+        st.subheader("💾 Download Options")
+        history = game.history
+        render_downloads(history[-1] if history else None)
+        
         # New game option
         st.info("👈 Click 'Reset Game' in the sidebar to start a new game!")
         return
     
-    if st.session_state.current_scenario is None:
+    if game.round is None:
         st.info("👈 Click 'Start New Round' or choose a scenario from the sidebar!")
         
         # Show preview of available scenarios
         st.subheader("📚 Available Scenarios Preview:")
-        for i, scenario in enumerate(scenarios, 1):
+        preview, total = catalog.search(limit=SCENARIO_PREVIEW_LIMIT)
+        for i, scenario in enumerate(preview, 1):
             with st.expander(f"{i}. {scenario['title']}"):
                 st.write(scenario['scenario'])
+        if total > len(preview):
+            st.caption(f"Showing {len(preview)} of {total} scenarios - search in the sidebar to find more.")
         return
     
     # Display current scenario
-    scenario = st.session_state.current_scenario
+    current = game.round
+    scenario = current.scenario
     
-    st.subheader(f"📋 Round {st.session_state.round_number}: {scenario['title']}")
+    st.subheader(f"📋 Round {current.number}: {scenario['title']}")
     st.info(scenario['scenario'])
     
-    # Show progress
-    total_players = len(st.session_state.player_names)
-    submitted_count = len(st.session_state.submitted_answers)
-    
-    # Safety check: if somehow we have more submissions than players, trim the list
-    if submitted_count > total_players:
-        st.session_state.submitted_answers = st.session_state.submitted_answers[:total_players]
-        submitted_count = len(st.session_state.submitted_answers)
-    
-    # Ensure progress is between 0 and 1
-    progress = min(submitted_count / total_players, 1.0) if total_players > 0 else 0.0
-    st.progress(progress, text=f"Progress: {submitted_count}/{total_players} players submitted")
-    
-    # Auto-complete if we somehow have all responses but flag not set
-    if submitted_count >= total_players and not st.session_state.all_submitted:
-        st.session_state.all_submitted = True
-    
     # Sequential player input
-    if not st.session_state.all_submitted:
-        current_player_idx = st.session_state.current_player - 1
-        
-        # Safety check: ensure we don't go out of bounds
-        if current_player_idx >= len(st.session_state.player_names):
-            st.session_state.all_submitted = True
-            st.rerun()
-            return
-            
-        current_player_name = st.session_state.player_names[current_player_idx]
-        
-        st.subheader(f"🎯 {current_player_name}'s Turn")
-        st.write(f"**Player {st.session_state.current_player} of {total_players}**")
-        
-        # Show who has already submitted
-        if st.session_state.submitted_answers:
-            st.write("**Already submitted:**")
-            for i, name in enumerate(st.session_state.player_names[:len(st.session_state.submitted_answers)]):
-                st.write(f"✅ {name}")
-        
-        # Current player input
-        player_response = st.text_area(
-            f"How would you handle this situation, {current_player_name}?",
-            height=150,
-            placeholder="Enter your response here...",
-            key=f"current_response_{st.session_state.round_number}_{st.session_state.current_player}"
-        )
-        
-        if st.button(f"Submit Response for {current_player_name}", type="primary"):
-            if player_response.strip():
-                # Safety check: don't add more responses than players
-                if len(st.session_state.submitted_answers) < total_players:
-                    st.session_state.submitted_answers.append(player_response.strip())
-                
-                if st.session_state.current_player < total_players:
-                    st.session_state.current_player += 1
-                    st.success(f"✅ {current_player_name}'s response submitted!")
-                    st.rerun()
-                else:
-                    st.session_state.all_submitted = True
-                    st.success("🎉 All players have submitted their responses!")
-                    st.rerun()
-            else:
-                st.error("⚠️ Please enter a response before submitting!")
+    if not current.complete:
+        render_answer_entry((api_key, model_choice) if speculative_grading else None)
     
     # All players submitted - show analysis option
-    elif st.session_state.all_submitted and not st.session_state.show_analysis:
+    elif not current.graded:
+        render_progress()
         st.subheader("🎉 All Responses Submitted!")
         
         # Show all submitted responses
         st.subheader("📋 All Responses")
-        for i, (name, answer) in enumerate(zip(st.session_state.player_names, st.session_state.submitted_answers)):
+        for name, answer in zip(current.player_names, current.answers):
             with st.expander(f"{name}'s Response"):
                 st.write(answer)
         
         # Get AI analysis
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("🤖 Get AI Analysis & Scores", type="primary", disabled=not api_key):
-                with st.spinner("🧠 AI instructor is analyzing responses and calculating scores..."):
-                    analysis, error = get_llm_analysis(
-                        scenario['scenario'], 
-                        st.session_state.submitted_answers, 
-                        st.session_state.player_names,
-                        api_key, 
-                        model_choice
-                    )
-                    
-                    if analysis:
-                        st.session_state.llm_analysis = analysis
-                        st.session_state.show_analysis = True
-                        
-                        # Extract and update scores
-                        round_scores = extract_scores_from_analysis(analysis, st.session_state.player_names)
-                        for name, score in round_scores.items():
-                            st.session_state.player_scores[name] = st.session_state.player_scores.get(name, 0) + score
-                        
-                        # Check for winner after updating scores
-                        game_ended = check_for_winner()
-                        
-                        if game_ended:
-                            st.success(f"✅ Analysis complete! 🏆 GAME OVER - {st.session_state.winner} WINS!")
-                        else:
-                            st.success("✅ Analysis complete and scores updated!")
-                        st.rerun()
-                    else:
-                        st.error(f"❌ Analysis failed: {error}")
+            if score_offline:
+                run_analysis = st.button("⚡ Get Instant Offline Scores", type="primary")
+            else:
+                run_analysis = st.button("🤖 Get AI Analysis & Scores", type="primary", disabled=not api_key)
         
         with col2:
-            if st.button("⏭️ Skip to Next Round", disabled=st.session_state.game_ended):
-                st.session_state.round_number += 1
-                reset_round()
+            if st.button("⏭️ Skip to Next Round", disabled=game.game_ended):
+                skip_round()
                 st.rerun()
-    
-    # Display AI analysis and results
-    elif st.session_state.show_analysis and st.session_state.llm_analysis:
-        st.subheader("🎯 AI Instructor Analysis")
-        st.markdown(st.session_state.llm_analysis)
         
-        # Show updated scores
-        st.subheader("🏆 Updated Scores")
-        sorted_scores = sorted(st.session_state.player_scores.items(), key=lambda x: x[1], reverse=True)
-        
-        cols = st.columns(len(sorted_scores))
-        for i, (name, total_score) in enumerate(sorted_scores):
-            with cols[i]:
-                if i == 0:
-                    st.metric(f"👑 {name}", f"{total_score} pts", delta="Leader!")
+        if run_analysis:
+            if score_offline:
+                with call_log() as calls:
+                    analysis, error = get_local_analysis(
+                        scenario['scenario'],
+                        current.answers,
+                        current.player_names
+                    )
+            elif stream_analysis and analysis_engine == "Combined":
+                with request_context(game=st.session_state.game_id, priority=PRIORITY_INTERACTIVE), \
+                        call_log() as calls:
+                    analysis, error = render_streaming_analysis(
+                        scenario['scenario'],
+                        current.answers,
+                        current.player_names,
+                        api_key,
+                        model_choice,
+                        use_cache=not bypass_cache,
+                        reuse_threshold=reuse_threshold,
+                        hedging=hedging
+                    )
+            else:
+                with st.spinner("🧠 AI instructor is analyzing responses and calculating scores..."), \
+                        request_context(game=st.session_state.game_id, priority=PRIORITY_INTERACTIVE), \
+                        call_log() as calls:
+                    analysis, error = run_with_queue_status(
+                        get_cached_llm_analysis,
+                        scenario['scenario'], 
+                        current.answers, 
+                        current.player_names,
+                        api_key, 
+                        model_choice,
+                        use_cache=not bypass_cache,
+                        engine=analysis_engine,
+                        speculation=st.session_state.get("speculation"),
+                        hedging=hedging,
+                        reuse_threshold=reuse_threshold
+                    )
+            if not analysis and offline_fallback and not score_offline:
+                st.toast(f"AI analysis failed ({error}) - scored offline instead", icon="⚡")
+                with call_log() as calls:
+                    analysis, error = get_local_analysis(
+                        scenario['scenario'],
+                        current.answers,
+                        current.player_names
+                    )
+            
+            if analysis:
+                game.score_round(analysis, served_by(calls, model_choice), summarize_usage(calls))
+                record_leaderboard_round()
+                
+                if game.game_ended:
+                    st.success(f"✅ Analysis complete! 🏆 GAME OVER - {game.winner} WINS!")
                 else:
-                    leader_score = sorted_scores[0][1]
-                    diff = total_score - leader_score
-                    st.metric(f"🎯 {name}", f"{total_score} pts", delta=f"{diff:+d}")
-        
-        # Next round button
-        if not st.session_state.game_ended:
-            if st.button("🎲 Start Next Round", type="primary"):
-                st.session_state.round_number += 1
-                reset_round()
-                st.session_state.current_scenario = random.choice(scenarios)
+                    st.success("✅ Analysis complete and scores updated!")
+                persist_game()
                 st.rerun()
-        else:
-            st.info(f"🏆 Game Over! {st.session_state.winner} has won with {st.session_state.player_scores[st.session_state.winner]} points!")
-            st.write("👈 Click 'Reset Game' in the sidebar to start a new game.")
-        
-        # Download options
-        st.subheader("💾 Download Options")
-        
-        # Create comprehensive report
-        report = f"""# Office Scenario Training Report - Round {st.session_state.round_number}
-        
-## Scenario: {scenario['title']}
-{scenario['scenario']}
-
-## Player Responses:
-"""
-        for name, answer in zip(st.session_state.player_names, st.session_state.submitted_answers):
-            report += f"\n**{name}:** {answer}\n"
-        
-        report += f"\n## AI Analysis:\n{st.session_state.llm_analysis}"
-        
-        report += f"\n## Current Scores:\n"
-        for name, score in sorted_scores:
-            report += f"- {name}: {score} points\n"
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.download_button(
-                label="📄 Download Round Report",
-                data=report,
-                file_name=f"round_{st.session_state.round_number}_report.md",
-                mime="text/markdown"
-            )
-        
-        with col2:
-            # JSON format
-            json_output = {
-                "round": st.session_state.round_number,
-                "scenario": scenario,
-                "responses": dict(zip(st.session_state.player_names, st.session_state.submitted_answers)),
-                "ai_analysis": st.session_state.llm_analysis,
-                "scores": st.session_state.player_scores,
-                "model_used": model_choice
-            }
-            
-            st.download_button(
-                label="📊 Download JSON",
-                data=json.dumps(json_output, indent=2),
-                file_name=f"round_{st.session_state.round_number}_data.json",
-                mime="application/json"
-            )
+            else:
+                st.error(f"❌ Analysis failed: {error}")
+    
+    # Display AI analysis and results
+    else:
+        render_progress()
+        render_analysis_results(catalog)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with RERUN_SECONDS.time():
+        main()
\ No newline at end of file
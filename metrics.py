@@ -0,0 +1,325 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+from config import env
+
+# Optional periodic JSON snapshots (one line per interval, appended to this file) and Prometheus endpoint
+SNAPSHOT_PATH = env("METRICS_SNAPSHOT_PATH", "")
+SNAPSHOT_SECONDS = float(env("METRICS_SNAPSHOT_SECONDS", "60"))
+METRICS_PORT = int(env("METRICS_PORT", "0"))
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+RERUN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01)
+
+# Sessions seen within this many seconds count as active
+SESSION_IDLE_SECONDS = 300
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(key, value) for key, value in self._values.items()]
+
+    def to_prometheus(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.samples()]
+
+    def snapshot(self):
+        return [{"labels": dict(key), "value": value} for key, value in self.samples()]
+
+
+class Gauge:
+    """Value read when exported: read() returns a number or {labels tuple: number}"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(_label_key(dict(labels)), v) for labels, v in value.items()]
+        return [((), value)]
+
+    def to_prometheus(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.samples()]
+
+    def snapshot(self):
+        return [{"labels": dict(key), "value": value} for key, value in self.samples()]
+
+
+class Histogram:
+    """Bucketed distribution per label set, with percentiles estimated from the buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the seconds spent in the block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        """(labels key, cumulative bucket counts including +Inf, count, sum) per series"""
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        result = []
+        for key, values in series:
+            cumulative, total = [], 0
+            for count in values[:-1]:
+                total += count
+                cumulative.append(total)
+            result.append((key, cumulative, total, values[-1]))
+        return result
+
+    def _percentile(self, cumulative, count, fraction):
+        """Linear interpolation inside the bucket holding the rank, as Prometheus' histogram_quantile"""
+        rank = fraction * count
+        index = bisect.bisect_left(cumulative, rank)
+        if index >= len(self.buckets):
+            return self.buckets[-1]
+        lower = self.buckets[index - 1] if index else 0.0
+        below = cumulative[index - 1] if index else 0
+        in_bucket = cumulative[index] - below
+        return lower + (self.buckets[index] - lower) * ((rank - below) / in_bucket if in_bucket else 0)
+
+    def summary(self, **labels):
+        """{"count", "sum", "p50", "p95", "p99"} for one label set, or None before the first observation"""
+        key = _label_key(labels)
+        for series_key, cumulative, count, total in self.samples():
+            if series_key == key and count:
+                return self._summarize(cumulative, count, total)
+        return None
+
+    def _summarize(self, cumulative, count, total):
+        return {
+            "count": count,
+            "sum": total,
+            "p50": self._percentile(cumulative, count, 0.50),
+            "p95": self._percentile(cumulative, count, 0.95),
+            "p99": self._percentile(cumulative, count, 0.99)
+        }
+
+    def to_prometheus(self):
+        lines = []
+        for key, cumulative, count, total in self.samples():
+            bounds = [*self.buckets, float("inf")]
+            lines.extend(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {n}"
+                         for bound, n in zip(bounds, cumulative))
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def snapshot(self):
+        return [dict(self._summarize(cumulative, count, total), labels=dict(key),
+                     buckets={_format_value(bound): n for bound, n in zip([*self.buckets, float("inf")], cumulative)})
+                for key, cumulative, count, total in self.samples() if count]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms, exported as Prometheus text or JSON
+
+    Declaring a metric that already exists returns the existing one, so
+    modules can declare what they record at import time.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _declare(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif cls is Gauge:
+                metric.read = args[-1]  # The latest reader wins, e.g. after a Streamlit reload
+            return metric
+
+    def counter(self, name, help):
+        return self._declare(Counter, name, help)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._declare(Histogram, name, help, buckets)
+
+    def gauge(self, name, help, read):
+        return self._declare(Gauge, name, help, read)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def to_prometheus(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.to_prometheus())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Every metric as a JSON-serializable dict, histograms with estimated percentiles"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return {
+            "time": time.time(),
+            "uptime_seconds": time.time() - self.started_at,
+            "metrics": {metric.name: {"type": metric.kind, "series": metric.snapshot()} for metric in metrics}
+        }
+
+
+class ActiveSessions:
+    """Sessions that reran the app within the last idle_seconds"""
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._last_seen[session_id] = now
+            if len(self._last_seen) > 64:
+                cutoff = now - self.idle_seconds
+                self._last_seen = {sid: seen for sid, seen in self._last_seen.items() if seen >= cutoff}
+
+    def count(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            return sum(1 for seen in self._last_seen.values() if seen >= cutoff)
+
+
+class SnapshotWriter:
+    """Appends a JSON snapshot of the registry to path every interval seconds, from a daemon thread"""
+
+    def __init__(self, registry, path=SNAPSHOT_PATH, interval=SNAPSHOT_SECONDS):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="metrics-snapshots")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(self.registry.snapshot(), ensure_ascii=False) + "\n"
+        # One write call per line, so a crash never leaves half a snapshot behind another
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass  # A full disk or missing permissions must not take the app down
+
+
+def serve_prometheus(registry, port=METRICS_PORT, host="0.0.0.0"):
+    """Serve registry.to_prometheus() at http://host:port/metrics from a daemon thread; returns the server"""
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+# Shared by every session and module in the process
+metrics = MetricsRegistry()
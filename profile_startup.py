@@ -0,0 +1,99 @@
+"""Show where the app's cold start goes, as a summarized python -X importtime.
+
+Imports the module in a fresh interpreter with -X importtime and prints the
+slowest imports by cumulative time and the total self time per top-level
+package. Streamlit is imported first by default, as the server has already
+done so before a worker runs the script; --with-streamlit counts it too:
+
+    python profile_startup.py [--module main] [--top 20] [--with-streamlit]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PRELOADED = "streamlit"
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def _run(code, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def _preamble(preload):
+    return f"import {preload}\n" if preload else ""
+
+
+def profile_imports(module="main", preload=PRELOADED):
+    """[(name, self seconds, cumulative seconds, depth)] for every import module caused, in import order
+
+    Modules preload already imported are not listed, since importing them
+    again costs nothing.
+    """
+    code = _preamble(preload) + "import sys\nsys.stderr.write('-- start --\\n')\n" + f"import {module}"
+    stderr = _run(code, importtime=True).stderr
+    imports = []
+    for line in stderr.split("-- start --\n", 1)[-1].splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return imports
+
+
+def import_seconds(module="main", preload=PRELOADED):
+    """Wall time of `import module` in a fresh interpreter, after preload"""
+    code = (_preamble(preload) + "import time\nstart = time.perf_counter()\n"
+            f"import {module}\nprint(time.perf_counter() - start)")
+    return float(_run(code).stdout.strip().splitlines()[-1])
+
+
+def process_seconds(module="main"):
+    """Wall time of a whole fresh process that imports module, interpreter start-up included"""
+    start = time.perf_counter()
+    _run(f"import {module}")
+    return time.perf_counter() - start
+
+
+def by_package(imports):
+    """{top-level package: total self seconds}, slowest first"""
+    totals = defaultdict(float)
+    for name, self_seconds, _, _ in imports:
+        totals[name.split(".", 1)[0]] += self_seconds
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def format_report(imports, top=20):
+    """Slowest imports by cumulative time, then self time per package"""
+    total = sum(cumulative for _, _, cumulative, depth in imports if depth == 0)
+    lines = [f"{len(imports)} modules imported in {total * 1000:.1f}ms", "",
+             f"{'cumulative':>11} {'self':>9}  module"]
+    for name, self_seconds, cumulative, depth in sorted(imports, key=lambda entry: -entry[2])[:top]:
+        lines.append(f"{cumulative * 1000:>9.1f}ms {self_seconds * 1000:>7.1f}ms  {'  ' * depth}{name}")
+    lines += ["", f"{'self':>11}  package"]
+    for package, seconds in list(by_package(imports).items())[:top]:
+        lines.append(f"{seconds * 1000:>9.1f}ms  {package}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module whose import is profiled")
+    parser.add_argument("--top", type=int, default=20, help="Rows shown in each table")
+    parser.add_argument("--with-streamlit", action="store_true",
+                        help="Also count importing Streamlit, as a bare python process would")
+    args = parser.parse_args(argv)
+
+    preload = None if args.with_streamlit else PRELOADED
+    print(format_report(profile_imports(args.module, preload), args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+from token_budget import ANALYSIS_TOKENS_PER_PLAYER, cap_answer
+
+# Sampling temperature for the analysis call (part of the analysis cache key)
+TEMPERATURE = 0.7
+
+# System prompt for GPT
+SYSTEM_PROMPT = """You are an engaging workplace skills instructor who uses interactive scenarios with constructive feedback and light humor to teach professional behavior.
+
+## Task Format
+
+### Ranking System
+🥇 GOLD MEDAL: Best response (⭐⭐⭐⭐⭐)  
+🥈 SILVER MEDAL: Good with minor issues (⭐⭐⭐⭐)  
+🥉 BRONZE MEDAL: Okay but needs improvement (⭐⭐⭐)  
+🤔 PARTICIPATION TROPHY: Poor but shows effort (⭐⭐)  
+🚨 "We Need to Talk": Major issues (⭐)
+
+### Feedback Requirements
+For each answer include:
+- Clear reasoning for ranking
+- Specific strengths/weaknesses
+- Light, appropriate humor (workplace metaphors, gentle sarcasm, pop culture references)
+- Constructive suggestions
+- Professional context (why this matters at work)
+
+### Learning Lesson Structure
+End with:
+- Key principle/framework (bolded)
+- Practical application
+- Why it matters professionally
+- Bonus tip: Memorable, actionable advice
+
+## Evaluation Criteria
+Rate based on: Professionalism • Problem-solving • Accountability • Communication • Workplace awareness • Practical applicability
+
+## Guidelines
+- Keep humor light and encouraging (never mocking)
+- Be constructive and end positively
+- Make lessons actionable and memorable
+- Use emojis sparingly but effectively
+
+Please evaluate the responses and provide rankings with feedback. IMPORTANT: For each player's response, clearly indicate which medal/trophy they receive (🥇 GOLD MEDAL, 🥈 SILVER MEDAL, etc.) so scores can be calculated."""
+
+# Asks for a machine-readable copy of the medals at the end of the analysis
+SCORE_BLOCK_INSTRUCTIONS = """Finish with a fenced ```json block and nothing after it, listing every player exactly once in this format:
+```json
+{"scores": [{"player": "<player name>", "medal": "<one of 🥇 🥈 🥉 🤔 🚨>"}]}
+```"""
+
+# Static system message of the combined analysis. Everything that depends on
+# the round goes in the user message after it, so the prompt starts with the
+# same bytes every time and the provider's prompt cache can reuse it.
+ANALYSIS_SYSTEM_PROMPT = f"""{SYSTEM_PROMPT}
+
+For each round you receive the scenario and every player's answer. Very long answers may be shortened with […].
+
+{SCORE_BLOCK_INSTRUCTIONS}"""
+
+# Words of feedback asked for per player, leaving headroom in the output budget
+FEEDBACK_WORDS_PER_PLAYER = ANALYSIS_TOKENS_PER_PLAYER * 3 // 5
+
+def _format_answers(answers, player_names):
+    return "".join(f"{name}: {cap_answer(answer)}\n\n" for name, answer in zip(player_names, answers))
+
+def build_analysis_messages(scenario_text, answers, player_names):
+    """Build the chat messages for evaluating a round"""
+    user_prompt = f"""Scenario: {scenario_text}
+
+Student Answers:
+{_format_answers(answers, player_names)}Keep each player's feedback to about {FEEDBACK_WORDS_PER_PLAYER} words."""
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+# Medal emoji -> label used when assembling per-player results
+MEDAL_LABELS = {
+    "🥇": "GOLD MEDAL",
+    "🥈": "SILVER MEDAL",
+    "🥉": "BRONZE MEDAL",
+    "🤔": "PARTICIPATION TROPHY",
+    "🚨": "\"We Need to Talk\""
+}
+
+def build_player_messages(scenario_text, player_name, answer):
+    """Build the chat messages for grading a single player's answer"""
+    user_prompt = f"""
+Scenario: {scenario_text}
+
+Student Answer:
+{player_name}: {cap_answer(answer)}
+
+Evaluate only this one response using the ranking system. Start your reply with the medal/trophy on its own line (for example "🥈 SILVER MEDAL"), then give the feedback. Do not write the learning lesson.
+"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def build_lesson_messages(scenario_text, answers, player_names):
+    """Build the chat messages for the shared learning lesson of a round"""
+    user_prompt = f"""
+Scenario: {scenario_text}
+
+Student Answers:
+{_format_answers(answers, player_names)}
+
+The answers are being ranked separately. Write only the learning lesson for this scenario, following the Learning Lesson Structure.
+"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+# System prompt for writing new scenarios; the reply is parsed as JSON
+SCENARIO_SYSTEM_PROMPT = """You write scenarios for a workplace skills training game. Players read a scenario and each write how they would handle it.
+
+A good scenario:
+- Describes one concrete, realistic situation at work in 1-3 sentences
+- Ends with a question to the player, such as "What do you do?"
+- Has no single obvious answer, so responses can be ranked
+- Is suitable for any office worker, with no names of real companies or people
+
+Reply with only a JSON object in this format:
+{"title": "The <short catchy title>", "scenario": "<the scenario>", "reference_answers": ["<a strong answer, 40-80 words>", "<another strong answer taking a different approach>"], "rubric": {"<criterion>": ["<keyword>", "..."]}}"""
+
+def build_scenario_messages(topic, difficulty, avoid_titles=()):
+    """Build the chat messages for writing one new scenario"""
+    user_prompt = f"Write one {difficulty} scenario about {topic}."
+    if avoid_titles:
+        user_prompt += " It must be different from these existing scenarios: " + "; ".join(avoid_titles) + "."
+    return [
+        {"role": "system", "content": SCENARIO_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import threading
+import time
+
+
+def request_key(request):
+    """Content hash of the parts of a chat request that decide the reply"""
+    payload = json.dumps({"model": request.get("model"), "messages": request.get("messages")},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CallRecorder:
+    """Appends every chat completion made through llm_client to a JSONL fixture file
+
+    Each line holds the request (without the API key), the reply, the usage
+    the provider reported and its timing: total seconds and, for streams,
+    the seconds at which every chunk arrived. benchmarks/replay.py serves
+    these files back with the same timing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def record(self, request, content, seconds, usage=None, chunks=None):
+        entry = {
+            "key": request_key(request),
+            "request": {name: request[name] for name in ("model", "messages", "max_tokens", "temperature", "stream")
+                        if name in request},
+            "content": content,
+            "usage": usage,
+            "seconds": round(seconds, 4),
+            "chunks": chunks,
+            "recorded_at": time.time()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def record_response(self, request, response, seconds):
+        """Record a non-streamed chat.completion"""
+        usage = getattr(response, "usage", None)
+        self.record(request, response.choices[0].message.content if response.choices else "", seconds,
+                    {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens} if usage
+                    else None)
+
+    def wrap_stream(self, request, stream, start):
+        """Pass a stream's chunks through, recording the text and arrival time of each once it ends"""
+        chunks = []
+        usage = None
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                chunks.append([round(time.perf_counter() - start, 4), text])
+            if getattr(chunk, "usage", None) is not None:
+                usage = {"prompt_tokens": chunk.usage.prompt_tokens, "completion_tokens": chunk.usage.completion_tokens}
+            yield chunk
+        self.record(request, "".join(text for _, text in chunks), time.perf_counter() - start, usage, chunks)
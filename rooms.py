@@ -0,0 +1,268 @@
+import random
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from game_engine import WINNING_SCORE
+from scoring import extract_scores_from_analysis, strip_score_block
+
+# Rooms untouched for this many seconds are dropped
+ROOM_TTL = 4 * 3600
+CODE_LENGTH = 5
+
+
+class Room:
+    """One multi-device game: players join with the room code and answer concurrently
+
+    Only the registry mutates a room, always under room.lock. Readers use
+    snapshot() to get a consistent copy. Every seat has a secret token,
+    handed only to the session that took it; acting for a player needs it.
+    """
+
+    def __init__(self, code, host_name):
+        self.code = code
+        self.host_name = host_name
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.created_at = time.time()
+        self.touched_at = self.created_at
+        self.player_names = [host_name]
+        self.player_scores = {host_name: 0}
+        self.seats = {}  # token -> player name
+        self.round_number = 0
+        self.scenario = None
+        self.answers = {}
+        self.status = "lobby"  # lobby -> answering -> grading -> graded; closed once everyone has left
+        self.analysis = None
+        self.round_scores = {}
+        self.error = None
+        self.winner = None
+        self.grader = None
+        self._subscribers = []
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "code": self.code,
+                "host_name": self.host_name,
+                "version": self.version,
+                "player_names": list(self.player_names),
+                "player_scores": dict(self.player_scores),
+                "round_number": self.round_number,
+                "scenario": self.scenario,
+                "submitted": [name for name in self.player_names if name in self.answers],
+                "status": self.status,
+                "analysis": self.analysis,
+                "round_scores": dict(self.round_scores),
+                "error": self.error,
+                "winner": self.winner
+            }
+
+
+class RoomRegistry:
+    """Thread-safe registry of rooms shared by every session in the process
+
+    The host passes grader(scenario_text, answers, player_names) -> (analysis, error)
+    when starting a round; it runs on a worker thread as soon as the last
+    answer of the round arrives, or when the host grades the answers
+    already in. on_scored(room, round_number, scenario,
+    round_scores) is called after each round is scored, outside the lock.
+    """
+
+    def __init__(self, max_grading_workers=8, on_scored=None):
+        self.on_scored = on_scored
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._grading_pool = ThreadPoolExecutor(max_workers=max_grading_workers, thread_name_prefix="room-grader")
+
+    def _new_code(self):
+        alphabet = string.ascii_uppercase.replace("O", "").replace("I", "")
+        while True:
+            code = "".join(random.choices(alphabet, k=CODE_LENGTH))
+            if code not in self._rooms:
+                return code
+
+    def _expire(self):
+        cutoff = time.time() - ROOM_TTL
+        for code in [code for code, room in self._rooms.items() if room.touched_at < cutoff]:
+            del self._rooms[code]
+
+    def create_room(self, host_name):
+        """Open a room; returns (room, the host's seat token)"""
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._expire()
+            room = Room(self._new_code(), host_name)
+            room.seats[token] = host_name
+            self._rooms[room.code] = room
+        return room, token
+
+    def get(self, code):
+        with self._lock:
+            return self._rooms.get(code.strip().upper())
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _notify(self, room):
+        """Bump the version and wake waiters and subscribers; caller holds room.lock"""
+        room.version += 1
+        room.touched_at = time.time()
+        room.changed.notify_all()
+        for callback in list(room._subscribers):
+            callback(room)
+
+    def subscribe(self, room, callback):
+        """Call callback(room) after every change; returns a function that unsubscribes"""
+        with room.lock:
+            room._subscribers.append(callback)
+
+        def unsubscribe():
+            with room.lock:
+                if callback in room._subscribers:
+                    room._subscribers.remove(callback)
+        return unsubscribe
+
+    def wait_for_change(self, room, version, timeout=None):
+        """Block until the room's version moves past version; returns the new version"""
+        with room.lock:
+            room.changed.wait_for(lambda: room.version != version, timeout=timeout)
+            return room.version
+
+    def player(self, room, token):
+        """Name of the player holding this seat token, or None if it is not in the room"""
+        with room.lock:
+            return room.seats.get(token)
+
+    def join(self, room, name, token=None):
+        """Take a seat, or take back your own with its token; returns (token, error)"""
+        with room.lock:
+            if token is not None and room.seats.get(token) == name:
+                return token, None  # Rejoining from a refreshed browser
+            if any(player.casefold() == name.casefold() for player in room.player_names):
+                return None, "That name is taken in this room - pick another one"
+            if room.status not in ("lobby", "graded"):
+                return None, "A round is in progress - join when it finishes"
+            token = secrets.token_urlsafe(16)
+            room.seats[token] = name
+            room.player_names.append(name)
+            room.player_scores.setdefault(name, 0)
+            self._notify(room)
+        return token, None
+
+    def leave(self, room, token):
+        """Give up a seat; the host role passes to the next player and an empty room closes"""
+        with room.lock:
+            name = room.seats.get(token)
+            if name is None:
+                return
+            grading = self._remove(room, name)
+        self._start_grading(room, grading)
+
+    def kick(self, room, token, name):
+        """Host only: drop another player from the room"""
+        with room.lock:
+            if room.seats.get(token) != room.host_name or name == room.host_name or name not in room.player_names:
+                return False
+            grading = self._remove(room, name)
+        self._start_grading(room, grading)
+        return True
+
+    def _remove(self, room, name):
+        """Drop a player; caller holds room.lock. Returns grading to start, if the rest have all answered"""
+        room.player_names.remove(name)
+        room.player_scores.pop(name, None)
+        room.answers.pop(name, None)
+        for token in [token for token, player in room.seats.items() if player == name]:
+            del room.seats[token]
+        if not room.player_names:
+            with self._lock:
+                if self._rooms.get(room.code) is room:
+                    del self._rooms[room.code]
+            room.status = "closed"
+        elif name == room.host_name:
+            room.host_name = room.player_names[0]
+        grading = None
+        if room.status == "answering" and room.answers and len(room.answers) == len(room.player_names):
+            grading = self._begin_grading(room)
+        self._notify(room)
+        return grading
+
+    def start_round(self, room, token, scenario, grader):
+        """Host only: deal scenario to every player"""
+        with room.lock:
+            if room.seats.get(token) != room.host_name or room.winner or room.status in ("answering", "grading"):
+                return
+            room.round_number += 1
+            room.scenario = scenario
+            room.grader = grader
+            room.answers = {}
+            room.analysis = None
+            room.round_scores = {}
+            room.error = None
+            room.status = "answering"
+            self._notify(room)
+
+    def submit(self, room, token, answer):
+        """Record the seat's answer; the last one of the round starts grading in the background"""
+        with room.lock:
+            name = room.seats.get(token)
+            if room.status != "answering" or name is None or name in room.answers:
+                return False
+            room.answers[name] = answer
+            grading = None
+            if len(room.answers) == len(room.player_names):
+                grading = self._begin_grading(room)
+            self._notify(room)
+        self._start_grading(room, grading)
+        return True
+
+    def grade_now(self, room, token):
+        """Host only: grade the answers already in without waiting for the rest"""
+        with room.lock:
+            if room.seats.get(token) != room.host_name or room.status != "answering" or not room.answers:
+                return False
+            grading = self._begin_grading(room)
+            self._notify(room)
+        self._start_grading(room, grading)
+        return True
+
+    def _begin_grading(self, room):
+        """Move to grading; caller holds room.lock. Returns the arguments for _grade"""
+        room.status = "grading"
+        names = [player for player in room.player_names if player in room.answers]
+        answers = [room.answers[player] for player in names]
+        return room.round_number, room.scenario["scenario"], answers, names, room.grader
+
+    def _start_grading(self, room, grading):
+        if grading is not None:
+            self._grading_pool.submit(self._grade, room, *grading)
+
+    def _grade(self, room, round_number, scenario_text, answers, names, grader):
+        try:
+            analysis, error = grader(scenario_text, answers, names)
+        except Exception as e:
+            analysis, error = None, str(e)
+        with room.lock:
+            if room.round_number != round_number or room.status != "grading":
+                return  # Round was reset while grading
+            scenario = room.scenario
+            if analysis:
+                room.round_scores = extract_scores_from_analysis(analysis, names)
+                room.analysis = strip_score_block(analysis)
+                for name, score in room.round_scores.items():
+                    if name in room.player_scores:  # Not a player who left while grading
+                        room.player_scores[name] += score
+                leader, top_score = max(room.player_scores.items(), key=lambda x: x[1])
+                if top_score >= WINNING_SCORE:
+                    room.winner = leader
+            else:
+                room.error = error
+            room.status = "graded"
+            round_scores = dict(room.round_scores)
+            self._notify(room)
+        if analysis and self.on_scored is not None:
+            self.on_scored(room, round_number, scenario, round_scores)
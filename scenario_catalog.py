@@ -0,0 +1,242 @@
+import glob
+import json
+import os
+import random
+import re
+import threading
+
+from config import env
+
+# Base catalog shipped with the game, plus a directory of optional packs
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+PACKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenario_packs")
+
+
+def scenario_sources():
+    """List the scenario files to load: questions.json, packs in scenario_packs/, then SCENARIO_PACKS"""
+    paths = [QUESTIONS_PATH]
+    paths += sorted(glob.glob(os.path.join(PACKS_DIR, "*.json")) + glob.glob(os.path.join(PACKS_DIR, "*.jsonl")))
+    extra = env("SCENARIO_PACKS", "")
+    for entry in filter(None, extra.split(os.pathsep)):
+        if os.path.isdir(entry):
+            paths += sorted(glob.glob(os.path.join(entry, "*.json")) + glob.glob(os.path.join(entry, "*.jsonl")))
+        else:
+            paths.append(entry)
+    return paths
+
+
+def sources_signature(paths):
+    """Return (path, mtime, size) for each source; changes whenever a pack is edited"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def slugify(title):
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+def _read_records(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data.get("scenarios", []) if isinstance(data, dict) else data
+
+
+class ScenarioCatalog:
+    """All known scenarios, indexed by id, title and tag
+
+    Shared by every session while the scenario producer adds to it, so add()
+    and the readers that walk the indexes hold a lock.
+    """
+
+    def __init__(self, scenarios=(), errors=()):
+        self.scenarios = []
+        self.errors = list(errors)
+        self._by_id = {}
+        self._by_title = {}
+        self._by_text = {}
+        self._by_tag = {}
+        self._search_text = []
+        self._last_search = None  # ((query, tag), positions), reused across paging reruns
+        self._lock = threading.RLock()
+        for scenario in scenarios:
+            self.add(scenario)
+
+    def add(self, scenario):
+        """Add a scenario, replacing any earlier one with the same id"""
+        scenario = dict(scenario)
+        scenario.setdefault("id", slugify(scenario["title"]))
+        scenario["tags"] = [str(tag).lower() for tag in scenario.get("tags", [])]
+        with self._lock:
+            self._add(scenario)
+
+    def _add(self, scenario):
+        position = self._by_id.get(scenario["id"])
+        if position is None:
+            position = len(self.scenarios)
+            self.scenarios.append(scenario)
+            self._search_text.append("")
+        else:
+            old = self.scenarios[position]
+            self._by_title.pop(old["title"], None)
+            self._by_text.pop(old["scenario"], None)
+            for tag in old["tags"]:
+                self._by_tag[tag].remove(position)
+            self.scenarios[position] = scenario
+        self._by_id[scenario["id"]] = position
+        self._by_title[scenario["title"]] = position
+        self._by_text[scenario["scenario"]] = position
+        for tag in scenario["tags"]:
+            self._by_tag.setdefault(tag, []).append(position)
+        self._search_text[position] = f"{scenario['title']}\n{scenario['scenario']}".lower()
+        self._last_search = None
+
+    def __len__(self):
+        return len(self.scenarios)
+
+    def get(self, scenario_id):
+        position = self._by_id.get(scenario_id)
+        return None if position is None else self.scenarios[position]
+
+    def by_title(self, title):
+        position = self._by_title.get(title)
+        return None if position is None else self.scenarios[position]
+
+    def by_text(self, scenario_text):
+        position = self._by_text.get(scenario_text)
+        return None if position is None else self.scenarios[position]
+
+    def _positions(self, tag):
+        """Positions of the scenarios with tag, or None for all of them (caller holds the lock)"""
+        return None if tag is None else self._by_tag.get(tag.lower(), [])
+
+    def count(self, tag=None):
+        """Number of scenarios (with tag)"""
+        with self._lock:
+            positions = self._positions(tag)
+            return len(self.scenarios) if positions is None else len(positions)
+
+    def by_tag(self, tag=None):
+        """Scenarios with tag, or all of them"""
+        with self._lock:
+            positions = self._positions(tag)
+            if positions is None:
+                return list(self.scenarios)
+            return [self.scenarios[position] for position in positions]
+
+    def tags(self):
+        with self._lock:
+            return sorted(tag for tag, positions in self._by_tag.items() if positions)
+
+    def random(self, tag=None, rng=random):
+        """A random scenario (with tag), or None if there is none"""
+        with self._lock:
+            positions = self._positions(tag)
+            total = len(self.scenarios) if positions is None else len(positions)
+            if not total:
+                return None
+            index = rng.randrange(total)
+            return self.scenarios[index if positions is None else positions[index]]
+
+    def search(self, query="", tag=None, offset=0, limit=50):
+        """Return (matches on this page, total matches) for a case-insensitive text query"""
+        query = query.strip().lower()
+        key = (query, tag.lower() if tag else None)
+        with self._lock:
+            last_search = self._last_search
+            if last_search is not None and last_search[0] == key:
+                positions = last_search[1]
+            else:
+                if tag:
+                    positions = self._by_tag.get(tag.lower(), [])
+                else:
+                    positions = range(len(self.scenarios))
+                if query:
+                    positions = [p for p in positions if query in self._search_text[p]]
+                self._last_search = (key, positions)
+            total = len(positions)
+            return [self.scenarios[p] for p in positions[offset:offset + limit]], total
+
+
+class ScenarioDeck:
+    """One game's scenarios, dealt at random without repeats until every one has been played
+
+    Only the ids already played are kept, so a deck costs the same for any
+    catalog size: a draw samples the catalog until it hits an unplayed
+    scenario, and scenarios added to the catalog later are simply part of
+    the next sample. Once every scenario has been played the deck starts
+    over, never with the scenario just played.
+    """
+
+    # Random picks tried before choosing among the few unplayed scenarios left
+    SAMPLE_TRIES = 32
+
+    def __init__(self, seen=(), rng=None):
+        self._rng = rng or random.Random()
+        self._seen = set(seen)
+        self._last = None
+
+    def mark_played(self, scenario):
+        """Take a scenario picked by hand out of the deck"""
+        if "id" in scenario:
+            self._seen.add(scenario["id"])
+
+    def remaining(self, catalog, tag=None):
+        """Scenarios (with tag) this game has not played yet"""
+        played = 0
+        for scenario_id in self._seen:
+            scenario = catalog.get(scenario_id)
+            played += scenario is not None and (tag is None or tag in scenario["tags"])
+        return catalog.count(tag) - played
+
+    def _pick(self, catalog, tag, exclude):
+        for _ in range(self.SAMPLE_TRIES):
+            scenario = catalog.random(tag, self._rng)
+            if scenario["id"] not in exclude:
+                return scenario
+        return self._rng.choice([scenario for scenario in catalog.by_tag(tag) if scenario["id"] not in exclude])
+
+    def draw(self, catalog, tag=None):
+        """Deal the next unplayed scenario, with tag if any is left; None for an empty catalog"""
+        if tag is not None and self.remaining(catalog, tag) <= 0:
+            tag = None
+        exclude = self._seen
+        if self.remaining(catalog) <= 0:
+            if not catalog.count():
+                return None
+            # Everything has been played: start a new pass through the catalog
+            self._seen.clear()
+            exclude = {self._last} if catalog.count() > 1 else set()
+        scenario = self._pick(catalog, tag, exclude)
+        self._seen.add(scenario["id"])
+        self._last = scenario["id"]
+        return scenario
+
+
+def load_catalog(paths):
+    """Load scenarios from JSON (list or {"scenarios": [...]}) and JSONL files
+
+    Files or entries that cannot be used are skipped and reported in
+    catalog.errors instead of stopping the game.
+    """
+    catalog = ScenarioCatalog()
+    for path in paths:
+        try:
+            records = _read_records(path)
+        except (OSError, ValueError) as e:
+            catalog.errors.append(f"{os.path.basename(path)}: {e}")
+            continue
+        for i, record in enumerate(records):
+            if not (isinstance(record, dict) and isinstance(record.get("title"), str)
+                    and isinstance(record.get("scenario"), str)):
+                catalog.errors.append(f"{os.path.basename(path)}: entry {i + 1} needs a title and scenario")
+                continue
+            catalog.add(record)
+    return catalog
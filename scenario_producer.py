@@ -0,0 +1,233 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from answer_index import shingles
+from config import env
+from llm_client import chat_completion
+from prompts import build_scenario_messages
+from scenario_catalog import slugify
+from scheduler import PRIORITY_BATCH, request_context
+
+# Topics kept in stock, and how many ready scenarios each keeps
+SCENARIO_TOPICS = ["conflict", "deadlines", "feedback", "ethics", "teamwork", "customers", "remote work"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+POOL_SIZE = int(env("SCENARIO_POOL_SIZE", "2"))
+SCENARIO_MODEL = env("SCENARIO_MODEL", "gpt-3.5-turbo")
+SCENARIO_MAX_TOKENS = 600
+SCENARIO_TEMPERATURE = 1.0
+
+# Seconds a producer is kept after the last session using it was seen
+PRODUCER_IDLE_SECONDS = float(env("SCENARIO_PRODUCER_IDLE_SECONDS", "600"))
+
+# A new scenario at least this similar (word-bigram Jaccard) to a known one is a repeat
+MAX_SIMILARITY = 0.5
+# Seconds before retrying a failed or rejected generation, doubling up to the cap
+RETRY_DELAY = 2.0
+RETRY_DELAY_CAP = 120.0
+# Titles of existing scenarios listed in the prompt as examples to avoid
+AVOID_TITLES = 15
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def validate_scenario(record, topic, difficulty, known_shingles=()):
+    """Check a generated record and turn it into a catalog scenario; returns (scenario, error)"""
+    if not isinstance(record, dict):
+        return None, "not a JSON object"
+    title, text = record.get("title"), record.get("scenario")
+    if not isinstance(title, str) or not 3 <= len(title.strip()) <= 80:
+        return None, "title missing or too long"
+    if not isinstance(text, str) or not 60 <= len(text.strip()) <= 700:
+        return None, "scenario missing, too short or too long"
+    if not text.strip().endswith("?"):
+        return None, "scenario does not end with a question"
+    references = [answer.strip() for answer in record.get("reference_answers") or []
+                  if isinstance(answer, str) and len(answer.split()) >= 15]
+    if not references:
+        return None, "no usable reference answers"
+    text_shingles = shingles(text)
+    if any(_similarity(text_shingles, known) >= MAX_SIMILARITY for known in known_shingles):
+        return None, "too similar to an existing scenario"
+    rubric = record.get("rubric") if isinstance(record.get("rubric"), dict) else {}
+    title, text = title.strip(), text.strip()
+    return {
+        "id": f"generated-{slugify(title)}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:6]}",
+        "title": title,
+        "scenario": text,
+        "tags": [topic, difficulty, "generated"],
+        "reference_answers": references[:3],
+        "rubric": {str(criterion): [str(word) for word in words if isinstance(word, str)]
+                   for criterion, words in rubric.items() if isinstance(words, list)}
+    }, None
+
+
+class ScenarioProducer:
+    """Keeps a small stock of freshly generated scenarios per topic, refilled in the background
+
+    One daemon thread writes a scenario for whichever topic is lowest,
+    validates it and rejects repeats of known scenarios, until every topic
+    holds pool_size; take() hands one out instantly (or None) and wakes the
+    thread to replace it. Generation goes through the shared scheduler at
+    batch priority, so it never delays a round being graded.
+    """
+
+    def __init__(self, api_key, model=SCENARIO_MODEL, topics=SCENARIO_TOPICS, pool_size=POOL_SIZE,
+                 known_scenarios=()):
+        self.api_key = api_key
+        self.model = model
+        self.pool_size = pool_size
+        self.generated = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_error = None
+        self._pools = {topic: deque() for topic in topics}
+        self._known = [shingles(s["scenario"]) for s in known_scenarios]
+        self._titles = [s["title"] for s in known_scenarios]
+        self._rng = random.Random()
+        self._changed = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    @property
+    def topics(self):
+        return list(self._pools)
+
+    def start(self):
+        with self._changed:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="scenario-producer")
+                self._thread.start()
+        return self
+
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+
+    def take(self, topic=None):
+        """A ready scenario for topic (any topic if None or unknown), or None if the stock is empty"""
+        with self._changed:
+            pool = self._pools.get(topic)
+            if not pool:
+                pool = max(self._pools.values(), key=len, default=None)
+            scenario = pool.popleft() if pool else None
+            self._changed.notify_all()
+        return scenario
+
+    def stats(self):
+        with self._changed:
+            return {
+                "ready": {topic: len(pool) for topic, pool in self._pools.items()},
+                "generated": self.generated,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "last_error": self.last_error
+            }
+
+    def _next_topic(self):
+        """Topic with the fewest ready scenarios, or None when all are full"""
+        topic, pool = min(self._pools.items(), key=lambda item: len(item[1]), default=(None, None))
+        return topic if pool is not None and len(pool) < self.pool_size else None
+
+    def generate(self, topic, difficulty):
+        """Write one scenario; returns (scenario, error)"""
+        avoid = self._rng.sample(self._titles, min(AVOID_TITLES, len(self._titles)))
+        with request_context(game="scenario-producer", priority=PRIORITY_BATCH):
+            response = chat_completion(
+                self.api_key,
+                model=self.model,
+                messages=build_scenario_messages(topic, difficulty, avoid),
+                max_tokens=SCENARIO_MAX_TOKENS,
+                temperature=SCENARIO_TEMPERATURE
+            )
+        match = _JSON_OBJECT.search(response.choices[0].message.content or "")
+        try:
+            record = json.loads(match.group(0)) if match else None
+        except ValueError:
+            record = None
+        with self._changed:
+            known = list(self._known)
+        return validate_scenario(record, topic, difficulty, known)
+
+    def _run(self):
+        delay = RETRY_DELAY
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._stopped or self._next_topic() is not None)
+                if self._stopped:
+                    return
+                topic = self._next_topic()
+            try:
+                scenario, error = self.generate(topic, self._rng.choice(DIFFICULTIES))
+                failed = False
+            except Exception as e:
+                scenario, error, failed = None, str(e), True
+            with self._changed:
+                if scenario is not None:
+                    self.generated += 1
+                    self._pools[topic].append(scenario)
+                    self._known.append(shingles(scenario["scenario"]))
+                    self._titles.append(scenario["title"])
+                    delay = RETRY_DELAY
+                    continue
+                if failed:
+                    self.failed += 1
+                else:
+                    self.rejected += 1
+                self.last_error = error
+                # Back off so a broken endpoint or a model that keeps missing the format is not hammered
+                self._changed.wait(timeout=delay)
+            delay = min(RETRY_DELAY_CAP, delay * 2)
+
+
+class ProducerPool:
+    """One ScenarioProducer per API key, stopped as soon as no session uses it
+
+    Sessions call get() on every rerun while they want fresh scenarios and
+    release() when they stop; a session that just goes away counts as gone
+    after idle_seconds. Each call stops and drops producers nobody uses.
+    """
+
+    def __init__(self, idle_seconds=PRODUCER_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._producers = {}
+        self._sessions = {}  # session id -> (api key, last seen)
+        self._lock = threading.Lock()
+
+    def get(self, api_key, session_id, known_scenarios=()):
+        """The running producer for api_key, started if needed, on behalf of session_id"""
+        with self._lock:
+            self._sessions[session_id] = (api_key, time.monotonic())
+            producer = self._producers.get(api_key)
+            if producer is None:
+                producer = self._producers[api_key] = ScenarioProducer(api_key, known_scenarios=known_scenarios)
+                producer.start()
+            self._evict()
+        return producer
+
+    def release(self, session_id):
+        """session_id no longer wants fresh scenarios"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._evict()
+
+    def __len__(self):
+        return len(self._producers)
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id, (_, seen) in list(self._sessions.items()):
+            if seen < cutoff:
+                del self._sessions[session_id]
+        used = {api_key for api_key, _ in self._sessions.values()}
+        for api_key in [api_key for api_key in self._producers if api_key not in used]:
+            self._producers.pop(api_key).stop()
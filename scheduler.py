@@ -0,0 +1,296 @@
+import contextvars
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# Request priorities, most urgent first
+PRIORITY_INTERACTIVE = 0  # a player is watching a spinner
+PRIORITY_BACKGROUND = 1  # speculative work nobody waits on yet
+PRIORITY_BATCH = 2  # offline jobs
+
+# Retry backoff: full jitter between 0 and min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) seconds
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+_current_game = contextvars.ContextVar("llm_game", default=None)
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+_UNSET = object()
+
+
+class SchedulerFull(Exception):
+    """The request queue stayed full for the whole submit timeout"""
+
+
+class request_context:
+    """Tag the LLM requests made inside the block with a game id and priority
+
+        with request_context(game=game_id, priority=PRIORITY_INTERACTIVE):
+            analysis, error = get_llm_analysis(...)
+    """
+
+    def __init__(self, game=_UNSET, priority=_UNSET):
+        self.game = game
+        self.priority = priority
+        self._tokens = []
+
+    def __enter__(self):
+        if self.game is not _UNSET:
+            self._tokens.append((_current_game, _current_game.set(self.game)))
+        if self.priority is not _UNSET:
+            self._tokens.append((_current_priority, _current_priority.set(self.priority)))
+        return self
+
+    def __exit__(self, *exc):
+        while self._tokens:
+            var, token = self._tokens.pop()
+            var.reset(token)
+
+
+def in_context(fn, game=_UNSET, priority=_UNSET):
+    """Wrap fn to run in a copy of the caller's request context, for handing to worker threads"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        def call():
+            with request_context(game, priority):
+                return fn(*args, **kwargs)
+        return context.copy().run(call)
+    return run
+
+
+class TokenBucket:
+    """Refills at rate_per_minute and holds at most burst_seconds worth"""
+
+    def __init__(self, rate_per_minute, burst_seconds=60):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = self.rate * burst_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds, now):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class _Job:
+    def __init__(self, key, fn, tokens, actual_tokens, game, priority):
+        self.key = key
+        self.fn = fn
+        self.tokens = tokens
+        self.actual_tokens = actual_tokens
+        self.game = game
+        self.priority = priority
+        self.attempts = 0
+        self.not_before = 0.0
+        self.future = Future()
+
+
+class RequestScheduler:
+    """Process-wide queue that every LLM request goes through
+
+    Requests wait in a bounded queue until their API key's request and token
+    buckets allow them, then run on one of `concurrency` worker threads.
+    Higher priorities go first; within a priority, games take turns so one
+    busy game cannot starve the others. retry_after(exc) returns the delay
+    the provider asked for (0 if none) when exc is worth retrying, or None;
+    retried requests back off with jitter and keep their place in line.
+    burst_seconds matches how the provider enforces its per-minute limits
+    (some enforce them over shorter windows).
+    """
+
+    def __init__(self, concurrency=32, max_queue=500, requests_per_minute=3500, tokens_per_minute=90000,
+                 max_retries=4, retry_after=None, burst_seconds=60):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst_seconds = burst_seconds
+        self.max_retries = max_retries
+        self.retry_after = retry_after or (lambda exc: None)
+        self._cond = threading.Condition()
+        self._queues = {}  # priority -> OrderedDict(game -> deque of jobs), in turn order
+        self._queued = 0
+        self._running = 0
+        self._buckets = {}  # key -> (request bucket, token bucket)
+        self._anonymous = itertools.count()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "rejected": 0}
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"llm-scheduler-{i}")
+                         for i in range(concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def _limits(self, key):
+        limits = self._buckets.get(key)
+        if limits is None:
+            limits = (TokenBucket(self.requests_per_minute, self.burst_seconds),
+                      TokenBucket(self.tokens_per_minute, self.burst_seconds))
+            self._buckets[key] = limits
+        return limits
+
+    def submit(self, key, fn, tokens, actual_tokens=None, block=True, timeout=None):
+        """Queue fn() for key and return a Future of its result
+
+        tokens is the estimated prompt + completion size; actual_tokens(result)
+        may return the real figure to correct the bucket afterwards. The game
+        and priority come from the enclosing request_context. Like queue.Queue,
+        a full queue blocks up to timeout and then raises SchedulerFull.
+        """
+        game = _current_game.get()
+        if game is None:
+            game = ("anonymous", next(self._anonymous))  # untagged requests each get their own turn
+        job = _Job(key, fn, tokens, actual_tokens, game, _current_priority.get())
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queued < self.max_queue, timeout=timeout if block else 0):
+                self._stats["rejected"] += 1
+                raise SchedulerFull("The AI service queue is full - try again in a moment")
+            self._enqueue(job)
+            self._stats["submitted"] += 1
+            self._cond.notify_all()
+        return job.future
+
+    def settle(self, key, reserved, actual):
+        """Correct key's token bucket once a request's real size is known after it finished (streams)"""
+        with self._cond:
+            self._limits(key)[1].give_back(reserved - actual)
+            self._cond.notify_all()
+
+    def call(self, key, fn, tokens, actual_tokens=None, timeout=None):
+        """submit() and wait for the result"""
+        return self.submit(key, fn, tokens, actual_tokens, timeout=timeout).result()
+
+    def _enqueue(self, job, front=False):
+        games = self._queues.setdefault(job.priority, OrderedDict())
+        jobs = games.get(job.game)
+        if jobs is None:
+            jobs = games[job.game] = deque()
+        if front:
+            jobs.appendleft(job)
+        else:
+            jobs.append(job)
+        self._queued += 1
+
+    def _next_job(self, now):
+        """Pop the next runnable job, or return (None, seconds until one may become runnable)"""
+        wait = None
+        blocked_keys = set()
+        for priority in sorted(self._queues):
+            games = self._queues[priority]
+            for game, jobs in games.items():
+                job = jobs[0]
+                if job.key in blocked_keys:
+                    continue
+                delay = job.not_before - now
+                if delay <= 0:
+                    requests, tokens = self._limits(job.key)
+                    delay = max(requests.wait_time(1, now), tokens.wait_time(job.tokens, now))
+                    if delay > 0:
+                        # Later jobs with this key must not jump ahead and drain the bucket
+                        blocked_keys.add(job.key)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                requests.take(1)
+                tokens.take(job.tokens)
+                jobs.popleft()
+                self._queued -= 1
+                # This game goes to the back of the line
+                del games[game]
+                if jobs:
+                    games[game] = jobs
+                if not games:
+                    del self._queues[priority]
+                return job, None
+        return None, wait
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    job, wait = self._next_job(time.monotonic())
+                    if job is not None:
+                        break
+                    self._cond.wait(wait)
+                self._running += 1
+                self._cond.notify_all()  # a queue slot is free
+            if job.attempts or job.future.set_running_or_notify_cancel():
+                self._run(job)
+            else:
+                with self._cond:
+                    self._limits(job.key)[1].give_back(job.tokens)  # cancelled while queued
+            with self._cond:
+                self._running -= 1
+
+    def _run(self, job):
+        try:
+            result = job.fn()
+        except Exception as e:
+            delay = self.retry_after(e)
+            if delay is not None and job.attempts < self.max_retries:
+                self._retry(job, delay)
+                return
+            with self._cond:
+                self._stats["failed"] += 1
+            job.future.set_exception(e)
+            return
+        actual = job.actual_tokens(result) if job.actual_tokens else None
+        with self._cond:
+            if actual is not None:
+                self._limits(job.key)[1].give_back(job.tokens - actual)
+            self._stats["completed"] += 1
+        job.future.set_result(result)
+
+    def _retry(self, job, retry_after):
+        now = time.monotonic()
+        delay = max(retry_after, random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** job.attempts)))
+        job.attempts += 1
+        job.not_before = now + delay
+        with self._cond:
+            if retry_after:
+                # The provider asked every request on this key to slow down
+                for bucket in self._limits(job.key):
+                    bucket.pause(retry_after, now)
+            self._stats["retries"] += 1
+            self._enqueue(job, front=True)
+            self._cond.notify_all()
+
+    def queue_position(self, game):
+        """1-based place of the game's next queued request in dispatch order, or None if nothing is queued"""
+        with self._cond:
+            ahead = 0
+            for priority in sorted(self._queues):
+                games = self._queues[priority]
+                if game not in games:
+                    ahead += sum(len(jobs) for jobs in games.values())
+                    continue
+                # Games take turns: those before this one in the rotation each go once first
+                for other in games:
+                    if other == game:
+                        return ahead + 1
+                    ahead += 1
+            return None
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, queued=self._queued, running=self._running)
+
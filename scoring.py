@@ -0,0 +1,252 @@
+import json
+import re
+import time
+from functools import lru_cache
+
+from metrics import PARSE_BUCKETS, metrics
+from prompts import MEDAL_LABELS
+
+# Score mapping, one point per star of the medal tier
+SCORE_MAP = {
+    "🥇": 5,  # Gold Medal
+    "🥈": 4,  # Silver Medal
+    "🥉": 3,  # Bronze Medal
+    "🤔": 2,  # Participation Trophy
+    "🚨": 1   # "We Need to Talk"
+}
+
+_LABEL_TO_MEDAL = {label.strip('"').lower(): medal for medal, label in MEDAL_LABELS.items()}
+
+PARSE_SECONDS = metrics.histogram("score_parse_seconds", "Time to extract scores from one analysis", PARSE_BUCKETS)
+
+_SCORE_BLOCK_PATTERN = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def _normalize_medal(value):
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    for medal in SCORE_MAP:
+        if medal in value:
+            return medal
+    return _LABEL_TO_MEDAL.get(value.strip('"').lower())
+
+
+def parse_score_block(analysis_text, player_names):
+    """Return {name: medal} from the analysis' JSON score block, or None if it has no valid block
+
+    The block looks like {"scores": [{"player": "Alice", "medal": "🥇"}, ...]}.
+    Entries for unknown players or medals are ignored; a player listed twice
+    keeps the first medal.
+    """
+    matches = _SCORE_BLOCK_PATTERN.findall(analysis_text)
+    if not matches:
+        return None
+    try:
+        block = json.loads(matches[-1])
+    except ValueError:
+        return None
+    if not isinstance(block, dict) or not isinstance(block.get("scores"), list):
+        return None
+
+    canonical = {name.lower(): name for name in player_names}
+    medals = {}
+    for entry in block["scores"]:
+        if not isinstance(entry, dict) or not isinstance(entry.get("player"), str):
+            continue
+        name = canonical.get(entry["player"].strip().lower())
+        medal = _normalize_medal(entry.get("medal"))
+        if name and medal and name not in medals:
+            medals[name] = medal
+    return medals
+
+
+def strip_score_block(analysis_text):
+    """Remove the machine-readable score block before showing the analysis"""
+    return _SCORE_BLOCK_PATTERN.sub("", analysis_text).rstrip()
+
+
+@lru_cache(maxsize=64)
+def _name_index(player_names):
+    """Map the lowercased first word of each name to (lowercased name, name), longest names first"""
+    index = {}
+    for name in sorted(player_names, key=len, reverse=True):
+        first_word = re.match(r"\w+", name)
+        if first_word:
+            index.setdefault(first_word.group().lower(), []).append((name.lower(), name))
+    return index
+
+
+_MEDAL_ALTERNATION = "|".join(re.escape(medal) for medal in SCORE_MAP)
+
+
+def _alternation(words):
+    """Regex matching any of words, factored by shared prefix and preferring the longest"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not ends else "(?:" + "|".join(branches) + ")"
+        return body + "?" if ends else body
+
+    return build(trie)
+
+
+@lru_cache(maxsize=64)
+def _scan_pattern(player_names):
+    """Compile one pattern matching newlines, medals and whole lowercased player names
+
+    Returns (pattern, {lowercased name: name}); match it against the lowercased text.
+    """
+    names = {}
+    for name in sorted(player_names, key=len, reverse=True):
+        if name.strip():
+            names.setdefault(name.lower(), name)
+    alternatives = [r"(?P<newline>\n)", f"(?P<medal>{_MEDAL_ALTERNATION})"]
+    if names:
+        alternatives.append(r"(?<!\w)(?P<name>" + _alternation(names) + r")(?!\w)")
+    return re.compile("|".join(alternatives)), names
+
+
+class MedalScanner:
+    """scan_medals fed as the analysis arrives: feed() scores each line as soon as it is complete
+
+    Medals and names on the same line are paired in order of appearance. A
+    medal on a line without a name goes to the most recently named player
+    (heading followed by the medal). Each player keeps their first medal;
+    medals holds everything awarded so far.
+    """
+
+    def __init__(self, player_names):
+        self._pattern, self._names = _scan_pattern(tuple(player_names))
+        self.medals = {}
+        self._last_named = None
+        self._line_names = []
+        self._line_medals = []
+        self._pending = ""
+
+    def _close_line(self, awarded):
+        names, line_medals = self._line_names, self._line_medals
+        new = []
+        if names:
+            unscored = [name for name in names if name not in self.medals]
+            new = list(zip(unscored, line_medals))
+            self._last_named = names[-1]
+        elif line_medals and self._last_named and self._last_named not in self.medals:
+            new = [(self._last_named, line_medals[0])]
+        self.medals.update(new)
+        awarded.extend(new)
+        names.clear()
+        line_medals.clear()
+
+    def _scan(self, text, awarded):
+        for token in self._pattern.finditer(text.lower()):
+            kind = token.lastgroup
+            if kind == "newline":
+                self._close_line(awarded)
+            elif kind == "medal":
+                self._line_medals.append(token.group())
+            else:
+                name = self._names.get(token.group())
+                if name and name not in self._line_names:
+                    self._line_names.append(name)
+
+    def feed(self, text):
+        """Scan the lines text completes; returns [(name, medal)] newly awarded, in order"""
+        awarded = []
+        text = self._pending + text
+        cut = text.rfind("\n") + 1
+        self._pending = text[cut:]
+        self._scan(text[:cut], awarded)
+        return awarded
+
+    def close(self):
+        """Scan the last, unterminated line; returns [(name, medal)] newly awarded"""
+        awarded = []
+        self._scan(self._pending, awarded)
+        self._pending = ""
+        self._close_line(awarded)
+        return awarded
+
+
+def scan_medals(analysis_text, player_names):
+    """Return {name: medal} from the free-text analysis in a single pass (see MedalScanner)"""
+    scanner = MedalScanner(player_names)
+    scanner._scan(analysis_text, [])
+    scanner._close_line([])
+    return scanner.medals
+
+
+def extract_medals(analysis_text, player_names):
+    """Return {name: medal} for every player the analysis awarded a medal
+
+    The JSON score block is authoritative; players it misses are found in the
+    free text.
+    """
+    medals = parse_score_block(analysis_text, player_names) or {}
+    if len(medals) < len(player_names):
+        for name, medal in scan_medals(analysis_text, player_names).items():
+            medals.setdefault(name, medal)
+    return medals
+
+
+def extract_scores_from_analysis(analysis_text, player_names):
+    """Extract scores from AI analysis based on medals/trophies awarded"""
+    start = time.perf_counter()
+    medals = extract_medals(analysis_text, player_names)
+    scores = {name: SCORE_MAP[medals[name]] if name in medals else 0 for name in player_names}
+    PARSE_SECONDS.observe(time.perf_counter() - start)
+    return scores
+
+
+_SECTION_BREAK = re.compile(r"^(#{1,6}\s|---)")
+_MEDAL_LINE = re.compile(r"^\W*(" + "|".join(re.escape(medal) for medal in SCORE_MAP) + r")[^\n]{0,40}$")
+
+
+def _named_player(line, index):
+    """The single player a heading-like line names, or None"""
+    lowered = line.lower()
+    named = {name for word in re.findall(r"\w+", lowered) for name_lower, name in index.get(word, ())
+             if re.search(r"(?<!\w)" + re.escape(name_lower) + r"(?!\w)", lowered)}
+    return next(iter(named)) if len(named) == 1 else None
+
+
+def split_player_sections(analysis_text, player_names):
+    """Return ({name: feedback}, rest) by cutting the analysis at headings that name one player
+
+    A player's section runs from their heading (markdown or bold) to the next
+    markdown heading or --- rule; a medal line opening it is dropped. rest is
+    everything outside the player sections (usually the learning lesson),
+    without the score block.
+    """
+    index = _name_index(tuple(player_names))
+    sections = {}
+    rest = []
+    current = None
+    for line in strip_score_block(analysis_text).split("\n"):
+        stripped = line.strip()
+        if _SECTION_BREAK.match(stripped) or stripped.startswith("**"):
+            name = _named_player(stripped, index)
+            if name and name not in sections:
+                current = name
+                sections[current] = []
+                continue
+            if _SECTION_BREAK.match(stripped):
+                current = None
+                if stripped == "---":
+                    continue
+        if current:
+            if not sections[current] and _MEDAL_LINE.match(stripped):
+                continue
+            sections[current].append(line)
+        else:
+            rest.append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items()}, "\n".join(rest).strip()
@@ -0,0 +1,167 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import env
+
+# Session state keys that make up a saved game
+GAME_STATE_KEYS = [
+    "current_scenario",
+    "current_player",
+    "num_players",
+    "player_names",
+    "submitted_answers",
+    "all_submitted",
+    "llm_analysis",
+    "show_analysis",
+    "round_scores",
+    "player_scores",
+    "round_number",
+    "game_ended",
+    "winner",
+    "round_history"
+]
+
+# Seconds the SQLite writer waits to batch saves into one transaction
+FLUSH_INTERVAL = 0.5
+# The memory store keeps at most this many games, dropping those untouched for GAME_STATE_TTL seconds
+MAX_GAMES = int(env("GAME_STATE_MAX_GAMES", "1000"))
+GAME_STATE_TTL = float(env("GAME_STATE_TTL", str(24 * 3600)))
+
+
+class MemoryStateStore:
+    """Game states kept in this process only (the default)
+
+    Games untouched for ttl_seconds are dropped, and beyond max_games the
+    least recently used one goes first.
+    """
+
+    def __init__(self, max_games=MAX_GAMES, ttl_seconds=GAME_STATE_TTL):
+        self.max_games = max_games
+        self.ttl_seconds = ttl_seconds
+        self._games = OrderedDict()  # game_id -> (touched_at, encoded), least recently used first
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._games:
+            game_id, (touched_at, _) = next(iter(self._games.items()))
+            if len(self._games) <= self.max_games and now - touched_at <= self.ttl_seconds:
+                break
+            del self._games[game_id]
+
+    def save(self, game_id, state):
+        encoded = json.dumps(state, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._games[game_id] = (now, encoded)
+            self._games.move_to_end(game_id)
+            self._evict(now)
+
+    def load(self, game_id):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._games.get(game_id)
+            if entry is None:
+                return None
+            self._games[game_id] = (now, entry[1])
+            self._games.move_to_end(game_id)
+        return json.loads(entry[1])
+
+    def __len__(self):
+        return len(self._games)
+
+    def flush(self):
+        pass
+
+
+class SQLiteStateStore:
+    """Game states in a SQLite database (WAL mode) shared by every worker process
+
+    save() only queues the state; a background writer commits all queued
+    games in one transaction every FLUSH_INTERVAL seconds, and on exit.
+    """
+
+    def __init__(self, path="game_state.db", flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "game_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._conn_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = threading.Thread(target=self._write_behind, daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def save(self, game_id, state):
+        encoded = json.dumps(state, ensure_ascii=False)
+        with self._pending_lock:
+            self._pending[game_id] = encoded
+        self._wakeup.set()
+
+    def load(self, game_id):
+        with self._pending_lock:
+            encoded = self._pending.get(game_id)
+        if encoded is None:
+            with self._conn_lock:
+                row = self._conn.execute("SELECT state FROM games WHERE game_id = ?", (game_id,)).fetchone()
+            encoded = row[0] if row else None
+        return None if encoded is None else json.loads(encoded)
+
+    def flush(self):
+        """Commit every queued save in a single transaction"""
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        now = time.time()
+        try:
+            with self._conn_lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO games (game_id, state, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(game_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                        [(game_id, encoded, now) for game_id, encoded in batch.items()]
+                    )
+        except sqlite3.Error:
+            # Queue the batch again; anything saved since the pop is newer and wins
+            with self._pending_lock:
+                self._pending = {**batch, **self._pending}
+            raise
+
+    def _write_behind(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # The batch is queued again; retry after the next interval
+                self._wakeup.set()
+
+
+def snapshot_game_state(state):
+    """Pick the persisted keys out of a game's state (GameEngine.to_state() plus UI settings)"""
+    return {key: state[key] for key in GAME_STATE_KEYS if key in state}
+
+
+def create_state_store():
+    """Build the store selected by GAME_STATE_BACKEND (memory or sqlite)"""
+    backend = env("GAME_STATE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteStateStore(env("GAME_STATE_DB", "game_state.db"))
+    if backend != "memory":
+        raise ValueError(f"Unknown GAME_STATE_BACKEND: {backend}")
+    return MemoryStateStore()
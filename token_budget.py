@@ -0,0 +1,102 @@
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional: exact counts for OpenAI models
+    tiktoken = None
+
+# Longest answer sent to the model; longer ones keep their start and end
+MAX_ANSWER_TOKENS = 400
+# Output budget for the combined analysis: the lesson and score block, plus feedback per player
+ANALYSIS_BASE_TOKENS = 600
+ANALYSIS_TOKENS_PER_PLAYER = 350
+ANALYSIS_MAX_TOKENS = 4096
+# Chat formatting overhead: per message, and for priming the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+# Pieces the GPT tokenizers split text into before merging bytes
+_PIECE_PATTERN = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]+|\s+")
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text):
+    """Number of tokens in text, exact with tiktoken installed and a close estimate without it"""
+    if tiktoken is not None:
+        return len(_get_encoding().encode(text))
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        if piece.isascii():
+            # Common words are one token; long or rare ones split every few letters
+            tokens += 1 if len(piece) <= 8 else math.ceil(len(piece) / 5)
+        else:
+            # Emoji and accented text cost about a token per two bytes
+            tokens += math.ceil(len(piece.encode("utf-8")) / 2)
+    return tokens
+
+
+def count_message_tokens(messages):
+    """Prompt tokens of a chat request, including the chat formatting"""
+    return REPLY_OVERHEAD_TOKENS + sum(
+        MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "") for message in messages
+    )
+
+
+def _word_boundary(text, from_end):
+    """Trim text back to a whitespace boundary when one is near, so no word is cut in half"""
+    window = max(1, len(text) // 5)
+    if from_end:
+        cut = text.find(" ", 0, window)
+        return text[cut + 1:] if cut >= 0 else text
+    cut = text.rfind(" ", len(text) - window)
+    return text[:cut] if cut >= 0 else text
+
+
+def cap_answer(answer, max_tokens=MAX_ANSWER_TOKENS):
+    """Shorten an oversized answer, keeping its opening and its conclusion"""
+    tokens = count_tokens(answer)
+    if tokens <= max_tokens:
+        return answer
+    # Cut by characters, sized from the answer's own characters per token, so text
+    # without spaces (CJK, long pasted strings) is capped as well
+    keep = len(answer) * max_tokens // tokens
+    while keep > 0:
+        head = _word_boundary(answer[:keep * 2 // 3], from_end=False)
+        tail = _word_boundary(answer[len(answer) - keep // 3:], from_end=True)
+        capped = head.rstrip() + " […] " + tail.lstrip()
+        if count_tokens(capped) <= max_tokens:
+            return capped
+        keep = keep * 9 // 10
+    return "[…]"
+
+
+def analysis_max_tokens(num_players):
+    """Output budget for one combined analysis of num_players answers"""
+    return min(ANALYSIS_MAX_TOKENS, ANALYSIS_BASE_TOKENS + ANALYSIS_TOKENS_PER_PLAYER * num_players)
+
+
+def summarize_usage(calls):
+    """Add up the token figures of a round's call_log records
+
+    Actual figures are None when no call reported usage (cache hits, offline scoring).
+    """
+    def total(field):
+        values = [call[field] for call in calls if call.get(field) is not None]
+        return sum(values) if values else None
+
+    return {
+        "calls": len(calls),
+        "estimated_prompt_tokens": total("estimated_prompt_tokens"),
+        "max_tokens": total("max_tokens"),
+        "prompt_tokens": total("prompt_tokens"),
+        "completion_tokens": total("completion_tokens"),
+        "cached_tokens": total("cached_tokens")
+    }